@@ -0,0 +1,90 @@
+/* ======================================================================
+   Benchmark de escaneos de Hoja1 (ejecutar a mano desde el editor)
+   ----------------------------------------------------------------------
+   Crea una planilla temporal con BENCH_ROWS filas (A..U), mide las
+   rutas en bloque de Index.gs (en frío y desde la caché) frente al
+   recorrido fila por fila anterior, y la envía a la papelera.
+   El recorrido anterior se mide sobre BENCH_LEGACY_SAMPLE filas y se
+   extrapola: a 10k filas supera el tiempo máximo de ejecución.
+   Usa su propio espacio de nombres (BENCH_NAMESPACE) para la generación y
+   las claves de caché, y las borra al terminar: la caché de la Hoja1 real
+   no se toca.
+   Resultados en Ver > Registros.
+   ====================================================================== */
+var BENCH_ROWS = 10000;
+var BENCH_LEGACY_SAMPLE = 300;
+var BENCH_NAMESPACE = 'bench';
+
+function benchmarkRowScans() {
+  var file = SpreadsheetApp.create('bench_hoja1_' + new Date().getTime());
+  try {
+    var sheet = file.getSheets()[0];
+    sheet.setName('Hoja1');
+    fillBenchSheet(sheet, BENCH_ROWS);
+    SpreadsheetApp.flush();
+
+    var results = {};
+    results.scanCold = timeMs(function() { scanHoja1Rows(sheet); });
+    invalidateHoja1Rows(BENCH_NAMESPACE);
+    results.getHoja1RowsCold = timeMs(function() { getHoja1Rows(sheet, BENCH_NAMESPACE); });
+    results.getHoja1RowsWarm = timeMs(function() { getHoja1Rows(sheet, BENCH_NAMESPACE); });
+    results.getNextAvailableRowWarm = timeMs(function() { getNextAvailableRow(sheet, BENCH_NAMESPACE); });
+
+    var target = BENCH_ROWS - 10;
+    var numero = String(target).padStart(4, '0') + '-25';
+    results.findRowByProformaCold = timeMs(function() { rebuildRowIndex(sheet, BENCH_NAMESPACE, 2); });
+    results.findRowByProformaWarm = timeMs(function() { rowIndexLookup(sheet, BENCH_NAMESPACE, numero, 2); });
+
+    // Recorrido anterior: una llamada getRange(...).getValues() por fila
+    var legacy = timeMs(function() {
+      for (var i = 2; i < 2 + BENCH_LEGACY_SAMPLE; i++) {
+        sheet.getRange(i, 8, 1, 7).getValues();
+      }
+    });
+    results.legacyPerRowExtrapolated = Math.round(legacy * BENCH_ROWS / BENCH_LEGACY_SAMPLE);
+
+    Logger.log('Filas: ' + BENCH_ROWS + ' (ms)\n' + JSON.stringify(results, null, 2));
+    return results;
+  } finally {
+    clearBenchCache();
+    DriveApp.getFileById(file.getId()).setTrashed(true);
+  }
+}
+
+// Borra la generación, las filas cacheadas y el índice del benchmark
+function clearBenchCache() {
+  var props = PropertiesService.getScriptProperties();
+  var property = hoja1VersionProperty(BENCH_NAMESPACE);
+  var keys = [BENCH_NAMESPACE + ':filas:' + (props.getProperty(property) || '0'),
+              rowIndexCacheKey(BENCH_NAMESPACE, 'meta')];
+  for (var s = 0; s < ROW_INDEX_SHARDS; s++) {
+    keys.push(rowIndexCacheKey(BENCH_NAMESPACE, s));
+  }
+  CacheService.getScriptCache().removeAll(keys);
+  props.deleteProperty(property);
+}
+
+// Filas como las reales: ~1/3 sin Diagramación, ~1/2 sin Producción, algún hueco
+function fillBenchSheet(sheet, rows) {
+  var values = [];
+  for (var i = 0; i < rows; i++) {
+    var row = [];
+    var numero = String(i + 2).padStart(4, '0') + '-25';
+    var blank = (i % 997 === 500);
+    for (var c = 0; c < 21; c++) {
+      var filled = !blank && (c < 7 || (c < 14 && i % 3 !== 0) || (c >= 14 && i % 2 === 0));
+      row.push(filled ? (c === 0 ? numero : 'v' + c) : '');
+    }
+    values.push(row);
+  }
+  if (sheet.getMaxRows() < rows + 1) {
+    sheet.insertRowsAfter(sheet.getMaxRows(), rows + 1 - sheet.getMaxRows());
+  }
+  sheet.getRange(2, 1, rows, 21).setValues(values);
+}
+
+function timeMs(fn) {
+  var start = new Date().getTime();
+  fn();
+  return new Date().getTime() - start;
+}
@@ -9,7 +9,12 @@ function doGet(e) {
 
     switch (action) {
       case 'loadOTs':
+        if (e.parameter.since !== undefined) {
+          return handleLoadOTsSince(ss, parseInt(e.parameter.since, 10));
+        }
         return handleLoadOTs(ss);
+      case 'loadOTsRange': // ✅ OTs asignadas entre from..to (yyyy-MM-dd), opcionalmente por proceso
+        return handleLoadOTsRange(ss, e);
       case 'assign':
         return handleAssign(ss, e);
       case 'remove':
@@ -30,6 +35,8 @@ function doGet(e) {
         return getAvailableProductionRows(ss);
       case 'getLastProforma':
         return getLastProforma(ss);
+      case 'reserveProformas': // ✅ Reserva atómica de un bloque de números de proforma
+        return handleReserveProformas(ss, e);
       case 'getAllProformas': // ✅ Obtener todas las proformas desde la fila 3
         return getAllProformas(ss);
       case 'getFullProformaData': // ✅ Obtener todos los datos de una proforma específica
@@ -38,6 +45,8 @@ function doGet(e) {
           return ContentService.createTextOutput('Error: No se proporcionó un número de proforma.').setMimeType(ContentService.MimeType.TEXT);
         }
         return getFullProformaData(ss, numeroProforma);
+      case 'getSnapshot': // ✅ Hoja1 (A..AQ) + hojas de procesos en una sola respuesta (réplica local)
+        return getSnapshot(ss);
       default:
         return ContentService.createTextOutput('Action not recognized').setMimeType(ContentService.MimeType.TEXT);
     }
@@ -49,8 +58,16 @@ function doGet(e) {
 /* ======================================================================
    Manejo de OTs: cargar, asignar, eliminar
    ====================================================================== */
+var PROCESS_SHEETS = ['XL75', 'XL-UV', 'Barnizado', 'HOT STAMPING', 'Plastificado', 'Localizado', 'Sello Seco', 'CILINDRICA', 'EASY MATRIX', 'TIPOGRAFICA', 'Peg. 1 Punto', 'Peg. 3 Puntos', 'Perforado', 'Doblado', 'Compaginado', 'Engrapado', 'Emblocado', 'Engarrado', 'Pegado con Tesa'];
+
 function handleLoadOTs(ss) {
-  var processSheets = ['XL75', 'XL-UV', 'Barnizado', 'HOT STAMPING', 'Plastificado', 'Localizado', 'Sello Seco', 'CILINDRICA', 'EASY MATRIX', 'TIPOGRAFICA', 'Peg. 1 Punto', 'Peg. 3 Puntos', 'Perforado', 'Doblado', 'Compaginado', 'Engrapado', 'Emblocado', 'Engarrado', 'Pegado con Tesa'];
+  return ContentService.createTextOutput(JSON.stringify(collectProcessOTs(ss)))
+    .setMimeType(ContentService.MimeType.JSON);
+}
+
+// { proceso: [[ot, fecha | "No asignada"], ...] } con una lectura por hoja
+function collectProcessOTs(ss) {
+  var processSheets = PROCESS_SHEETS;
   var response = {};
 
   for (var i = 0; i < processSheets.length; i++) {
@@ -77,10 +94,168 @@ function handleLoadOTs(ss) {
     }
   }
 
+  return response;
+}
+
+/* ======================================================================
+   Versionado de OTs: loadOTs&since=N devuelve solo los cambios
+   ----------------------------------------------------------------------
+   Cada alta/asignación/desasignación de OT se anota en la hoja oculta
+   '_CambiosOTs' como [versión, op, proceso, ot, fecha] y la versión
+   actual se guarda en ScriptProperties (OTS_VERSION).
+     op = 'add' -> OT nueva al final de la hoja de proceso
+     op = 'set' -> cambia la fecha de la primera fila con esa OT
+   Las ediciones manuales de la planilla no se registran: los clientes
+   piden un snapshot completo (since=0 o getSnapshot) de forma periódica.
+   La réplica del escritorio aplica estos deltas en su tabla process_ots.
+   ====================================================================== */
+var OT_LOG_SHEET = '_CambiosOTs';
+var OT_LOG_MAX_ROWS = 10000;   // al superarlo se recorta la mitad más antigua
+
+function getOTLogSheet(ss) {
+  var sheet = ss.getSheetByName(OT_LOG_SHEET);
+  if (!sheet) {
+    sheet = ss.insertSheet(OT_LOG_SHEET);
+    sheet.hideSheet();
+  }
+  return sheet;
+}
+
+// changes: [[op, proceso, ot, fecha], ...]
+function logOTChanges(ss, changes) {
+  if (!changes.length) return;
+
+  var lock = LockService.getScriptLock();
+  var owned = lock.hasLock();  // doPost ya lo tiene
+  if (!owned) lock.waitLock(10000);
+  try {
+    var props = PropertiesService.getScriptProperties();
+    var version = parseInt(props.getProperty('OTS_VERSION') || '0', 10);
+    var rows = changes.map(function(c) {
+      version++;
+      return [version, c[0], c[1], c[2], c[3] || 'No asignada'];
+    });
+
+    var sheet = getOTLogSheet(ss);
+    sheet.getRange(sheet.getLastRow() + 1, 1, rows.length, 5).setValues(rows);
+    props.setProperty('OTS_VERSION', String(version));
+
+    var logRows = sheet.getLastRow();
+    if (logRows > OT_LOG_MAX_ROWS) {
+      var drop = Math.floor(logRows / 2);
+      sheet.deleteRows(1, drop);
+      // Versiones anteriores a la primera que queda ya no se pueden servir como delta
+      props.setProperty('OTS_MIN_VERSION', String(sheet.getRange(1, 1).getValue() - 1));
+    }
+  } finally {
+    if (!owned) lock.releaseLock();
+  }
+}
+
+function handleLoadOTsSince(ss, since) {
+  var props = PropertiesService.getScriptProperties();
+  var version = parseInt(props.getProperty('OTS_VERSION') || '0', 10);
+  var minVersion = parseInt(props.getProperty('OTS_MIN_VERSION') || '0', 10);
+
+  var response;
+  if (isNaN(since) || since <= 0 || since < minVersion || since > version) {
+    response = { version: version, full: true, ots: collectProcessOTs(ss) };
+  } else if (since === version) {
+    response = { version: version, full: false, changes: [] };
+  } else {
+    var needed = version - since;
+    var sheet = getOTLogSheet(ss);
+    var lastRow = sheet.getLastRow();
+    // Se leen unas filas de más por si otro proceso escribió mientras tanto
+    var count = Math.min(lastRow, needed + 50);
+    var rows = count > 0 ? sheet.getRange(lastRow - count + 1, 1, count, 5).getValues() : [];
+    var changes = [];
+    for (var i = 0; i < rows.length; i++) {
+      if (rows[i][0] > since && rows[i][0] <= version) {
+        changes.push([rows[i][1], rows[i][2], rows[i][3], rows[i][4]]);
+      }
+    }
+    response = changes.length === needed
+      ? { version: version, full: false, changes: changes }
+      : { version: version, full: true, ots: collectProcessOTs(ss) };
+  }
+
   return ContentService.createTextOutput(JSON.stringify(response))
     .setMimeType(ContentService.MimeType.JSON);
 }
 
+/* ======================================================================
+   Consulta por rango de fechas (plan semanal)
+   ----------------------------------------------------------------------
+   Índice por hoja de proceso { 'yyyy-MM-dd': [ot, ...] } guardado en
+   CacheService. La clave incluye OTS_VERSION, así que cualquier
+   asignación/alta registrada deja el índice anterior fuera de uso.
+   ====================================================================== */
+var OT_DATE_INDEX_TTL = 600;  // segundos (cubre ediciones manuales de la hoja)
+
+function getOTDateIndex(ss, sheet, version, tz) {
+  var cache = CacheService.getScriptCache();
+  var key = 'otdates:' + version + ':' + sheet.getName();
+  var cached = cache.get(key);
+  if (cached) {
+    return JSON.parse(cached);
+  }
+
+  var index = {};
+  var lastRow = sheet.getLastRow();
+  if (lastRow > 1) {
+    var data = sheet.getRange(2, 1, lastRow - 1, 5).getValues();
+    for (var j = 0; j < data.length; j++) {
+      var ot = data[j][0];
+      var date = data[j][4];
+      if (ot === "" || date === "") continue;
+      var day = (date instanceof Date)
+        ? Utilities.formatDate(date, tz, 'yyyy-MM-dd')
+        : String(date).substring(0, 10);
+      (index[day] = index[day] || []).push(ot);
+    }
+  }
+
+  try {
+    cache.put(key, JSON.stringify(index), OT_DATE_INDEX_TTL);
+  } catch (err) {
+    // Índice mayor a 100 KB: se recalcula en cada consulta
+  }
+  return index;
+}
+
+function handleLoadOTsRange(ss, e) {
+  var from = e.parameter.from;
+  var to = e.parameter.to;
+  if (!from || !to) {
+    return ContentService.createTextOutput('Error: Faltan los parámetros from/to.').setMimeType(ContentService.MimeType.TEXT);
+  }
+  var processes = e.parameter.process ? e.parameter.process.split(',') : PROCESS_SHEETS;
+
+  var version = PropertiesService.getScriptProperties().getProperty('OTS_VERSION') || '0';
+  var tz = ss.getSpreadsheetTimeZone();
+  var response = {};
+
+  for (var i = 0; i < processes.length; i++) {
+    var sheet = ss.getSheetByName(processes[i]);
+    if (!sheet || sheet.getLastRow() <= 1) continue;
+
+    var index = getOTDateIndex(ss, sheet, version, tz);
+    var sheetData = [];
+    // Las claves son 'yyyy-MM-dd': la comparación de texto respeta el orden de fechas
+    Object.keys(index).sort().forEach(function(day) {
+      if (day >= from && day <= to) {
+        index[day].forEach(function(ot) { sheetData.push([ot, day]); });
+      }
+    });
+    response[processes[i]] = sheetData;
+  }
+
+  return ContentService
+    .createTextOutput(JSON.stringify({ from: from, to: to, ots: response }))
+    .setMimeType(ContentService.MimeType.JSON);
+}
+
 function handleAssign(ss, e) {
   var process = e.parameter.process;
   var ot = e.parameter.ot;
@@ -96,12 +271,11 @@ function handleAssign(ss, e) {
     return ContentService.createTextOutput('Error: No data to assign in sheet').setMimeType(ContentService.MimeType.TEXT);
   }
 
-  var otData = sheet.getRange(2, 1, lastRow - 1, 1).getValues();
-  for (var i = 0; i < otData.length; i++) {
-    if (otData[i][0] == ot) {
-      sheet.getRange(i + 2, 5).setValue(date);
-      return ContentService.createTextOutput('Success').setMimeType(ContentService.MimeType.TEXT);
-    }
+  var row = findRowByOT(sheet, ot);  // ver Index.gs
+  if (row) {
+    sheet.getRange(row, 5).setValue(date);
+    logOTChanges(ss, [['set', process, ot, date]]);
+    return ContentService.createTextOutput('Success').setMimeType(ContentService.MimeType.TEXT);
   }
 
   return ContentService.createTextOutput('Error: OT not found in sheet').setMimeType(ContentService.MimeType.TEXT);
@@ -121,12 +295,11 @@ function handleRemove(ss, e) {
     return ContentService.createTextOutput('Error: No data to remove in sheet').setMimeType(ContentService.MimeType.TEXT);
   }
 
-  var otData = sheet.getRange(2, 1, lastRow - 1, 1).getValues();
-  for (var i = 0; i < otData.length; i++) {
-    if (otData[i][0] == ot) {
-      sheet.getRange(i + 2, 5).setValue('');
-      return ContentService.createTextOutput('Success').setMimeType(ContentService.MimeType.TEXT);
-    }
+  var row = findRowByOT(sheet, ot);  // ver Index.gs
+  if (row) {
+    sheet.getRange(row, 5).setValue('');
+    logOTChanges(ss, [['set', process, ot, 'No asignada']]);
+    return ContentService.createTextOutput('Success').setMimeType(ContentService.MimeType.TEXT);
   }
 
   return ContentService.createTextOutput('Error: OT not found in sheet').setMimeType(ContentService.MimeType.TEXT);
@@ -160,34 +333,46 @@ function getLastProforma(ss) {
   }
 }
 
-function getAvailableDiagramacionRows(ss) {
+var MAX_PROFORMA_BLOCK = 100;
+
+// { first, count, numbers: ['0012-25', ...] } con el sufijo del año en curso
+function handleReserveProformas(ss, e) {
+  var count = parseInt(e.parameter.count || '1', 10);
+  if (isNaN(count) || count < 1 || count > MAX_PROFORMA_BLOCK) {
+    return ContentService.createTextOutput('Error: count debe estar entre 1 y ' + MAX_PROFORMA_BLOCK + '.').setMimeType(ContentService.MimeType.TEXT);
+  }
+
   var sheet = ss.getSheetByName('Hoja1');
-  var lastRow = sheet.getLastRow();
-  var availableRows = [];
+  if (!sheet) {
+    return ContentService.createTextOutput('Error: Sheet not found').setMimeType(ContentService.MimeType.TEXT);
+  }
 
-  for (var i = 2; i <= lastRow; i++) {
-    var rowValues = sheet.getRange(i, 8, 1, 7).getValues()[0];
-    if (rowValues.every(value => value.toString().trim() === "")) {
-      availableRows.push({ row: i });
-    }
+  var first = reserveProformaNumbers(sheet, count);  // ver Postman
+  var suffix = Utilities.formatDate(new Date(), ss.getSpreadsheetTimeZone(), 'yy');
+  var numbers = [];
+  for (var i = 0; i < count; i++) {
+    numbers.push((first + i).toString().padStart(4, '0') + '-' + suffix);
   }
 
+  return ContentService
+    .createTextOutput(JSON.stringify({ first: first, count: count, numbers: numbers }))
+    .setMimeType(ContentService.MimeType.JSON);
+}
+
+// Filas con H..N vacías (una lectura en bloque, cacheada en Index.gs)
+function getAvailableDiagramacionRows(ss) {
+  var sheet = ss.getSheetByName('Hoja1');
+  var availableRows = getHoja1Rows(sheet).pendingDiagramacion.map(row => ({ row: row }));
+
   return ContentService
     .createTextOutput(JSON.stringify({ availableRows: availableRows }))
     .setMimeType(ContentService.MimeType.JSON);
 }
 
+// Filas con O..U vacías (una lectura en bloque, cacheada en Index.gs)
 function getAvailableProductionRows(ss) {
   var sheet = ss.getSheetByName('Hoja1');
-  var lastRow = sheet.getLastRow();
-  var availableRows = [];
-
-  for (var i = 2; i <= lastRow; i++) {
-    var rowValues = sheet.getRange(i, 15, 1, 7).getValues()[0];
-    if (rowValues.every(value => value.toString().trim() === "")) {
-      availableRows.push({ row: i });
-    }
-  }
+  var availableRows = getHoja1Rows(sheet).pendingProduccion.map(row => ({ row: row }));
 
   return ContentService
     .createTextOutput(JSON.stringify({ availableRows: availableRows }))
@@ -203,28 +388,26 @@ function getFullProformaData(ss, numeroProforma) {
         .setMimeType(ContentService.MimeType.JSON);
     }
 
-    var data = sheet.getDataRange().getValues(); // Obtener todos los datos de la hoja
-
     // Definir rangos de columnas
     var comercialRange = { start: 0, end: 6 };  // Columnas A-G
     var diagramacionRange = { start: 7, end: 13 }; // Columnas H-N
     var produccionRange = { start: 14, end: 42 }; // Columnas O-AQ
 
-    // Buscar la fila con la proforma específica
-    for (var i = 1; i < data.length; i++) {
-      if (data[i][0] == numeroProforma) { // Comparando con la columna de proforma
+    // Buscar la fila con la proforma específica (índice en caché, ver Index.gs)
+    var row = findRowByProforma(sheet, numeroProforma);
+    if (row) {
+      var rowValues = sheet.getRange(row, 1, 1, produccionRange.end + 1).getValues()[0];
 
-        // Dividir los valores en Comercial, Diagramación y Producción
-        var proformaData = {
-          "Comercial": data[i].slice(comercialRange.start, comercialRange.end + 1),
-          "Diagramacion": data[i].slice(diagramacionRange.start, diagramacionRange.end + 1),
-          "Produccion": data[i].slice(produccionRange.start, produccionRange.end + 1)
-        };
+      // Dividir los valores en Comercial, Diagramación y Producción
+      var proformaData = {
+        "Comercial": rowValues.slice(comercialRange.start, comercialRange.end + 1),
+        "Diagramacion": rowValues.slice(diagramacionRange.start, diagramacionRange.end + 1),
+        "Produccion": rowValues.slice(produccionRange.start, produccionRange.end + 1)
+      };
 
-        return ContentService
-          .createTextOutput(JSON.stringify(proformaData))
-          .setMimeType(ContentService.MimeType.JSON);
-      }
+      return ContentService
+        .createTextOutput(JSON.stringify(proformaData))
+        .setMimeType(ContentService.MimeType.JSON);
     }
 
     return ContentService
@@ -238,6 +421,28 @@ function getFullProformaData(ss, numeroProforma) {
   }
 }
 
+// Volcado completo para la réplica SQLite del escritorio:
+// filas de Hoja1 desde la 2 con columnas A..AQ (43), las OTs de cada proceso
+// y OTS_VERSION, desde la que la réplica pide luego loadOTs&since=.
+function getSnapshot(ss) {
+  var sheet = ss.getSheetByName('Hoja1');
+  if (!sheet) {
+    return ContentService
+      .createTextOutput(JSON.stringify({ error: "Error: Sheet not found" }))
+      .setMimeType(ContentService.MimeType.JSON);
+  }
+
+  // La versión se lee antes que las hojas: un cambio intermedio vuelve a
+  // llegar en el delta y la réplica lo aplica sin duplicarlo
+  var otsVersion = parseInt(PropertiesService.getScriptProperties().getProperty('OTS_VERSION') || '0', 10);
+  var lastRow = sheet.getLastRow();
+  var rows = lastRow >= 2 ? sheet.getRange(2, 1, lastRow - 1, 43).getValues() : [];
+
+  return ContentService
+    .createTextOutput(JSON.stringify({ firstRow: 2, hoja1: rows, ots: collectProcessOTs(ss), otsVersion: otsVersion }))
+    .setMimeType(ContentService.MimeType.JSON);
+}
+
 function getAllProformas(ss) {
   var sheet = ss.getSheetByName('Hoja1');
   if (!sheet) {
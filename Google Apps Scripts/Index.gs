@@ -0,0 +1,233 @@
+/* ======================================================================
+   Índice clave -> fila
+   ----------------------------------------------------------------------
+   - 'proforma'        : Nº de proforma (Hoja1, columna A)
+   - 'ot:<hoja>'       : Nº de OT en cada hoja de proceso (columna A)
+   Se guarda en CacheService repartido en ROW_INDEX_SHARDS valores JSON
+   (cada uno muy por debajo del límite de 100 KB) más un 'meta' con la
+   última fila indexada.
+
+   Búsqueda: se lee solo la celda de la fila indicada para confirmar que
+   la clave sigue ahí. Si no coincide (filas movidas o borradas a mano), o
+   si la clave no está y la hoja creció desde la última indexación, el
+   índice se reconstruye con una sola lectura de la columna A.
+   Escritura: quien escribe la columna A llama a rowIndexPut.
+   ====================================================================== */
+var ROW_INDEX_TTL = 3600;   // segundos; acota ediciones manuales no detectadas
+var ROW_INDEX_SHARDS = 16;
+
+// Misma igualdad que '==' entre celda y parámetro: '0012' y 12 son la misma clave
+function rowIndexKey(value) {
+  var text = String(value).trim();
+  return /^\d+$/.test(text) ? String(parseInt(text, 10)) : text;
+}
+
+function rowIndexShard(key) {
+  var hash = 0;
+  for (var i = 0; i < key.length; i++) {
+    hash = (hash * 31 + key.charCodeAt(i)) | 0;
+  }
+  return Math.abs(hash) % ROW_INDEX_SHARDS;
+}
+
+function rowIndexCacheKey(namespace, suffix) {
+  return 'rowidx:' + namespace + ':' + suffix;
+}
+
+// Ejecuta fn con el bloqueo de script (doPost ya lo tiene tomado)
+function withScriptLock(fn) {
+  var lock = LockService.getScriptLock();
+  var owned = lock.hasLock();
+  if (!owned) lock.waitLock(10000);
+  try {
+    return fn();
+  } finally {
+    if (!owned) lock.releaseLock();
+  }
+}
+
+// Lee la columna A desde firstRow y vuelve a guardar todo el índice.
+// Devuelve los shards ({clave: fila} cada uno).
+function rebuildRowIndex(sheet, namespace, firstRow) {
+  return withScriptLock(function() {
+    var lastRow = sheet.getLastRow();
+    var shards = [];
+    for (var s = 0; s < ROW_INDEX_SHARDS; s++) {
+      shards.push({});
+    }
+
+    if (lastRow >= firstRow) {
+      var keys = sheet.getRange(firstRow, 1, lastRow - firstRow + 1, 1).getValues();
+      for (var i = 0; i < keys.length; i++) {
+        if (keys[i][0] === "") continue;
+        var key = rowIndexKey(keys[i][0]);
+        var shard = shards[rowIndexShard(key)];
+        if (!(key in shard)) {
+          shard[key] = firstRow + i;  // manda la primera fila, como la búsqueda lineal
+        }
+      }
+    }
+
+    var values = {};
+    for (var n = 0; n < ROW_INDEX_SHARDS; n++) {
+      values[rowIndexCacheKey(namespace, n)] = JSON.stringify(shards[n]);
+    }
+    values[rowIndexCacheKey(namespace, 'meta')] = JSON.stringify({ lastRow: Math.max(lastRow, firstRow - 1) });
+    CacheService.getScriptCache().putAll(values, ROW_INDEX_TTL);
+    return shards;
+  });
+}
+
+// Fila de 'value' en la columna A, o null si no existe
+function rowIndexLookup(sheet, namespace, value, firstRow) {
+  var key = rowIndexKey(value);
+  if (key === "") return null;
+
+  var shardKey = rowIndexCacheKey(namespace, rowIndexShard(key));
+  var metaKey = rowIndexCacheKey(namespace, 'meta');
+  var cached = CacheService.getScriptCache().getAll([shardKey, metaKey]);
+
+  if (cached[shardKey] && cached[metaKey]) {
+    var row = JSON.parse(cached[shardKey])[key];
+    if (row) {
+      if (rowIndexKey(sheet.getRange(row, 1).getValue()) === key) {
+        return row;
+      }
+    } else if (JSON.parse(cached[metaKey]).lastRow === sheet.getLastRow()) {
+      return null;
+    }
+  }
+
+  return rebuildRowIndex(sheet, namespace, firstRow)[rowIndexShard(key)][key] || null;
+}
+
+// entries: [[valor, fila], ...] recién escritos en la columna A.
+// Sin índice en caché no hace nada: se construirá en la próxima búsqueda.
+function rowIndexPut(namespace, entries) {
+  if (!entries.length) return;
+
+  withScriptLock(function() {
+    var cache = CacheService.getScriptCache();
+    var metaKey = rowIndexCacheKey(namespace, 'meta');
+    var shardKeys = [metaKey];
+    for (var s = 0; s < ROW_INDEX_SHARDS; s++) {
+      shardKeys.push(rowIndexCacheKey(namespace, s));
+    }
+    var cached = cache.getAll(shardKeys);
+    if (!cached[metaKey]) return;
+
+    var meta = JSON.parse(cached[metaKey]);
+    var touched = {};
+    entries.slice().sort(function(a, b) { return a[1] - b[1]; }).forEach(function(entry) {
+      var key = rowIndexKey(entry[0]);
+      if (key === "") return;
+      var shardKey = rowIndexCacheKey(namespace, rowIndexShard(key));
+      if (!(shardKey in touched)) {
+        if (!cached[shardKey]) return;
+        touched[shardKey] = JSON.parse(cached[shardKey]);
+      }
+      if (!(key in touched[shardKey])) {
+        touched[shardKey][key] = entry[1];
+      }
+      // El índice sigue completo solo si la fila nueva es contigua
+      if (entry[1] === meta.lastRow + 1) {
+        meta.lastRow = entry[1];
+      }
+    });
+
+    var values = {};
+    for (var shardKey in touched) {
+      values[shardKey] = JSON.stringify(touched[shardKey]);
+    }
+    values[metaKey] = JSON.stringify(meta);
+    cache.putAll(values, ROW_INDEX_TTL);
+  });
+}
+
+// -----------------------------------------------------
+//  Búsquedas usadas por doGet / doPost
+// -----------------------------------------------------
+function findRowByProforma(sheet, numeroProforma) {
+  return rowIndexLookup(sheet, 'proforma', numeroProforma, 2);
+}
+
+function findRowByOT(sheet, ot) {
+  return rowIndexLookup(sheet, 'ot:' + sheet.getName(), ot, 2);
+}
+
+/* ======================================================================
+   Filas libres y pendientes de Hoja1
+   ----------------------------------------------------------------------
+   Una sola lectura de A..U resuelve:
+     firstFree           -> primera fila con A..O vacías (getNextAvailableRow)
+     pendingDiagramacion -> filas con H..N vacías
+     pendingProduccion   -> filas con O..U vacías
+   El resultado se guarda en CacheService bajo la generación HOJA1_VERSION,
+   que doPost incrementa en cada escritura: una lectura que termina después
+   de un guardado no puede dejar en caché datos viejos. Las ediciones a
+   mano no cambian la generación: getNextAvailableRow (Postman) confirma
+   la fila libre antes de usarla.
+   ====================================================================== */
+var HOJA1_ROWS_TTL = 300;  // segundos (cubre ediciones manuales de la hoja)
+
+function isBlankRange(values, start, end) {
+  for (var c = start; c < end; c++) {
+    if (values[c].toString().trim() !== "") return false;
+  }
+  return true;
+}
+
+function scanHoja1Rows(sheet) {
+  var lastRow = sheet.getLastRow();
+  var result = { firstFree: lastRow + 1, pendingDiagramacion: [], pendingProduccion: [] };
+  if (lastRow < 2) return result;
+
+  var values = sheet.getRange(2, 1, lastRow - 1, 21).getValues();
+  var freeFound = false;
+  for (var i = 0; i < values.length; i++) {
+    var row = i + 2;
+    if (!freeFound && isBlankRange(values[i], 0, 15)) {
+      result.firstFree = row;
+      freeFound = true;
+    }
+    if (isBlankRange(values[i], 7, 14)) {
+      result.pendingDiagramacion.push(row);
+    }
+    if (isBlankRange(values[i], 14, 21)) {
+      result.pendingProduccion.push(row);
+    }
+  }
+  return result;
+}
+
+// namespace: por defecto 'hoja1' (la planilla real). Otro valor (p. ej. el
+// benchmark) usa su propia propiedad de generación y sus propias claves.
+function hoja1VersionProperty(namespace) {
+  return !namespace || namespace === 'hoja1' ? 'HOJA1_VERSION' : 'HOJA1_VERSION:' + namespace;
+}
+
+function getHoja1Rows(sheet, namespace) {
+  namespace = namespace || 'hoja1';
+  var generation = PropertiesService.getScriptProperties().getProperty(hoja1VersionProperty(namespace)) || '0';
+  var cache = CacheService.getScriptCache();
+  var key = namespace + ':filas:' + generation;
+  var cached = cache.get(key);
+  if (cached) {
+    return JSON.parse(cached);
+  }
+
+  var rows = scanHoja1Rows(sheet);
+  try {
+    cache.put(key, JSON.stringify(rows), HOJA1_ROWS_TTL);
+  } catch (err) {
+    // Mayor a 100 KB: se vuelve a escanear en cada consulta
+  }
+  return rows;
+}
+
+function invalidateHoja1Rows(namespace) {
+  var props = PropertiesService.getScriptProperties();
+  var property = hoja1VersionProperty(namespace);
+  var generation = parseInt(props.getProperty(property) || '0', 10);
+  props.setProperty(property, String(generation + 1));
+}
@@ -0,0 +1,67 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class ResponseCache:
+    """
+    Caché en memoria (TTL + LRU) para respuestas GET de la API.
+    La clave es (action, parámetros). Es segura entre hilos porque la usan
+    los workers de ApiExecutor en paralelo.
+    Los valores se devuelven tal cual: quien los recibe no debe modificarlos.
+    """
+    def __init__(self, max_entries=256, ttl=120):
+        self.max_entries = max_entries
+        self.ttl = ttl  # segundos
+        self._entries = OrderedDict()  # clave -> (expira_en, valor)
+        self._lock = threading.Lock()
+        # Aumenta en cada invalidación: una respuesta pedida antes de un
+        # guardado no debe volver a entrar en la caché con datos viejos.
+        self.generation = 0
+
+    @staticmethod
+    def make_key(action, params):
+        return (action, tuple(sorted((k, str(v)) for k, v in params.items())))
+
+    def get(self, action, params):
+        """Devuelve (True, valor) si hay entrada vigente, si no (False, None)."""
+        key = self.make_key(action, params)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, value
+
+    def put(self, action, params, value, ttl=None, generation=None):
+        key = self.make_key(action, params)
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, action, **params):
+        """
+        Sin params borra todas las entradas de 'action';
+        con params borra solo esa combinación exacta.
+        """
+        with self._lock:
+            self.generation += 1
+            if params:
+                self._entries.pop(self.make_key(action, params), None)
+                return
+            for key in [k for k in self._entries if k[0] == action]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
@@ -0,0 +1,367 @@
+import json
+import threading
+import time
+from urllib.parse import urlencode
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from api_cache import ResponseCache
+from api_metrics import get_metrics
+
+MAX_PROFORMA_BLOCK = 100  # como en Get.gs (handleReserveProformas)
+
+
+class ApiError(requests.exceptions.RequestException):
+    """El Apps Script respondió 200 pero con un texto 'Error: ...'."""
+
+
+def merge_ot_changes(ots, changes):
+    """
+    Aplica sobre {proceso: [[ot, fecha], ...]} los cambios de loadOTs&since=N.
+    Cada cambio es [op, proceso, ot, fecha]:
+      'add' -> OT nueva al final del proceso
+      'set' -> nueva fecha para la primera entrada con esa OT
+    """
+    for op, proceso, ot, fecha in changes:
+        entries = ots.setdefault(proceso, [])
+        if op == "set":
+            for entry in entries:
+                if str(entry[0]) == str(ot):
+                    entry[1] = fecha
+                    break
+            else:
+                entries.append([ot, fecha])
+        else:
+            entries.append([ot, fecha])
+    return ots
+
+
+class ApiClient:
+    """
+    Cliente HTTP único para toda la aplicación.
+    Reutiliza una sola requests.Session (keep-alive + pool de conexiones) contra
+    el endpoint de Apps Script y su redirección a script.googleusercontent.com,
+    así cada clic no paga un nuevo handshake TLS.
+    Cada llamada (de red, caché o réplica) queda medida en api_metrics.
+    """
+    # (conexión, lectura) en segundos
+    DEFAULT_TIMEOUT = (5, 30)
+    # Conexiones vivas por host (script.google.com y googleusercontent)
+    POOL_MAXSIZE = 10
+    # /exec responde con un único 302 hacia googleusercontent: no seguimos cadenas largas
+    MAX_REDIRECTS = 2
+    # Acciones de solo lectura que se sirven desde la caché (segundos de vida)
+    CACHEABLE_ACTIONS = {
+        "getAllProformas": 120,
+        "getFullProformaData": 300,
+        "loadOTsRange": 60,
+    }
+
+    def __init__(self, api_url="", timeout=None):
+        self.api_url = api_url or ""
+        self.timeout = timeout or self.DEFAULT_TIMEOUT
+        self.cache = ResponseCache()
+        self.metrics = get_metrics()
+        # Réplica SQLite opcional (ver replica.py); se adjunta desde main.py
+        self.replica = None
+        self.replica_sync = None
+        # Copia incremental de loadOTs (versión del servidor + datos ya fusionados)
+        self._ots = {}
+        self._ots_version = 0
+        self._ots_lock = threading.Lock()
+
+        self.session = requests.Session()
+        self.session.max_redirects = self.MAX_REDIRECTS
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=self.POOL_MAXSIZE)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def __bool__(self):
+        """Un cliente sin URL se comporta como 'no configurado'."""
+        return bool(self.api_url)
+
+    def set_url(self, api_url):
+        """Cambia la URL (desde Configuración de API) conservando el pool."""
+        if (api_url or "") != self.api_url:
+            self.cache.clear()  # otra hoja, otros datos
+            with self._ots_lock:
+                self._ots, self._ots_version = {}, 0
+        self.api_url = api_url or ""
+
+    def attach_replica(self, replica, replica_sync=None):
+        """Sirve las lecturas desde la réplica local una vez sincronizada."""
+        self.replica = replica
+        self.replica_sync = replica_sync
+
+    @property
+    def data_version(self):
+        """
+        Cambia cuando pueden haber cambiado los datos que se leen: con cada
+        invalidación de la caché y cada cambio de la réplica. Las ventanas lo
+        usan como clave de sus propias cachés (semanas del plan).
+        """
+        replica = self.replica
+        return self.cache.generation, (replica.version if replica is not None else None)
+
+    # ----------------------------------------------------------------
+    #  Peticiones
+    # ----------------------------------------------------------------
+    def get(self, action, **params):
+        """GET ?action=...&params... Devuelve el requests.Response."""
+        query = {"action": action}
+        query.update(params)
+        response = self._timed(
+            action, "GET", len(urlencode(query)),
+            lambda: self.session.get(self.api_url, params=query, timeout=self.timeout)
+        )
+        if action in ("assign", "remove") and self._write_succeeded(response):
+            # El cambio queda ya en la réplica (y llega también en el próximo
+            # delta de loadOTs). apply_assign descarta el snapshot en curso,
+            # así que se pide otro ciclo como en post / post_batch
+            if self.replica is not None:
+                date = params.get("date") if action == "assign" else None
+                self.replica.apply_assign(params.get("process"), params.get("ot"), date)
+                self._request_replica_sync()
+            self.cache.invalidate("loadOTsRange")
+        return response
+
+    def get_json(self, action, **params):
+        """
+        GET que valida el status y devuelve el JSON ya parseado.
+        Las acciones de CACHEABLE_ACTIONS se leen primero de la caché, y las que
+        sirve la réplica local salen de disco en cuanto esta se sincronizó.
+        """
+        start = time.perf_counter()
+        replica = self.replica
+        if replica is not None and action in replica.SERVED_ACTIONS and replica.ready:
+            data = replica.answer(action, params)
+            self._record_local(action, "replica", start)
+            return data
+
+        ttl = self.CACHEABLE_ACTIONS.get(action)
+        if ttl is not None:
+            hit, value = self.cache.get(action, params)
+            if hit:
+                self._record_local(action, "cache", start)
+                return value
+            generation = self.cache.generation
+
+        response = self.get(action, **params)
+        response.raise_for_status()
+        data = response.json()
+
+        # getFullProformaData responde 200 con {"error": ...} si no encuentra la proforma
+        if ttl is not None and not (isinstance(data, dict) and "error" in data):
+            self.cache.put(action, params, data, ttl=ttl, generation=generation)
+        return data
+
+    def warm_up(self):
+        """
+        Abre las conexiones del pool (Apps Script y su redirección) y deja
+        getAllProformas en la caché. Va siempre a la red, aunque la réplica
+        pueda responder: lo que se calienta es la conexión.
+        """
+        ttl = self.CACHEABLE_ACTIONS.get("getAllProformas")
+        generation = self.cache.generation
+        response = self.get("getAllProformas")
+        response.raise_for_status()
+        data = response.json()
+        if ttl is not None:
+            self.cache.put("getAllProformas", {}, data, ttl=ttl, generation=generation)
+        return data
+
+    def load_ots(self):
+        """
+        loadOTs incremental. La primera vez (since=0) llega todo; después solo
+        las OTs añadidas/reasignadas desde la última versión. Con réplica, el
+        delta se aplica en su tabla process_ots (sin conexión responde con lo
+        último sincronizado); sin ella, se fusiona en memoria. Devuelve una
+        copia que la ventana puede modificar.
+        """
+        replica = self.replica
+        if replica is not None and replica.ready:
+            since = replica.ots_version
+            try:
+                data = self._fetch_ots(since)
+            except requests.exceptions.RequestException:
+                pass  # queda registrado en api_metrics
+            else:
+                replica.apply_ot_changes(data, since)
+            return replica.load_ots()
+
+        with self._ots_lock:
+            since = self._ots_version
+        data = self._fetch_ots(since)
+
+        with self._ots_lock:
+            if "version" not in data:
+                # Servidor sin versionado: respuesta clásica completa
+                self._ots, self._ots_version = data, 0
+            elif data.get("full"):
+                self._ots, self._ots_version = data.get("ots", {}), data["version"]
+            elif since == self._ots_version:
+                merge_ot_changes(self._ots, data.get("changes", []))
+                self._ots_version = data["version"]
+            # Si no, otra petición en paralelo ya avanzó la versión: este delta sobra
+            return {proceso: [list(entry) for entry in entries]
+                    for proceso, entries in self._ots.items()}
+
+    def _fetch_ots(self, since):
+        """loadOTs&since=N siempre de la red (la réplica también sirve loadOTs)."""
+        response = self.get("loadOTs", since=since)
+        response.raise_for_status()
+        if response.text.startswith("Error"):
+            raise ApiError(response.text)
+        return response.json()
+
+    def load_ots_range(self, start, end, processes=None):
+        """
+        OTs asignadas entre start y end ('yyyy-MM-dd', ambos incluidos).
+        Devuelve {proceso: [[ot, 'yyyy-MM-dd'], ...]} solo con ese rango.
+        """
+        params = {"from": start, "to": end}
+        if processes:
+            params["process"] = ",".join(processes)
+        return self.get_json("loadOTsRange", **params).get("ots", {})
+
+    def reserve_proformas(self, count):
+        """
+        Reserva en el servidor 'count' números de proforma consecutivos
+        (contador atómico). Devuelve ['0012-25', ...]; nunca se repiten
+        entre puestos aunque el lote no llegue a guardarse.
+        """
+        response = self.get("reserveProformas", count=count)
+        response.raise_for_status()
+        if response.text.startswith("Error"):
+            raise ApiError(response.text)
+        numbers = response.json().get("numbers", [])
+        if len(numbers) != count:
+            raise ApiError("El servidor no reservó todos los números de proforma.")
+        return numbers
+
+    def create_proformas(self, items):
+        """
+        Reserva los números y guarda el lote de Comercial con ellos en un solo
+        POST. El servidor reserva hasta MAX_PROFORMA_BLOCK números por pedido.
+        """
+        numbers = []
+        for start in range(0, len(items), MAX_PROFORMA_BLOCK):
+            numbers += self.reserve_proformas(min(MAX_PROFORMA_BLOCK, len(items) - start))
+        items = [dict(item, numeroProforma=numero) for item, numero in zip(items, numbers)]
+        return self.post_batch("Comercial", items)
+
+    def post(self, data):
+        """
+        POST JSON al doPost. Devuelve el requests.Response.
+        Si el guardado fue correcto, invalida la proforma afectada y la lista.
+        """
+        response = self._post_json(data.get("section", "?"), data)
+        if self._write_succeeded(response):
+            self.invalidate_proforma(data.get("numeroProforma"))
+            if data.get("section") == "Produccion":
+                self.cache.invalidate("loadOTsRange")  # pudo dar de alta OTs
+            if self.replica is not None:
+                self.replica.apply_post(data)
+            self._request_replica_sync()
+        return response
+
+    def post_batch(self, section, items):
+        """
+        Envía varias filas de una sección en un solo POST (section=<section>Lote).
+        Devuelve un resultado por elemento, en el mismo orden:
+        {"numeroProforma", "ok", "row"} o {"numeroProforma", "ok": False, "error"}.
+        """
+        response = self._post_json(f"{section}Lote", {"section": f"{section}Lote", "items": items})
+        response.raise_for_status()
+        if response.text.startswith("Error"):
+            raise ApiError(response.text)
+        results = response.json().get("results", [])
+        if len(results) != len(items):
+            # No se sabe qué filas se guardaron: se invalidan todas y se
+            # resincroniza la réplica antes de avisar
+            for item in items:
+                self.invalidate_proforma(item.get("numeroProforma"))
+            self._request_replica_sync()
+            raise ApiError(f"El servidor devolvió {len(results)} resultados para "
+                           f"{len(items)} filas.")
+
+        saved = [item for item, result in zip(items, results) if result.get("ok")]
+        for item in saved:
+            self.invalidate_proforma(item.get("numeroProforma"))
+            if self.replica is not None:
+                self.replica.apply_post(dict(item, section=section))
+        if saved:
+            self._request_replica_sync()
+        return results
+
+    # ----------------------------------------------------------------
+    #  Medición
+    # ----------------------------------------------------------------
+    def _post_json(self, action, data):
+        # Se serializa aquí para conocer el tamaño del cuerpo enviado
+        body = json.dumps(data).encode("utf-8")
+        return self._timed(
+            action, "POST", len(body),
+            lambda: self.session.post(self.api_url, data=body, timeout=self.timeout,
+                                      headers={"Content-Type": "application/json"})
+        )
+
+    def _timed(self, action, method, bytes_out, send):
+        """Ejecuta send() y registra latencia, tamaños y estado."""
+        start = time.perf_counter()
+        try:
+            response = send()
+        except Exception as e:
+            self.metrics.record(action, method, type(e).__name__,
+                                (time.perf_counter() - start) * 1000, bytes_out, ok=False)
+            raise
+        # Apps Script responde 200 también en los errores ('Error: ...')
+        ok = response.status_code == 200 and not response.content.startswith(b"Error")
+        self.metrics.record(action, method, response.status_code,
+                            (time.perf_counter() - start) * 1000, bytes_out,
+                            len(response.content), ok=ok)
+        return response
+
+    def _record_local(self, action, source, start):
+        self.metrics.record(action, "GET", 200, (time.perf_counter() - start) * 1000,
+                            source=source)
+
+    @staticmethod
+    def _write_succeeded(response):
+        # Apps Script responde 200 también en los errores ('Error: ...')
+        return response.status_code == 200 and "Error" not in response.text
+
+    def _request_replica_sync(self):
+        if self.replica_sync is not None:
+            self.replica_sync.notify_write()
+
+    def invalidate_proforma(self, numero_proforma=None):
+        """Olvida los datos cacheados de una proforma (o de todas) y la lista."""
+        if numero_proforma:
+            self.cache.invalidate("getFullProformaData", numeroProforma=numero_proforma)
+        else:
+            self.cache.invalidate("getFullProformaData")
+        self.cache.invalidate("getAllProformas")
+
+    def close(self):
+        self.session.close()
+
+
+# --------------------------------------------------------------------
+#  Instancia única del proceso
+# --------------------------------------------------------------------
+_client = None
+
+
+def get_client(api_url=""):
+    """
+    Devuelve el ApiClient compartido por todas las ventanas.
+    Se crea una sola vez; si la URL cambió, se actualiza sin recrear la sesión.
+    """
+    global _client
+    if _client is None:
+        _client = ApiClient(api_url)
+    elif api_url and api_url != _client.api_url:
+        _client.set_url(api_url)
+    return _client
@@ -0,0 +1,208 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+
+# Límites superiores (ms) de los cubos del histograma; lo que pasa del último
+# cae en un cubo abierto cuyo valor es el máximo observado.
+BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+# Módulo que hace la llamada, por hilo (lo fija ApiExecutor en cada job)
+_context = threading.local()
+
+
+@contextmanager
+def module_scope(module):
+    """Etiqueta con 'module' las llamadas a la API hechas dentro del bloque."""
+    previous = getattr(_context, "module", None)
+    _context.module = module
+    try:
+        yield
+    finally:
+        _context.module = previous
+
+
+def current_module():
+    return getattr(_context, "module", None) or "-"
+
+
+class LatencyHistogram:
+    """Conteo por cubos de latencia + totales de una acción."""
+    __slots__ = ("counts", "calls", "errors", "total_ms", "max_ms", "bytes_out", "bytes_in")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.calls = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.bytes_out = 0
+        self.bytes_in = 0
+
+    def add(self, elapsed_ms, ok, bytes_out, bytes_in):
+        index = 0
+        while index < len(BUCKETS_MS) and elapsed_ms > BUCKETS_MS[index]:
+            index += 1
+        self.counts[index] += 1
+        self.calls += 1
+        self.errors += 0 if ok else 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.bytes_out += bytes_out
+        self.bytes_in += bytes_in
+
+    def merge(self, other):
+        for i, count in enumerate(other.counts):
+            self.counts[i] += count
+        self.calls += other.calls
+        self.errors += other.errors
+        self.total_ms += other.total_ms
+        self.max_ms = max(self.max_ms, other.max_ms)
+        self.bytes_out += other.bytes_out
+        self.bytes_in += other.bytes_in
+
+    def percentile(self, p):
+        """Límite superior del cubo que contiene el percentil p (0..1)."""
+        if not self.calls:
+            return 0.0
+        rank = max(1, round(p * self.calls))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                bound = BUCKETS_MS[index] if index < len(BUCKETS_MS) else self.max_ms
+                return float(min(bound, self.max_ms))
+        return self.max_ms
+
+
+class ApiMetrics:
+    """
+    Latencias de las llamadas a la API agrupadas por (módulo, método, acción, origen).
+
+    - Anillo de 'windows' histogramas de 'window_seconds' cada uno: la memoria
+      es fija y summary() puede mirar solo los últimos minutos.
+    - Con enable_log() cada llamada se agrega como una línea JSON a un archivo
+      rotativo; dump() agrega además el resumen actual.
+    origen: 'red' (Apps Script), 'cache' (ResponseCache) o 'replica' (SQLite local).
+    """
+    LOG_MAX_BYTES = 5 * 1024 * 1024
+    LOG_BACKUPS = 3
+
+    def __init__(self, window_seconds=60, windows=60):
+        self.window_seconds = window_seconds
+        self._windows = deque(maxlen=windows)  # (inicio, {clave: LatencyHistogram})
+        self._lock = threading.Lock()
+        self._log = None
+        self.log_path = None
+
+    @staticmethod
+    def default_log_path():
+        return os.path.join(os.path.expanduser("~"), ".hermenca_erp", "api_metrics.jsonl")
+
+    def enable_log(self, path, max_bytes=None, backups=None):
+        """Escribe cada llamada en 'path' (JSONL), rotando a path.1 .. path.N."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        handler = RotatingFileHandler(
+            path, maxBytes=max_bytes or self.LOG_MAX_BYTES,
+            backupCount=backups or self.LOG_BACKUPS, encoding="utf-8"
+        )
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger = logging.getLogger(f"hermenca.api_metrics.{id(self)}")
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+        for old in list(logger.handlers):
+            logger.removeHandler(old)
+            old.close()
+        logger.addHandler(handler)
+        self._log = logger
+        self.log_path = path
+
+    # ----------------------------------------------------------------
+    #  Registro
+    # ----------------------------------------------------------------
+    def record(self, action, method, status, elapsed_ms, bytes_out=0, bytes_in=0,
+               ok=True, source="red", module=None):
+        module = module or current_module()
+        now = time.time()
+        key = (module, method, action, source)
+        with self._lock:
+            start = now - now % self.window_seconds
+            if not self._windows or self._windows[-1][0] != start:
+                self._windows.append((start, {}))
+            histograms = self._windows[-1][1]
+            histogram = histograms.get(key)
+            if histogram is None:
+                histogram = histograms[key] = LatencyHistogram()
+            histogram.add(elapsed_ms, ok, bytes_out, bytes_in)
+        if self._log is not None:
+            self._log.info(json.dumps({
+                "ts": datetime.fromtimestamp(now).isoformat(timespec="milliseconds"),
+                "module": module, "method": method, "action": action, "source": source,
+                "status": status, "ok": ok, "ms": round(elapsed_ms, 1),
+                "bytes_out": bytes_out, "bytes_in": bytes_in,
+            }, ensure_ascii=False))
+
+    # ----------------------------------------------------------------
+    #  Consulta
+    # ----------------------------------------------------------------
+    def summary(self, last_seconds=None):
+        """
+        Una fila por clave, ordenadas por tiempo total (lo que más pesa primero).
+        last_seconds=None abarca todo el anillo.
+        """
+        since = None if last_seconds is None else time.time() - last_seconds
+        merged = {}
+        with self._lock:
+            for start, histograms in self._windows:
+                if since is not None and start + self.window_seconds <= since:
+                    continue
+                for key, histogram in histograms.items():
+                    if key not in merged:
+                        merged[key] = LatencyHistogram()
+                    merged[key].merge(histogram)
+
+        rows = []
+        for (module, method, action, source), h in merged.items():
+            rows.append({
+                "module": module, "method": method, "action": action, "source": source,
+                "calls": h.calls, "errors": h.errors,
+                "p50_ms": round(h.percentile(0.50), 1),
+                "p95_ms": round(h.percentile(0.95), 1),
+                "max_ms": round(h.max_ms, 1),
+                "total_ms": round(h.total_ms, 1),
+                "bytes_out": h.bytes_out, "bytes_in": h.bytes_in,
+            })
+        rows.sort(key=lambda row: row["total_ms"], reverse=True)
+        return rows
+
+    def dump(self, last_seconds=None):
+        """Agrega el resumen al JSONL (una línea 'summary'). Devuelve la ruta."""
+        if self._log is None:
+            self.enable_log(self.default_log_path())
+        self._log.info(json.dumps({
+            "ts": datetime.now().isoformat(timespec="milliseconds"),
+            "summary": self.summary(last_seconds),
+        }, ensure_ascii=False))
+        return self.log_path
+
+    def reset(self):
+        with self._lock:
+            self._windows.clear()
+
+
+# --------------------------------------------------------------------
+#  Instancia única del proceso
+# --------------------------------------------------------------------
+_metrics = None
+
+
+def get_metrics():
+    global _metrics
+    if _metrics is None:
+        _metrics = ApiMetrics()
+    return _metrics
@@ -0,0 +1,160 @@
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal, Qt
+from PyQt5.QtWidgets import QApplication
+
+from api_metrics import module_scope
+from stall_watchdog import profile_action
+
+# Pool propio para I/O de red: las peticiones pasan casi todo el tiempo esperando,
+# así que no compiten con el globalInstance() (limitado al nº de CPUs).
+IO_MAX_THREADS = 8
+_io_pool = None
+
+
+def io_pool():
+    global _io_pool
+    if _io_pool is None:
+        _io_pool = QThreadPool()
+        _io_pool.setMaxThreadCount(IO_MAX_THREADS)
+    return _io_pool
+
+
+class _JobSignals(QObject):
+    finished = pyqtSignal(int, object)  # ticket, resultado
+    failed = pyqtSignal(int, object)    # ticket, excepción
+
+
+class _Job(QRunnable):
+    """Ejecuta fn(*args, **kwargs) en el pool y avisa por señal."""
+    def __init__(self, ticket, fn, args, kwargs, module=None):
+        super().__init__()
+        # El executor controla la vida del objeto (tryTake / cancelación)
+        self.setAutoDelete(False)
+        self.ticket = ticket
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.module = module
+        self.signals = _JobSignals()
+
+    def run(self):
+        try:
+            with module_scope(self.module):
+                result = self.fn(*self.args, **self.kwargs)
+        except Exception as e:
+            self.signals.failed.emit(self.ticket, e)
+            return
+        self.signals.finished.emit(self.ticket, result)
+
+
+class ApiExecutor(QObject):
+    """
+    Ejecuta llamadas a la API fuera del hilo de la GUI.
+
+    - submit(fn, ..., key=..., on_success=..., on_error=...) encola fn en el pool;
+      los callbacks se ejecutan de vuelta en el hilo de Qt. on_error es
+      obligatorio: cada llamador decide cómo mostrar el fallo en su ventana.
+    - Un 'key' identifica peticiones equivalentes (p.ej. "proforma"): al pedir
+      una nueva, la anterior se cancela y su resultado se descarta.
+    - Mientras haya peticiones pendientes se muestra el cursor de espera y se
+      emite busy_changed(True/False). Con wait_cursor=False (precargas en
+      segundo plano) solo se emite la señal.
+    - Las llamadas quedan etiquetadas en api_metrics con 'module' (por
+      defecto, la clase de la ventana dueña del executor).
+    """
+    busy_changed = pyqtSignal(bool)
+
+    def __init__(self, parent=None, pool=None, wait_cursor=True, module=None):
+        super().__init__(parent)
+        self.pool = pool or io_pool()
+        self.wait_cursor = wait_cursor
+        self.module = module or (type(parent).__name__ if parent is not None else None)
+        self._next_ticket = 0
+        self._pending = {}    # ticket -> (job, key, on_success, on_error)
+        self._latest = {}     # key -> ticket vigente
+        self._cancelled = {}  # ticket -> job ya en ejecución (se descarta al terminar)
+
+    @property
+    def busy(self):
+        return bool(self._pending)
+
+    def submit(self, fn, *args, on_error, key=None, on_success=None, **kwargs):
+        """Encola fn(*args, **kwargs). Devuelve el ticket de la petición."""
+        if key is not None:
+            self.cancel(key)
+
+        self._next_ticket += 1
+        ticket = self._next_ticket
+        job = _Job(ticket, fn, args, kwargs, self.module)
+        job.signals.finished.connect(self._on_finished)
+        job.signals.failed.connect(self._on_failed)
+
+        was_busy = self.busy
+        self._pending[ticket] = (job, key, on_success, on_error)
+        if key is not None:
+            self._latest[key] = ticket
+        if not was_busy:
+            self._set_busy(True)
+
+        self.pool.start(job)
+        return ticket
+
+    def cancel(self, key):
+        """Cancela la petición vigente con este key (si existe)."""
+        ticket = self._latest.pop(key, None)
+        if ticket is not None:
+            self._drop(ticket)
+
+    def cancel_all(self):
+        for ticket in list(self._pending):
+            self._drop(ticket)
+        self._latest.clear()
+
+    # ----------------------------------------------------------------
+    #  Internos
+    # ----------------------------------------------------------------
+    def _drop(self, ticket):
+        entry = self._pending.pop(ticket, None)
+        if entry is None:
+            return
+        job = entry[0]
+        # Si aún no arrancó, se saca de la cola; si no, se espera a que
+        # termine (manteniendo la referencia) y se ignora su resultado.
+        if not self.pool.tryTake(job):
+            self._cancelled[ticket] = job
+        if not self.busy:
+            self._set_busy(False)
+
+    def _take(self, ticket):
+        if self._cancelled.pop(ticket, None) is not None:
+            return None
+        entry = self._pending.pop(ticket, None)
+        if entry is None:
+            return None
+        key = entry[1]
+        if key is not None and self._latest.get(key) == ticket:
+            del self._latest[key]
+        if not self.busy:
+            self._set_busy(False)
+        return entry
+
+    def _on_finished(self, ticket, result):
+        entry = self._take(ticket)
+        if entry and entry[2]:
+            # Los callbacks corren en el hilo de Qt: se perfilan como una acción
+            with profile_action(entry[2]):
+                entry[2](result)
+
+    def _on_failed(self, ticket, error):
+        entry = self._take(ticket)
+        if entry is None:
+            return
+        with profile_action(entry[3]):
+            entry[3](error)
+
+    def _set_busy(self, busy):
+        if self.wait_cursor and QApplication.instance() is not None:
+            if busy:
+                QApplication.setOverrideCursor(Qt.WaitCursor)
+            else:
+                QApplication.restoreOverrideCursor()
+        self.busy_changed.emit(busy)
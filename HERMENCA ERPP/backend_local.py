@@ -0,0 +1,551 @@
+"""
+Servidor local que reemplaza al Apps Script (Get.gs + Postman) para trabajar
+sin conexión, hacer pruebas de carga y correr benchmarks.
+
+    python backend_local.py --port 8765 --db backend_local.sqlite3
+    -> en "Configuración de API": http://127.0.0.1:8765/exec
+
+Atiende las mismas acciones GET (doGet) y secciones POST (doPost), con las
+mismas respuestas: texto 'Error: ...' o JSON, siempre con status 200.
+Hoja1 se guarda en SQLite con una columna por letra (A..AQ) y cada hoja de
+proceso con su fila, la OT (columna A) y la fecha (columna E).
+Solo usa la biblioteca estándar.
+"""
+import argparse
+import json
+import re
+import sqlite3
+import threading
+from datetime import date, datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from replica import (
+    COMERCIAL_FIELDS, COMERCIAL_RANGE, DIAGRAMACION_FIELDS, DIAGRAMACION_RANGE,
+    PROCESS_KEYS, PROCESS_SHEETS, PRODUCCION_FIELDS, PRODUCCION_RANGE
+)
+
+
+def _column_letter(index):
+    letters = ""
+    index += 1
+    while index:
+        index, rem = divmod(index - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+COLUMNS = [_column_letter(i) for i in range(PRODUCCION_RANGE[1])]  # A..AQ
+MAX_PROFORMA_BLOCK = 100
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS hoja1 (
+    fila INTEGER PRIMARY KEY,
+    clave TEXT,
+    {columns}
+);
+CREATE INDEX IF NOT EXISTS hoja1_clave ON hoja1(clave);
+CREATE TABLE IF NOT EXISTS procesos (
+    proceso TEXT NOT NULL,
+    fila INTEGER NOT NULL,
+    ot,
+    clave TEXT,
+    fecha TEXT,
+    PRIMARY KEY (proceso, fila)
+);
+CREATE INDEX IF NOT EXISTS procesos_clave ON procesos(proceso, clave);
+CREATE INDEX IF NOT EXISTS procesos_fecha ON procesos(fecha);
+CREATE TABLE IF NOT EXISTS cambios_ots (
+    version INTEGER PRIMARY KEY,
+    op TEXT, proceso TEXT, ot, fecha TEXT
+);
+CREATE TABLE IF NOT EXISTS propiedades (
+    clave TEXT PRIMARY KEY,
+    valor TEXT
+);
+""".format(columns=",\n    ".join(f"{c} DEFAULT ''" for c in COLUMNS))
+
+_DDMMYYYY = re.compile(r"^(\d{2})/(\d{2})/(\d{4})$")
+_YYYYMMDD = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+_INTEGER = re.compile(r"^-?[1-9]\d{0,14}$")
+
+
+def _key(value):
+    """Misma igualdad que '==' en Apps Script (rowIndexKey en Index.gs): '0012' == 12."""
+    text = str(value).strip()
+    return str(int(text)) if text.isdigit() else text
+
+
+def _cell(value):
+    """
+    Lo que guardaría Sheets al escribir 'value': las fechas pasan a Date
+    (JSON.stringify -> ISO en UTC) y los enteros simples a número.
+    """
+    if isinstance(value, str):
+        text = value.strip()
+        m = _DDMMYYYY.match(text)
+        if m:
+            return f"{m.group(3)}-{m.group(2)}-{m.group(1)}T00:00:00.000Z"
+        if _YYYYMMDD.match(text):
+            return f"{text}T00:00:00.000Z"
+        if _INTEGER.match(text):
+            return int(text)
+    return value
+
+
+def _blank(values):
+    return all(str(v).strip() == "" for v in values)
+
+
+class LocalBackend:
+    """
+    Estado de la 'planilla' y la lógica de doGet/doPost.
+    handle_get/handle_post devuelven (content_type, cuerpo); el servidor HTTP
+    solo traduce. Un único lock serializa todo, como el bloqueo de script.
+    """
+    def __init__(self, path=":memory:"):
+        self.path = path
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        if path != ":memory:":
+            self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    # ----------------------------------------------------------------
+    #  Acceso a la "planilla"
+    # ----------------------------------------------------------------
+    def last_row(self):
+        return self.conn.execute("SELECT COALESCE(MAX(fila), 1) FROM hoja1").fetchone()[0]
+
+    def _rows(self, first, last):
+        """Filas first..last de Hoja1 (43 valores cada una; las que no existen, en blanco)."""
+        stored = {
+            row[0]: list(row[1:])
+            for row in self.conn.execute(
+                f"SELECT fila, {', '.join(COLUMNS)} FROM hoja1 WHERE fila BETWEEN ? AND ?",
+                (first, last)
+            )
+        }
+        blank = [""] * len(COLUMNS)
+        return [(fila, stored.get(fila, blank)) for fila in range(first, last + 1)]
+
+    def _row(self, fila):
+        return self._rows(fila, fila)[0][1]
+
+    def _write(self, fila, start, values):
+        """Escribe values desde la columna 'start' (0 = A) en la fila indicada."""
+        cols = COLUMNS[start:start + len(values)]
+        cells = [_cell(v) for v in values]
+        self.conn.execute("INSERT OR IGNORE INTO hoja1 (fila) VALUES (?)", (fila,))
+        self.conn.execute(
+            f"UPDATE hoja1 SET {', '.join(f'{c}=?' for c in cols)} WHERE fila=?",
+            (*cells, fila)
+        )
+        if start == 0:
+            self.conn.execute("UPDATE hoja1 SET clave=? WHERE fila=?", (_key(cells[0]), fila))
+
+    def find_row_by_proforma(self, numero):
+        row = self.conn.execute(
+            "SELECT MIN(fila) FROM hoja1 WHERE clave=? AND fila >= 2", (_key(numero),)
+        ).fetchone()
+        return row[0]
+
+    def next_available_row(self):
+        """Primera fila con A..O en blanco (getNextAvailableRow); los huecos cuentan como vacías."""
+        blank = " AND ".join(f"TRIM({c}) = ''" for c in COLUMNS[:15])
+        candidates = [
+            # Primera fila guardada con A..O en blanco
+            f"SELECT MIN(fila) FROM hoja1 WHERE fila >= 2 AND {blank}",
+            # Primer hueco (fila sin guardar) antes de la última
+            "SELECT MIN(h.fila + 1) FROM hoja1 h WHERE h.fila >= 1 AND h.fila + 1 < "
+            "(SELECT MAX(fila) FROM hoja1) AND NOT EXISTS (SELECT 1 FROM hoja1 WHERE fila = h.fila + 1)",
+        ]
+        rows = [self.conn.execute(sql).fetchone()[0] for sql in candidates]
+        if not self.conn.execute("SELECT 1 FROM hoja1 WHERE fila = 2").fetchone() and self.last_row() > 2:
+            rows.append(2)
+        rows = [r for r in rows if r is not None]
+        return min(rows) if rows else self.last_row() + 1
+
+    def _prop(self, clave, default=None):
+        row = self.conn.execute("SELECT valor FROM propiedades WHERE clave=?", (clave,)).fetchone()
+        return row[0] if row else default
+
+    def _set_prop(self, clave, valor):
+        self.conn.execute("INSERT OR REPLACE INTO propiedades VALUES (?, ?)", (clave, str(valor)))
+
+    def bulk_load(self, rows, process_ots):
+        """
+        Reemplaza todo el contenido (datasets de prueba).
+        rows: filas de Hoja1 desde la 2, con hasta 43 valores (A..AQ) cada una.
+        process_ots: {proceso: [[ot, fecha o None], ...]} en orden de fila.
+        """
+        with self._lock, self.conn:
+            for table in ("hoja1", "procesos", "cambios_ots", "propiedades"):
+                self.conn.execute(f"DELETE FROM {table}")
+            blank = [""] * len(COLUMNS)
+            self.conn.executemany(
+                f"INSERT INTO hoja1 (fila, clave, {', '.join(COLUMNS)}) "
+                f"VALUES ({', '.join('?' * (len(COLUMNS) + 2))})",
+                (
+                    (fila, _key(values[0]) if values else "",
+                     *[_cell(v) for v in (list(values) + blank)[:len(COLUMNS)]])
+                    for fila, values in enumerate(rows, start=2)
+                )
+            )
+            self.conn.executemany(
+                "INSERT INTO procesos VALUES (?, ?, ?, ?, ?)",
+                (
+                    (proceso, fila, _cell(ot), _key(ot), _cell(fecha) if fecha else None)
+                    for proceso, ots in process_ots.items()
+                    for fila, (ot, fecha) in enumerate(ots, start=2)
+                )
+            )
+
+    # ----------------------------------------------------------------
+    #  OTs y versionado
+    # ----------------------------------------------------------------
+    def collect_process_ots(self):
+        response = {}
+        for proceso, ot, fecha in self.conn.execute(
+            "SELECT proceso, ot, fecha FROM procesos WHERE ot != '' ORDER BY proceso, fila"
+        ):
+            response.setdefault(proceso, []).append([ot, fecha or "No asignada"])
+        return {name: response[name] for name in PROCESS_SHEETS if name in response}
+
+    def ots_version(self):
+        return int(self._prop("OTS_VERSION", "0"))
+
+    def log_ot_changes(self, changes):
+        version = self.ots_version()
+        for op, proceso, ot, fecha in changes:
+            version += 1
+            self.conn.execute(
+                "INSERT INTO cambios_ots VALUES (?, ?, ?, ?, ?)",
+                (version, op, proceso, ot, fecha or "No asignada")
+            )
+        if changes:
+            self._set_prop("OTS_VERSION", version)
+
+    def append_ot(self, proceso, ot):
+        """Añade la OT al final de la hoja de proceso si no está (handleProduccion)."""
+        clave = _key(ot)
+        exists = self.conn.execute(
+            "SELECT 1 FROM procesos WHERE proceso=? AND clave=? LIMIT 1", (proceso, clave)
+        ).fetchone()
+        if exists:
+            return False
+        fila = self.conn.execute(
+            "SELECT COALESCE(MAX(fila), 1) + 1 FROM procesos WHERE proceso=?", (proceso,)
+        ).fetchone()[0]
+        self.conn.execute(
+            "INSERT INTO procesos VALUES (?, ?, ?, ?, NULL)", (proceso, fila, _cell(ot), clave)
+        )
+        return True
+
+    # ----------------------------------------------------------------
+    #  doGet
+    # ----------------------------------------------------------------
+    def handle_get(self, params):
+        action = params.get("action")
+        handler = getattr(self, f"get_{action}", None) if action else None
+        if handler is None:
+            return _text("Action not recognized")
+        with self._lock:
+            try:
+                with self.conn:
+                    return handler(params)
+            except Exception as e:
+                return _text(f"Error: {e}")
+
+    def get_loadOTs(self, params):
+        if "since" not in params:
+            return _json(self.collect_process_ots())
+        try:
+            since = int(params["since"])
+        except ValueError:
+            since = 0
+        version = self.ots_version()
+        if since <= 0 or since > version:
+            return _json({"version": version, "full": True, "ots": self.collect_process_ots()})
+        changes = [
+            list(row) for row in self.conn.execute(
+                "SELECT op, proceso, ot, fecha FROM cambios_ots WHERE version > ? ORDER BY version",
+                (since,)
+            )
+        ]
+        return _json({"version": version, "full": False, "changes": changes})
+
+    def get_loadOTsRange(self, params):
+        start, end = params.get("from"), params.get("to")
+        if not start or not end:
+            return _text("Error: Faltan los parámetros from/to.")
+        names = params["process"].split(",") if params.get("process") else PROCESS_SHEETS
+        response = {}
+        for name in names:
+            rows = self.conn.execute(
+                "SELECT ot, fecha FROM procesos WHERE proceso=? AND ot != '' ORDER BY fila", (name,)
+            ).fetchall()
+            if not rows:
+                continue
+            in_range = sorted(
+                ((fecha[:10], i, ot) for i, (ot, fecha) in enumerate(rows)
+                 if fecha and start <= fecha[:10] <= end)
+            )
+            response[name] = [[ot, day] for day, _, ot in in_range]
+        return _json({"from": start, "to": end, "ots": response})
+
+    def _set_ot_date(self, params, fecha, empty_error):
+        proceso, ot = params.get("process"), params.get("ot", "")
+        if proceso not in PROCESS_SHEETS:
+            return _text("Error: Sheet not found")
+        if not self.conn.execute("SELECT 1 FROM procesos WHERE proceso=? LIMIT 1", (proceso,)).fetchone():
+            return _text(empty_error)
+        row = self.conn.execute(
+            "SELECT MIN(fila) FROM procesos WHERE proceso=? AND clave=?", (proceso, _key(ot))
+        ).fetchone()[0]
+        if row is None:
+            return _text("Error: OT not found in sheet")
+        stored = _cell(fecha) if fecha else None
+        self.conn.execute("UPDATE procesos SET fecha=? WHERE proceso=? AND fila=?", (stored, proceso, row))
+        self.log_ot_changes([["set", proceso, ot, fecha or "No asignada"]])
+        return _text("Success")
+
+    def get_assign(self, params):
+        return self._set_ot_date(params, params.get("date", ""), "Error: No data to assign in sheet")
+
+    def get_remove(self, params):
+        return self._set_ot_date(params, None, "Error: No data to remove in sheet")
+
+    def _check_complete(self, start, end):
+        values = self._row(2)[start:end]
+        return _json({"completo": all(str(v).strip() != "" for v in values)})
+
+    def get_checkComercial(self, params):
+        return self._check_complete(*COMERCIAL_RANGE)
+
+    def get_checkDiagramacion(self, params):
+        return self._check_complete(*DIAGRAMACION_RANGE)
+
+    def get_getRowData(self, params):
+        try:
+            fila = int(params.get("row", ""))
+        except ValueError:
+            return _text("Error: Invalid row parameter.")
+        return _json({"fila": fila, "datos": self._row(fila)})
+
+    def _available_rows(self, start, end):
+        rows = [
+            {"row": fila} for fila, values in self._rows(2, self.last_row())
+            if _blank(values[start:end])
+        ]
+        return _json({"availableRows": rows})
+
+    def get_getAvailableDiagramacionRows(self, params):
+        return self._available_rows(7, 14)    # H..N
+
+    def get_getAvailableProductionRows(self, params):
+        return self._available_rows(14, 21)   # O..U
+
+    def get_getLastProforma(self, params):
+        last = self.last_row()
+        if last < 2:
+            return _json({"lastProforma": "0000"})
+        return _json({"lastProforma": self._row(last)[0]})
+
+    def reserve_proforma_numbers(self, count):
+        """
+        Contador atómico (reserveProformaNumbers en Postman). Devuelve el primero.
+        Nunca queda por debajo del mayor número de la columna A; no se reinicia por año.
+        """
+        stored = self._prop("PROFORMA_COUNTER")
+        counter = 0 if stored is None else int(stored)
+        numbers = (_leading_int(row[0]) for row in self.conn.execute("SELECT A FROM hoja1 WHERE fila >= 2"))
+        counter = max([counter, *(n for n in numbers if n is not None)])
+        self._set_prop("PROFORMA_COUNTER", counter + count)
+        return counter + 1
+
+    def get_reserveProformas(self, params):
+        try:
+            count = int(params.get("count", "1"))
+        except ValueError:
+            count = 0
+        if count < 1 or count > MAX_PROFORMA_BLOCK:
+            return _text(f"Error: count debe estar entre 1 y {MAX_PROFORMA_BLOCK}.")
+        first = self.reserve_proforma_numbers(count)
+        suffix = f"{date.today().year % 100:02d}"
+        numbers = [f"{first + i:04d}-{suffix}" for i in range(count)]
+        return _json({"first": first, "count": count, "numbers": numbers})
+
+    def get_getAllProformas(self, params):
+        proformas = [
+            row[0] for row in self.conn.execute("SELECT A FROM hoja1 WHERE fila >= 3 ORDER BY fila")
+            if str(row[0]).strip() != ""
+        ]
+        return _json({"proformas": proformas})
+
+    def get_getFullProformaData(self, params):
+        numero = params.get("numeroProforma")
+        if not numero:
+            return _text("Error: No se proporcionó un número de proforma.")
+        fila = self.find_row_by_proforma(numero)
+        if fila is None:
+            return _json({"error": "Error: Proforma not found"})
+        values = self._row(fila)
+        return _json({
+            "Comercial": values[slice(*COMERCIAL_RANGE)],
+            "Diagramacion": values[slice(*DIAGRAMACION_RANGE)],
+            "Produccion": values[slice(*PRODUCCION_RANGE)],
+        })
+
+    def get_getSnapshot(self, params):
+        rows = [values for _, values in self._rows(2, self.last_row())] if self.last_row() >= 2 else []
+        return _json({"firstRow": 2, "hoja1": rows, "ots": self.collect_process_ots(),
+                      "otsVersion": self.ots_version()})
+
+    # ----------------------------------------------------------------
+    #  doPost
+    # ----------------------------------------------------------------
+    def handle_post(self, data):
+        with self._lock:
+            try:
+                with self.conn:
+                    return self._post(data)
+            except Exception as e:
+                return _text(f"Error: {e}")
+
+    def _post(self, data):
+        section = data.get("section")
+        if not section:
+            return _text("Error: La sección no está especificada.")
+        if section == "ComercialLote":
+            return _json({"results": self.post_comercial_lote(data.get("items") or [])})
+        if section not in ("Comercial", "Diagramacion", "Produccion"):
+            return _text("Error: Sección no reconocida.")
+
+        numero = data.get("numeroProforma") or f"{self.reserve_proforma_numbers(1):04d}"
+        if data.get("targetRow"):
+            fila = int(data["targetRow"])
+        else:
+            fila = self.find_row_by_proforma(numero) or self.next_available_row()
+
+        if section == "Comercial":
+            self._write(fila, 0, [numero] + [data.get(f) or "" for f in COMERCIAL_FIELDS[1:]])
+        elif section == "Diagramacion":
+            self._write(fila, DIAGRAMACION_RANGE[0], [data.get(f) or "" for f in DIAGRAMACION_FIELDS])
+        else:
+            self._write(fila, PRODUCCION_RANGE[0], [data.get(f) or "" for f in PRODUCCION_FIELDS])
+            ot = data.get("numeroOT") or ""
+            changes = []
+            if ot != "":
+                for flag, proceso in PROCESS_KEYS.items():
+                    if data.get(flag) == "X" and self.append_ot(proceso, ot):
+                        changes.append(["add", proceso, ot, "No asignada"])
+            self.log_ot_changes(changes)
+
+        return _text(f"Proforma {numero} actualizada correctamente.")
+
+    def post_comercial_lote(self, items):
+        results = []
+        for item in items:
+            numero = item.get("numeroProforma") or ""
+            values = [numero] + [item.get(f) or "" for f in COMERCIAL_FIELDS[1:]]
+            if any(v == "" for v in values):
+                results.append({"numeroProforma": numero, "ok": False, "error": "Formulario incompleto."})
+                continue
+            fila = self.find_row_by_proforma(numero) or self.next_available_row()
+            self._write(fila, 0, values)
+            results.append({"numeroProforma": numero, "ok": True, "row": fila})
+        return results
+
+
+def _leading_int(value):
+    """parseInt de JavaScript: '0012-25' -> 12; None si no empieza con dígitos."""
+    m = re.match(r"^\s*(\d+)", str(value))
+    return int(m.group(1)) if m else None
+
+
+def _text(body):
+    return "text/plain; charset=utf-8", body
+
+
+def _json(data):
+    return "application/json", json.dumps(data, ensure_ascii=False, default=_json_default)
+
+
+def _json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(type(value).__name__)
+
+
+# --------------------------------------------------------------------
+#  Servidor HTTP
+# --------------------------------------------------------------------
+class _Handler(BaseHTTPRequestHandler):
+    backend = None  # LocalBackend (se fija en make_server)
+    verbose = False
+
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)
+        params = {k: v[0] for k, v in query.items()}
+        if not params:
+            self._reply(_text("Error: No parameters received."))
+            return
+        self._reply(self.backend.handle_get(params))
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            data = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError as e:
+            self._reply(_text(f"Error: {e}"))
+            return
+        self._reply(self.backend.handle_post(data))
+
+    def _reply(self, result):
+        content_type, body = result
+        payload = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, fmt, *args):
+        if self.verbose:
+            super().log_message(fmt, *args)
+
+
+def make_server(backend, host="127.0.0.1", port=8765, verbose=False):
+    """ThreadingHTTPServer listo para serve_forever(); port=0 elige uno libre."""
+    handler = type("Handler", (_Handler,), {"backend": backend, "verbose": verbose})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def start_in_thread(backend, host="127.0.0.1", port=0):
+    """Arranca el servidor en un hilo daemon. Devuelve (server, url de /exec)."""
+    server = make_server(backend, host, port)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/exec"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backend local (reemplazo del Apps Script).")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--db", default="backend_local.sqlite3", help="archivo SQLite (':memory:' para no guardar)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="registrar cada petición")
+    args = parser.parse_args()
+
+    server = make_server(LocalBackend(args.db), args.host, args.port, args.verbose)
+    print(f"Backend local en http://{args.host}:{server.server_address[1]}/exec")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+"""
+Benchmark de extremo a extremo de los módulos, sin pantalla (Qt offscreen).
+
+Levanta backend_local.py en un puerto libre, lo llena con un dataset
+de synthetic_data.py por cada tamaño y maneja las ventanas reales (Comercial,
+Diagramación, Producción, Programación de Tareas y Plan de Producción)
+midiendo cada acción desde el clic hasta que su ApiExecutor queda libre.
+
+    python benchmark.py                          # 100, 10k y 100k proformas
+    python benchmark.py --sizes 100 10000 -r 30 --out bench.json
+    python benchmark.py --compare bench_anterior.json
+
+Los resultados (p50/p95/media en ms por acción) se guardan en JSON junto
+con el commit, para comparar entre versiones.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtWidgets import QApplication, QMessageBox
+
+from api_client import ApiClient
+from backend_local import LocalBackend, start_in_thread
+from comercial import ComercialFormWindow
+from diagramacion import DiagramacionFormWindow
+from produccion import ProduccionFormWindow
+from produccionplan import ProductionPlanerWindow
+from replica import LocalReplica
+from synthetic_data import generate
+from taskprogram import TaskWindow
+
+DEFAULT_SIZES = (100, 10_000, 100_000)
+ACTION_TIMEOUT = 120  # segundos
+PASTE_ROWS = 300      # filas pegadas en la grilla de Comercial
+
+
+# --------------------------------------------------------------------
+#  Medición
+# --------------------------------------------------------------------
+class Recorder:
+    def __init__(self, app):
+        self.app = app
+        self.samples = {}
+        self.dialogs = []
+
+    def wait_idle(self, executor):
+        deadline = time.monotonic() + ACTION_TIMEOUT
+        while True:
+            self.app.processEvents()
+            if not executor.busy:
+                return
+            if time.monotonic() > deadline:
+                raise TimeoutError("la acción no terminó a tiempo")
+            time.sleep(0.0005)
+
+    def measure(self, name, action, executor_of):
+        """action() dispara la acción; executor_of(resultado) da el executor a esperar."""
+        start = time.perf_counter()
+        result = action()
+        self.wait_idle(executor_of(result))
+        self.samples.setdefault(name, []).append((time.perf_counter() - start) * 1000)
+        return result
+
+    def summary(self):
+        return {name: _stats(values) for name, values in self.samples.items()}
+
+
+def _stats(values):
+    ordered = sorted(values)
+
+    def rank(p):
+        # Percentil por rango más cercano
+        return ordered[max(0, math.ceil(p * len(ordered)) - 1)]
+
+    return {
+        "n": len(ordered),
+        "p50": round(rank(0.50), 2),
+        "p95": round(rank(0.95), 2),
+        "mean": round(statistics.fmean(ordered), 2),
+    }
+
+
+def silence_dialogs(recorder):
+    """Los QMessageBox modales bloquearían el benchmark: se registran y se aceptan."""
+    def fake(kind):
+        def show(parent, title, text, *args, **kwargs):
+            recorder.dialogs.append((kind, title, text))
+            return QMessageBox.Ok
+        return staticmethod(show)
+
+    for kind in ("information", "warning", "critical", "question"):
+        setattr(QMessageBox, kind, fake(kind))
+
+
+def close(window):
+    window.executor.cancel_all()
+    window.close()
+    window.deleteLater()
+
+
+# --------------------------------------------------------------------
+#  Escenarios por módulo
+# --------------------------------------------------------------------
+def bench_comercial(rec, client, repeats, rng):
+    for i in range(repeats):
+        window = rec.measure("comercial.open", lambda: ComercialFormWindow(api_client=client),
+                             lambda w: w.executor)
+        today = date.today().strftime("%d/%m/%Y")
+        # Pegado de una licitación grande en la grilla (sin enviar)
+        block = [["Bench", f"Cliente bench {i}", "A", f"Renglón {n}", str(rng.randint(100, 5000)), today]
+                 for n in range(PASTE_ROWS)]
+        rec.measure("comercial.paste", lambda: window.grid_model.paste(0, 1, block),
+                    lambda _: window.executor)
+        window.grid_model.remove_row_set(range(1, PASTE_ROWS))
+        rec.measure("comercial.create", window.submit_create_mode, lambda _: window.executor)
+        rec.measure("comercial.edit_list", window.load_proformas_for_edit, lambda _: window.executor)
+        close(window)
+
+
+def _select_random(rec, window, name, rng):
+    combo = window.numero_proforma
+    if combo.count() > 1:
+        index = rng.randrange(combo.count())
+        if index == combo.currentIndex():
+            index = (index + 1) % combo.count()
+        rec.measure(name, lambda: combo.setCurrentIndex(index), lambda _: window.executor)
+
+
+def bench_diagramacion(rec, client, repeats, rng):
+    window = rec.measure("diagramacion.open", lambda: DiagramacionFormWindow(api_client=client),
+                         lambda w: w.executor)
+    for _ in range(repeats):
+        _select_random(rec, window, "diagramacion.select", rng)
+        window.disenador.setText("Bench")
+        window.fecha_recepcion_artes.setText(date.today().strftime("%d/%m/%Y"))
+        rec.measure("diagramacion.save", window.enviar_datos, lambda _: window.executor)
+    close(window)
+
+
+def bench_produccion(rec, client, repeats, rng):
+    window = rec.measure("produccion.open", lambda: ProduccionFormWindow(api_client=client),
+                         lambda w: w.executor)
+    labels = list(window.checkboxes)
+    for i in range(repeats):
+        _select_random(rec, window, "produccion.select", rng)
+        window.numero_ot.setText(str(900_000 + i))
+        for label in labels:
+            window.checkboxes[label].setChecked(False)
+        for label in rng.sample(labels, 3):
+            window.checkboxes[label].setChecked(True)
+        rec.measure("produccion.save", window.enviar_datos, lambda _: window.executor)
+    close(window)
+
+
+def bench_taskprogram(rec, client, repeats, rng):
+    window = rec.measure("taskprogram.open", lambda: TaskWindow(api_client=client),
+                         lambda w: w.executor)
+    day = date.today().isoformat()
+    for _ in range(repeats):
+        process = rng.choice(list(window.process_ot_data) or [None])
+        unassigned = window.ot_index.unassigned(process)
+        if not unassigned:
+            break
+        ot = rng.choice(unassigned)
+        rec.measure("taskprogram.assign", lambda: window.send_task_to_api(ot, process, day),
+                    lambda _: window.executor)
+        rec.measure("taskprogram.remove", lambda: window.remove_assigned_task(ot, process, day),
+                    lambda _: window.executor)
+        # La recarga diferida (reconcile) se mide aparte, no dentro de la siguiente acción
+        window.reconcile_timer.stop()
+    rec.measure("taskprogram.reload", window.load_process_data, lambda _: window.executor)
+    close(window)
+
+
+def bench_plan(rec, client, repeats, rng):
+    window = rec.measure("plan.open", lambda: ProductionPlanerWindow(api_client=client),
+                         lambda w: w.executor)
+    for i in range(repeats):
+        step = window.show_next_week if i % 2 == 0 else window.show_previous_week
+        rec.measure("plan.change_week", step, lambda _: window.executor)
+    window.prefetcher.cancel_all()
+    close(window)
+
+
+SCENARIOS = {
+    "comercial": bench_comercial,
+    "diagramacion": bench_diagramacion,
+    "produccion": bench_produccion,
+    "taskprogram": bench_taskprogram,
+    "plan": bench_plan,
+}
+
+
+# --------------------------------------------------------------------
+#  Ejecución
+# --------------------------------------------------------------------
+def run_size(app, size, args):
+    backend = LocalBackend()
+    t0 = time.perf_counter()
+    generate(size, seed=args.seed).to_backend(backend)
+    seed_ms = (time.perf_counter() - t0) * 1000
+    server, url = start_in_thread(backend)
+
+    client = ApiClient(url)
+    if args.no_cache:
+        client.CACHEABLE_ACTIONS = {}
+    if args.replica:
+        # Archivo temporal: la réplica abre una conexión SQLite por hilo
+        replica = LocalReplica(os.path.join(tempfile.mkdtemp(), "replica.sqlite3"))
+        replica.bind_url(url)
+        replica.sync(client)
+        client.attach_replica(replica)
+
+    rec = Recorder(app)
+    silence_dialogs(rec)
+    rng = random.Random(args.seed)
+    try:
+        for name in args.modules:
+            SCENARIOS[name](rec, client, args.repeats, rng)
+    finally:
+        client.close()
+        server.shutdown()
+        server.server_close()
+
+    errors = [d for d in rec.dialogs if d[0] == "critical"]
+    return {"seed_ms": round(seed_ms, 1), "errors": len(errors), "actions": rec.summary()}
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)), stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(report, baseline=None):
+    for size, data in report["results"].items():
+        print(f"\n== {size} proformas (carga {data['seed_ms']} ms, errores {data['errors']})")
+        print(f"{'acción':28} {'n':>4} {'p50 ms':>10} {'p95 ms':>10}" + ("  p95 vs base" if baseline else ""))
+        base = (baseline or {}).get("results", {}).get(size, {}).get("actions", {})
+        for name, s in data["actions"].items():
+            line = f"{name:28} {s['n']:>4} {s['p50']:>10.1f} {s['p95']:>10.1f}"
+            if name in base and base[name]["p95"]:
+                line += f"  {s['p95'] / base[name]['p95']:>8.2f}x"
+            print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de módulos contra backend_local.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    parser.add_argument("-r", "--repeats", type=int, default=20, help="repeticiones por acción")
+    parser.add_argument("--modules", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-cache", action="store_true", help="sin caché de respuestas en ApiClient")
+    parser.add_argument("--replica", action="store_true", help="servir lecturas desde la réplica SQLite local")
+    parser.add_argument("--out", default=f"benchmark_{datetime.now():%Y%m%d_%H%M%S}.json")
+    parser.add_argument("--compare", metavar="JSON", help="resultado anterior para comparar p95")
+    args = parser.parse_args()
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeats": args.repeats,
+            "cache": not args.no_cache,
+            "replica": args.replica,
+        },
+        "results": {},
+    }
+    for size in args.sizes:
+        print(f"Midiendo {size} proformas...", flush=True)
+        report["results"][str(size)] = run_size(app, size, args)
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    print(f"\nResultados guardados en {args.out}")
+
+
+if __name__ == "__main__":
+    main()
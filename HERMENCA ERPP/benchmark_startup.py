@@ -0,0 +1,197 @@
+"""
+Benchmark del arranque en frío de main.py, sin pantalla (Qt offscreen).
+
+Cada corrida es un proceso nuevo (módulos sin importar, HOME vacío: sin
+réplica ni caché previas) contra backend_local.py con un dataset de
+synthetic_data.py, y mide:
+
+    import_main   importar main.py (con todo lo que importe)
+    window        construir SoftwareWindow (réplica, Modbus, tareas de arranque)
+    splash        de la ventana creada al dashboard
+    total         del lanzamiento del proceso al dashboard
+    open.<ventana> primer show_* de cada módulo (import + construcción)
+
+    python benchmark_startup.py                        # 10 corridas, 2000 proformas
+    python benchmark_startup.py -r 20 --size 10000 --out arranque.json
+    python benchmark_startup.py --compare arranque_anterior.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+OPEN_HANDLERS = {
+    "comercial": ("show_commercial_form", "commercial_form"),
+    "diagramacion": ("show_diagramacion_form", "diagramacion_form"),
+    "produccion": ("show_production_form", "production_form"),
+    "taskprogram": ("show_task_program_form", "task_program_form"),
+    "plan": ("show_production_plan_form", "production_plan_form"),
+}
+HEAVY_MODULES = ("reportlab", "numpy", "pymodbus")
+CHILD_TIMEOUT = 120  # segundos
+RESULT_PREFIX = "RESULTADO "
+
+
+# --------------------------------------------------------------------
+#  Proceso hijo: una corrida
+# --------------------------------------------------------------------
+def run_child(url):
+    t0 = time.perf_counter()
+    import main
+    from PyQt5.QtCore import QSettings
+    from PyQt5.QtWidgets import QApplication, QMessageBox
+    t_import = time.perf_counter()
+
+    for kind in ("information", "warning", "critical", "question"):
+        setattr(QMessageBox, kind, staticmethod(lambda *args, **kwargs: QMessageBox.Ok))
+
+    app = QApplication(sys.argv)
+    QSettings("HermencaCorp", "ERPApp").setValue("api_url", url)
+
+    # Se envuelve en la clase, antes de crear la ventana, para cualquier
+    # forma de disparar el dashboard (timer fijo o fin de las tareas)
+    shown = {}
+    original = main.SoftwareWindow.show_dashboard
+
+    def show_dashboard(self):
+        shown.setdefault("at", time.perf_counter())
+        shown.setdefault("epoch", time.time())
+        shown.setdefault("modules", [m for m in HEAVY_MODULES if m in sys.modules])
+        original(self)
+
+    main.SoftwareWindow.show_dashboard = show_dashboard
+
+    t_window = time.perf_counter()
+    window = main.SoftwareWindow()
+    window.show()
+    t_built = time.perf_counter()
+
+    deadline = time.monotonic() + CHILD_TIMEOUT
+    while "at" not in shown and time.monotonic() < deadline:
+        app.processEvents()
+        time.sleep(0.001)
+    if "at" not in shown:
+        raise TimeoutError("el dashboard no apareció")
+
+    result = {
+        "import_main": (t_import - t0) * 1000,
+        "window": (t_built - t_window) * 1000,
+        "splash": (shown["at"] - t_built) * 1000,
+        "dashboard_epoch": shown["epoch"],
+        "modules_at_dashboard": shown["modules"],
+    }
+    for name, (handler, attribute) in OPEN_HANDLERS.items():
+        start = time.perf_counter()
+        getattr(window, handler)()
+        result[f"open.{name}"] = (time.perf_counter() - start) * 1000
+        form = getattr(window, attribute)
+        form.executor.cancel_all()
+        form.close()
+        app.processEvents()
+
+    print(RESULT_PREFIX + json.dumps(result), flush=True)
+    # Sin esperar a los hilos de fondo (Modbus, réplica, poller)
+    os._exit(0)
+
+
+# --------------------------------------------------------------------
+#  Proceso padre: backend y corridas
+# --------------------------------------------------------------------
+def run_once(url):
+    home = tempfile.mkdtemp(prefix="hermenca_arranque_")
+    env = dict(os.environ, HOME=home, XDG_CONFIG_HOME=os.path.join(home, ".config"),
+               QT_QPA_PLATFORM="offscreen", HERMENCA_STALL_MS="0")
+    env.pop("HERMENCA_PROFILE", None)
+    launched = time.time()
+    proc = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", url],
+        cwd=HERE, env=env, capture_output=True, text=True, timeout=CHILD_TIMEOUT
+    )
+    for line in proc.stdout.splitlines():
+        if line.startswith(RESULT_PREFIX):
+            result = json.loads(line[len(RESULT_PREFIX):])
+            result["total"] = (result.pop("dashboard_epoch") - launched) * 1000
+            return result
+    raise RuntimeError(f"la corrida falló:\n{proc.stderr[-2000:]}")
+
+
+def print_report(report, baseline=None):
+    base = (baseline or {}).get("actions", {})
+    print(f"\n== Arranque ({report['meta']['size']} proformas, {report['meta']['runs']} corridas)")
+    print(f"{'medida':24} {'p50 ms':>10} {'p95 ms':>10}" + ("  p50 vs base" if baseline else ""))
+    for name, s in report["actions"].items():
+        line = f"{name:24} {s['p50']:>10.1f} {s['p95']:>10.1f}"
+        if name in base and base[name]["p50"]:
+            line += f"  {s['p50'] / base[name]['p50']:>8.2f}x"
+        print(line)
+    print(f"Módulos pesados cargados al mostrar el dashboard: "
+          f"{', '.join(report['modules_at_dashboard']) or 'ninguno'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del arranque en frío de main.py.")
+    parser.add_argument("-r", "--runs", type=int, default=10, help="procesos a lanzar")
+    parser.add_argument("--size", type=int, default=2000, help="proformas del dataset")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=f"arranque_{datetime.now():%Y%m%d_%H%M%S}.json")
+    parser.add_argument("--compare", metavar="JSON", help="resultado anterior para comparar p50")
+    parser.add_argument("--child", metavar="URL", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child)
+        return
+
+    from backend_local import LocalBackend, start_in_thread
+    from benchmark import _stats, git_commit
+    from synthetic_data import generate
+
+    backend = LocalBackend()
+    generate(args.size, seed=args.seed).to_backend(backend)
+    server, url = start_in_thread(backend)
+
+    samples, modules = {}, set()
+    try:
+        for i in range(args.runs):
+            print(f"Corrida {i + 1}/{args.runs}...", flush=True)
+            result = run_once(url)
+            modules.update(result.pop("modules_at_dashboard"))
+            for name, value in result.items():
+                samples.setdefault(name, []).append(value)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    order = ["total", "import_main", "window", "splash"]
+    order += [name for name in samples if name not in order]
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "runs": args.runs,
+            "size": args.size,
+        },
+        "actions": {name: _stats(samples[name]) for name in order},
+        "modules_at_dashboard": sorted(modules),
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    print(f"\nResultados guardados en {args.out}")
+
+
+if __name__ == "__main__":
+    main()
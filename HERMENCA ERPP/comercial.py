@@ -1,31 +1,277 @@
 import sys
-import requests
 from datetime import datetime
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QTabWidget, QVBoxLayout, QHBoxLayout,
-    QLineEdit, QPushButton, QLabel, QFormLayout, QScrollArea, QMessageBox,
-    QComboBox, QCalendarWidget, QSpacerItem, QSizePolicy
+    QLineEdit, QPushButton, QLabel, QFormLayout, QMessageBox,
+    QComboBox, QCalendarWidget, QSpacerItem, QSizePolicy, QTableView,
+    QAbstractItemView, QHeaderView, QStyledItemDelegate, QDateEdit
 )
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, QDate
+from PyQt5.QtGui import QColor, QKeySequence
+
+from api_worker import ApiExecutor
+from domain import Proforma, format_date, parse_date, parse_full_proforma
+
+
+# --------------------------------------------------------------------
+#  Grilla de carga masiva (pestaña "Crear")
+# --------------------------------------------------------------------
+GRID_HEADERS = [
+    "Nº Proforma", "Ejecutivo Comercial", "Cliente", "Clasificación",
+    "Descripción", "Cantidad de Pedido", "Fecha de Entrega",
+]
+INVALID_COLOR = QColor("#F8C4C4")
+NUMBER_COLOR = QColor("#EEEEEE")
+MAX_LISTED = 15  # filas que se detallan en los mensajes de resultado
+
+
+class ProformaGridModel(QAbstractTableModel):
+    """
+    Una fila por pedido nuevo. La columna 0 es el número provisional
+    (base + fila), calculado al pintar: agregar o quitar filas no renumera
+    nada. Las demás columnas guardan texto y se validan celda por celda.
+    """
+    NUMBER_COLUMN = 0
+    QUANTITY_COLUMN = 5
+    DATE_COLUMN = 6
+    FIELDS = len(GRID_HEADERS) - 1
+
+    def __init__(self, rows=1, parent=None):
+        super().__init__(parent)
+        self._rows = [[""] * self.FIELDS for _ in range(rows)]
+        self._base = None
+        self._suffix = 0
+        self.placeholder = "…"  # número mientras getLastProforma no respondió
+
+    # ----------------------------------------------------------------
+    #  Numeración provisional
+    # ----------------------------------------------------------------
+    def set_numbering(self, base, suffix):
+        self._base, self._suffix = base, suffix
+        if self._rows:
+            self.dataChanged.emit(self.index(0, 0), self.index(len(self._rows) - 1, 0))
+
+    def number(self, row):
+        if self._base is None:
+            return self.placeholder
+        return f"{self._base + row + 1:04d}-{self._suffix}"
+
+    # ----------------------------------------------------------------
+    #  Validación
+    # ----------------------------------------------------------------
+    def is_blank(self, row):
+        return not any(self._rows[row])
+
+    def error(self, row, col):
+        """Texto del error de la celda, o None si es válida."""
+        if col == self.NUMBER_COLUMN:
+            return None
+        text = self._rows[row][col - 1]
+        if not text:
+            # Las filas vacías se ignoran al enviar
+            return None if self.is_blank(row) else "Campo obligatorio"
+        if col == self.QUANTITY_COLUMN and not (text.isdigit() and int(text) > 0):
+            return "La cantidad debe ser un número entero mayor que 0"
+        if col == self.DATE_COLUMN and parse_date(text) is None:
+            return "Fecha inválida (dd/mm/aaaa)"
+        return None
+
+    def first_error(self):
+        """(fila, columna, error) de la primera celda inválida, o None."""
+        for row in range(len(self._rows)):
+            for col in range(1, self.columnCount()):
+                message = self.error(row, col)
+                if message:
+                    return row, col, message
+        return None
+
+    def entries(self):
+        """[(fila, Proforma)] de las filas no vacías (validar antes con first_error)."""
+        result = []
+        for row, values in enumerate(self._rows):
+            if not any(values):
+                continue
+            ejecutivo, cliente, clasificacion, descripcion, cantidad, fecha = values
+            result.append((row, Proforma(
+                numero="", ejecutivo=ejecutivo, cliente=cliente,
+                clasificacion=clasificacion, descripcion=descripcion,
+                cantidad=cantidad, fecha_entrega=parse_date(fecha),
+            )))
+        return result
+
+    # ----------------------------------------------------------------
+    #  QAbstractTableModel
+    # ----------------------------------------------------------------
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(GRID_HEADERS)
+
+    def flags(self, index):
+        flags = Qt.ItemIsEnabled | Qt.ItemIsSelectable
+        if index.column() != self.NUMBER_COLUMN:
+            flags |= Qt.ItemIsEditable
+        return flags
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row, col = index.row(), index.column()
+        if role in (Qt.DisplayRole, Qt.EditRole):
+            return self.number(row) if col == self.NUMBER_COLUMN else self._rows[row][col - 1]
+        if role == Qt.BackgroundRole:
+            if col == self.NUMBER_COLUMN:
+                return NUMBER_COLOR
+            return INVALID_COLOR if self.error(row, col) else None
+        if role == Qt.ToolTipRole:
+            return self.error(row, col)
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        return GRID_HEADERS[section] if orientation == Qt.Horizontal else str(section + 1)
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if role != Qt.EditRole or not index.isValid() or index.column() == self.NUMBER_COLUMN:
+            return False
+        self._set_cell(index.row(), index.column(), value)
+        # Toda la fila: vaciar o llenar una celda cambia el "obligatorio" de las demás
+        self.dataChanged.emit(self.index(index.row(), 1), self.index(index.row(), self.FIELDS))
+        return True
+
+    def _set_cell(self, row, col, value):
+        text = str(value or "").strip()
+        if col == self.DATE_COLUMN:
+            day = parse_date(text)
+            text = format_date(day) if day else text
+        self._rows[row][col - 1] = text
+
+    def insertRows(self, row, count, parent=QModelIndex()):
+        self.beginInsertRows(parent, row, row + count - 1)
+        self._rows[row:row] = [[""] * self.FIELDS for _ in range(count)]
+        self.endInsertRows()
+        return True
+
+    def removeRows(self, row, count, parent=QModelIndex()):
+        self.beginRemoveRows(parent, row, row + count - 1)
+        del self._rows[row:row + count]
+        self.endRemoveRows()
+        return True
+
+    # ----------------------------------------------------------------
+    #  Operaciones en bloque
+    # ----------------------------------------------------------------
+    def add_rows(self, count=1):
+        self.insertRows(len(self._rows), count)
+
+    def remove_row_set(self, rows):
+        """Quita las filas indicadas (un removeRows por tramo contiguo)."""
+        rows = sorted(set(rows), reverse=True)
+        while rows:
+            end = start = rows.pop(0)
+            while rows and rows[0] == start - 1:
+                start = rows.pop(0)
+            self.removeRows(start, end - start + 1)
+
+    def paste(self, row, col, block):
+        """
+        Copia 'block' (filas de celdas, p.ej. de Excel) desde (row, col);
+        agrega las filas que falten. Devuelve la cantidad de filas pegadas.
+        """
+        col = max(col, 1)
+        block = [cells[:self.columnCount() - col] for cells in block]
+        if not block:
+            return 0
+        missing = row + len(block) - len(self._rows)
+        if missing > 0:
+            self.add_rows(missing)
+        for offset, cells in enumerate(block):
+            for i, value in enumerate(cells):
+                self._set_cell(row + offset, col + i, value)
+        self.dataChanged.emit(self.index(row, 1), self.index(row + len(block) - 1, self.FIELDS))
+        return len(block)
+
+    def clear_cells(self, indexes):
+        rows = set()
+        for index in indexes:
+            if index.column() != self.NUMBER_COLUMN:
+                self._rows[index.row()][index.column() - 1] = ""
+                rows.add(index.row())
+        if rows:
+            self.dataChanged.emit(self.index(min(rows), 1), self.index(max(rows), self.FIELDS))
+
+
+class GridDateDelegate(QStyledItemDelegate):
+    """Editor con calendario para la columna de fecha; texto para las demás."""
+    def createEditor(self, parent, option, index):
+        if index.column() != ProformaGridModel.DATE_COLUMN:
+            return super().createEditor(parent, option, index)
+        editor = QDateEdit(parent)
+        editor.setCalendarPopup(True)
+        editor.setDisplayFormat("dd/MM/yyyy")
+        return editor
+
+    def setEditorData(self, editor, index):
+        if not isinstance(editor, QDateEdit):
+            return super().setEditorData(editor, index)
+        day = parse_date(index.data(Qt.EditRole))
+        editor.setDate(QDate(day) if day else QDate.currentDate())
+
+    def setModelData(self, editor, model, index):
+        if not isinstance(editor, QDateEdit):
+            return super().setModelData(editor, model, index)
+        model.setData(index, editor.date().toString("dd/MM/yyyy"))
+
+
+class ProformaGridView(QTableView):
+    """QTableView con pegado desde Excel (Ctrl+V) y borrado de celdas (Supr)."""
+    def keyPressEvent(self, event):
+        if self.state() != QAbstractItemView.EditingState:
+            if event.matches(QKeySequence.Paste):
+                self.paste_clipboard()
+                return
+            if event.key() in (Qt.Key_Delete, Qt.Key_Backspace):
+                self.model().clear_cells(self.selectedIndexes())
+                return
+        super().keyPressEvent(event)
+
+    def paste_clipboard(self):
+        # Excel copia filas separadas por salto de línea y celdas por tabulador
+        lines = QApplication.clipboard().text().splitlines()
+        while lines and not lines[-1].strip():
+            lines.pop()
+        if not lines:
+            return
+        current = self.currentIndex()
+        row = current.row() if current.isValid() else self.model().rowCount()
+        col = current.column() if current.isValid() else 1
+        pasted = self.model().paste(row, col, [line.split("\t") for line in lines])
+        if pasted:
+            self.scrollTo(self.model().index(row + pasted - 1, max(col, 1)))
+
 
 class ComercialFormWindow(QMainWindow):
-    def __init__(self, main_window=None, api_url=""):
+    def __init__(self, main_window=None, api_client=None):
         super().__init__()
         self.main_window = main_window
-        self.api_url = api_url  # <-- Aquí manejas la URL (en vez de una constante fija)
+        self.api_client = api_client  # Cliente HTTP compartido (ver api_client.py)
 
         self.setWindowTitle("Formulario Comercial (Crear / Editar)")
         self.setWindowFlags(Qt.FramelessWindowHint)
         self.setStyleSheet("background-color: #f0f0f0; border-radius: 15px;")
 
         # Variables para "Crear"
-        self.forms = []               # Contendrá dict con info de cada formulario (layout, widgets, etc.)
-        self.form_count = 0
-        self.last_proforma_number = None  # Para trackear el último # de proforma en la hoja
+        self.base_proforma_number = None  # Última proforma del servidor (None = aún cargando)
 
         # Variables para "Editar"
         self.edit_combo_proforma = None
 
+        # Peticiones a la API fuera del hilo de la GUI
+        self.executor = ApiExecutor(self)
+        self.executor.busy_changed.connect(self.on_busy_changed)
+
         # Layout principal
         self.main_layout = QVBoxLayout()
 
@@ -68,21 +314,15 @@ class ComercialFormWindow(QMainWindow):
         central_widget.setLayout(self.main_layout)
         self.setCentralWidget(central_widget)
 
-        # Comienza en la pestaña "Crear" y añade 1 formulario por defecto
+        # Comienza en la pestaña "Crear" (la grilla arranca con una fila vacía)
         self.tab_widget.setCurrentIndex(0)
-        self.add_form_entry()
+        self.fetch_last_proforma()
 
     # ---------------------------------------------------------------------
     #                         PESTAÑA "CREAR"
     # ---------------------------------------------------------------------
     def setup_create_tab(self):
         layout = QVBoxLayout(self.tab_create)
-        scroll_area = QScrollArea(self.tab_create)
-        scroll_area.setWidgetResizable(True)
-        scroll_area.setStyleSheet("border: none;")
-
-        self.scroll_widget_create = QWidget()
-        self.scroll_layout_create = QVBoxLayout(self.scroll_widget_create)
 
         # Botonera superior
         create_button_layout = QHBoxLayout()
@@ -90,7 +330,7 @@ class ComercialFormWindow(QMainWindow):
             QSpacerItem(20, 20, QSizePolicy.Expanding, QSizePolicy.Minimum)
         )
 
-        self.add_button = QPushButton("Añadir Otro Pedido", self.tab_create)
+        self.add_button = QPushButton("Añadir Fila", self.tab_create)
         self.add_button.setStyleSheet("""
             background-color: #87CEFA; color: white;
             font-size: 16px; padding: 5px;
@@ -99,6 +339,15 @@ class ComercialFormWindow(QMainWindow):
         self.add_button.clicked.connect(self.add_form_entry)
         create_button_layout.addWidget(self.add_button)
 
+        self.remove_rows_button = QPushButton("Quitar Filas", self.tab_create)
+        self.remove_rows_button.setStyleSheet("""
+            background-color: #ff4d4d; color: white;
+            font-size: 16px; padding: 5px;
+        """)
+        self.remove_rows_button.setFixedWidth(200)
+        self.remove_rows_button.clicked.connect(self.remove_selected_rows)
+        create_button_layout.addWidget(self.remove_rows_button)
+
         self.submit_button_create = QPushButton("Enviar", self.tab_create)
         self.submit_button_create.setStyleSheet("""
             background-color: #4682B4; color: white;
@@ -120,335 +369,174 @@ class ComercialFormWindow(QMainWindow):
         create_button_layout.addSpacerItem(
             QSpacerItem(20, 20, QSizePolicy.Expanding, QSizePolicy.Minimum)
         )
+        layout.addLayout(create_button_layout)
 
-        self.scroll_layout_create.addLayout(create_button_layout)
-
-        # Aquí meteremos los formularios
-        self.form_layout_create = QVBoxLayout()
-        self.scroll_layout_create.addLayout(self.form_layout_create)
-
-        scroll_area.setWidget(self.scroll_widget_create)
-        layout.addWidget(scroll_area)
-
-    def add_form_entry(self):
-        self.form_count += 1
-        form_dict = self.create_form_entry(self.form_count)
-        self.forms.append(form_dict)
-
-    def create_form_entry(self, index):
-        """
-        Crea un QFormLayout con los campos de Comercial.
-        Añade un botón "X" para eliminar excepto en el primero.
-        """
-        # Generamos un nuevo número de proforma
-        prof_number = self.get_new_proforma_number()
-
-        # Title layout con "Nº Proforma X" y botón "X"
-        title_layout = QHBoxLayout()
-        title_label = QLabel(f"Nº Proforma Aprobada {index}:", self.tab_create)
-        remove_btn = QPushButton("X", self.tab_create)
-        remove_btn.setFixedSize(24, 24)
-        remove_btn.setStyleSheet("""
-            QPushButton {
-                background-color: #ff4d4d;
+        hint = QLabel(
+            "Un pedido por fila. Ctrl+V pega desde Excel (Ejecutivo, Cliente, Clasificación, "
+            "Descripción, Cantidad, Fecha); las celdas en rojo tienen errores."
+        )
+        hint.setStyleSheet("font-size:13px; color:#555;")
+        layout.addWidget(hint)
+
+        # Grilla tipo planilla (modelo + vista, sin widgets por pedido)
+        self.grid_model = ProformaGridModel(rows=1, parent=self)
+        if not self.api_client:
+            self.grid_model.placeholder = "0000-00"
+        self.grid_view = ProformaGridView(self.tab_create)
+        self.grid_view.setModel(self.grid_model)
+        self.grid_view.setItemDelegate(GridDateDelegate(self.grid_view))
+        self.grid_view.setEditTriggers(
+            QAbstractItemView.DoubleClicked | QAbstractItemView.EditKeyPressed
+            | QAbstractItemView.AnyKeyPressed
+        )
+        self.grid_view.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.grid_view.setStyleSheet("""
+            QHeaderView::section {
+                background-color: #4682B4;
                 color: white;
                 font-weight: bold;
-                border: none;
-                border-radius: 4px;
+                font-size: 13px;
+                padding: 5px;
             }
-            QPushButton:hover {
-                background-color: #e60000;
+            QTableView {
+                background-color: white;
+                gridline-color: #A9D1F7;
+                font-size: 14px;
             }
         """)
-        # Al hacer clic, eliminamos este form (excepto si es index=1)
-        remove_btn.clicked.connect(lambda _, idx=index: self.remove_form_entry(idx))
-
-        if index == 1:
-            remove_btn.setEnabled(False)
-
-        title_layout.addWidget(title_label)
-        title_layout.addWidget(remove_btn)
-
-        # Campo con el número de proforma
-        proforma_label = QLineEdit(prof_number, self.tab_create)
-        proforma_label.setReadOnly(True)
-        proforma_label.setStyleSheet("""
-            background-color: white;
-            border:1px solid #000;
-            border-radius:5px;
-            padding:5px;
-            font-size:16px;
-            color:#000;
-        """)
-
-        ejecutivo_comercial = QLineEdit(self.tab_create)
-        cliente = QLineEdit(self.tab_create)
-        clasificacion_cliente = QLineEdit(self.tab_create)
-        descripcion = QLineEdit(self.tab_create)
-        cantidad_pedido = QLineEdit(self.tab_create)
-
-        fecha_entrega = QLineEdit(self.tab_create)
-        fecha_entrega.setReadOnly(True)
-        fecha_entrega.setStyleSheet("""
-            background-color:white;
-            border:1px solid #000;
-            border-radius:5px;
-            padding:5px;
-            font-size:16px;
-            color:#000;
-        """)
-        # Calendario flotante
-        fecha_entrega.mousePressEvent = lambda event, idx=index: self.show_calendar_create(event, idx)
-
-        for w in [ejecutivo_comercial, cliente, clasificacion_cliente, descripcion, cantidad_pedido]:
-            w.setStyleSheet("""
-                background-color:white;
-                border:1px solid #000;
-                border-radius:5px;
-                padding:5px;
-                font-size:16px;
-                color:#000;
-            """)
+        layout.addWidget(self.grid_view)
 
-        layout = QFormLayout()
-
-        # Metemos en la primera fila => col(0) un QWidget con title_layout
-        row_container = QWidget()
-        row_container.setLayout(title_layout)
-        layout.addRow(row_container, proforma_label)
-
-        layout.addRow(f"Ejecutivo Comercial {index}:", ejecutivo_comercial)
-        layout.addRow(f"Cliente {index}:", cliente)
-        layout.addRow(f"Clasificación {index}:", clasificacion_cliente)
-        layout.addRow(f"Descripción {index}:", descripcion)
-        layout.addRow(f"Cantidad de Pedido {index}:", cantidad_pedido)
-        layout.addRow(f"Fecha de Entrega {index}:", fecha_entrega)
-
-        self.form_layout_create.addLayout(layout)
-
-        return {
-            "index": index,
-            "layout": layout,
-            "num_proforma": proforma_label,
-            "ejecutivo_comercial": ejecutivo_comercial,
-            "cliente": cliente,
-            "clasificacion_cliente": clasificacion_cliente,
-            "descripcion": descripcion,
-            "cantidad_pedido": cantidad_pedido,
-            "fecha_entrega": fecha_entrega
-        }
-
-    def remove_form_entry(self, index):
-        """
-        Elimina el formulario con este índice y reasigna los siguientes.
-        """
-        if index == 1:
-            return  # No borramos el primero
-
-        to_remove = None
-        for f in self.forms:
-            if f["index"] == index:
-                to_remove = f
-                break
-        if not to_remove:
+    def add_form_entry(self):
+        """Agrega una fila vacía al final y la deja lista para escribir."""
+        self.grid_model.add_rows(1)
+        index = self.grid_model.index(self.grid_model.rowCount() - 1, 1)
+        self.grid_view.setCurrentIndex(index)
+        self.grid_view.scrollTo(index)
+
+    def remove_selected_rows(self):
+        rows = {index.row() for index in self.grid_view.selectionModel().selectedIndexes()}
+        if not rows:
             return
+        self.grid_model.remove_row_set(rows)
+        if self.grid_model.rowCount() == 0:
+            self.grid_model.add_rows(1)
 
-        layout = to_remove["layout"]
-        self.removeLayout(layout, self.form_layout_create)
-        self.forms.remove(to_remove)
-
-        # Recalcular self.form_count
-        self.form_count = len(self.forms)
-        # Reasignar índices y proformas
-        self.reassign_forms()
+    def fetch_last_proforma(self):
+        """Pide getLastProforma en segundo plano."""
+        if not self.api_client:
+            return
+        self.executor.submit(
+            self.api_client.get_json, "getLastProforma",
+            key="last_proforma",
+            on_success=self.on_last_proforma_loaded,
+            on_error=lambda e: self.on_last_proforma_loaded({})
+        )
 
-    def removeLayout(self, layout, parent_layout):
-        """
-        Elimina el QFormLayout del parent_layout, limpiando sus widgets.
-        """
-        while layout.count():
-            item = layout.takeAt(0)
-            w = item.widget()
-            if w:
-                w.setParent(None)
-
-        # Quitar layout de parent_layout
-        i = 0
-        while i < parent_layout.count():
-            item = parent_layout.itemAt(i)
-            if item.layout() == layout:
-                parent_layout.removeItem(item)
-                break
-            i += 1
-
-    def reassign_forms(self):
-        """
-        Reasigna índices y números de proforma a cada formulario.
-        """
-        self.last_proforma_number = None
-        for i, f in enumerate(self.forms, start=1):
-            f["index"] = i
-            # Generamos un nuevo proforma
-            new_prof = self.get_new_proforma_number()
-            f["num_proforma"].setText(new_prof)
-
-            layout = f["layout"]
-            # Actualizar labels (Ejecutivo Comercial i, etc.)
-            self.updateFormLayoutLabelText(layout, 1, f"Ejecutivo Comercial {i}:")
-            self.updateFormLayoutLabelText(layout, 2, f"Cliente {i}:")
-            self.updateFormLayoutLabelText(layout, 3, f"Clasificación {i}:")
-            self.updateFormLayoutLabelText(layout, 4, f"Descripción {i}:")
-            self.updateFormLayoutLabelText(layout, 5, f"Cantidad de Pedido {i}:")
-            self.updateFormLayoutLabelText(layout, 6, f"Fecha de Entrega {i}:")
-
-            # Cambia la label "Nº Proforma Aprobada i:"
-            row0_item = layout.itemAt(0, QFormLayout.LabelRole)
-            if row0_item:
-                row0_widget = row0_item.widget()
-                if row0_widget:
-                    hlayout = row0_widget.layout()
-                    if hlayout and hlayout.count() > 0:
-                        lbl = hlayout.itemAt(0).widget()
-                        if lbl:
-                            lbl.setText(f"Nº Proforma Aprobada {i}:")
-                        remove_btn = hlayout.itemAt(1).widget()
-                        if i == 1:
-                            remove_btn.setEnabled(False)
-                        else:
-                            remove_btn.setEnabled(True)
-
-    def updateFormLayoutLabelText(self, layout, rowIndex, newText):
-        label_item = layout.itemAt(rowIndex, QFormLayout.LabelRole)
-        if label_item:
-            label_widget = label_item.widget()
-            if label_widget:
-                label_widget.setText(newText)
-
-    def get_new_proforma_number(self):
+    def on_last_proforma_loaded(self, data):
         """
-        Genera un nuevo número de proforma con sufijo de año (dd..-yy).
+        Los números de la grilla son provisionales (dd..-yy): el definitivo lo
+        reserva el servidor al enviar (reserveProformas).
         """
-        if not self.api_url:
-            # No hay URL => creamos un dummy
-            return "0000-00"
-
-        suffix = datetime.now().year % 100  # p.ej. 25 => 2025
-        if self.last_proforma_number is None:
-            url = f"{self.api_url}?action=getLastProforma"
-            try:
-                resp = requests.get(url)
-                resp.raise_for_status()
-                data = resp.json()
-                last_prof = str(data.get("lastProforma", f"0000-{suffix}"))
-                base_number = last_prof.split("-")[0]
-                self.last_proforma_number = int(base_number)
-            except:
-                self.last_proforma_number = 0
-
-        self.last_proforma_number += 1
-        return f"{self.last_proforma_number:04d}-{suffix}"
-
-    # Calendario "Crear"
-    def show_calendar_create(self, event, index):
-        form = None
-        for f in self.forms:
-            if f["index"] == index:
-                form = f
-                break
-        if not form:
-            return
-
-        self.calendar_create = QCalendarWidget(self.tab_create)
-        self.calendar_create.setGridVisible(True)
-        self.calendar_create.setFixedSize(400,300)
-
-        close_btn = QPushButton("Cerrar", self.tab_create)
-        close_btn.setStyleSheet("background-color:#FF5733; color:white; font-size:16px; padding:5px;")
-        close_btn.clicked.connect(self.close_calendar_create)
-
-        def pick_date(date):
-            form["fecha_entrega"].setText(date.toString("dd/MM/yyyy"))
-            self.close_calendar_create()
-
-        self.calendar_create.clicked.connect(pick_date)
-
-        layout = QVBoxLayout()
-        layout.addWidget(self.calendar_create)
-        layout.addWidget(close_btn, alignment=Qt.AlignCenter)
-
-        self.calendar_container_create = QWidget(self.tab_create)
-        self.calendar_container_create.setLayout(layout)
-
-        cx = self.width()//2 - 200
-        cy = self.height()//2 - 150
-        self.calendar_container_create.setGeometry(cx, cy, 420, 350)
-
-        self.calendar_container_create.show()
-        self.calendar_container_create.raise_()
+        suffix = datetime.now().year % 100
+        try:
+            last_prof = str(data.get("lastProforma", f"0000-{suffix}"))
+            self.base_proforma_number = int(last_prof.split("-")[0])
+        except (AttributeError, ValueError):
+            self.base_proforma_number = 0
+        self.grid_model.set_numbering(self.base_proforma_number, suffix)
 
-    def close_calendar_create(self):
-        if hasattr(self, "calendar_container_create") and self.calendar_container_create:
-            self.calendar_container_create.hide()
-            self.calendar_container_create = None
-            self.calendar_create = None
+    def on_busy_changed(self, busy):
+        """Evita envíos dobles mientras hay peticiones en curso."""
+        self.submit_button_create.setEnabled(not busy)
+        self.save_edit_btn.setEnabled(not busy)
 
     def submit_create_mode(self):
         """
-        Envía todos los pedidos en la pestaña "Crear".
+        Envía todas las filas de la grilla "Crear" en un solo lote.
         """
-        if not self.api_url:
+        if not self.api_client:
             QMessageBox.warning(self, "Error", "No hay URL configurada para Comercial.")
             return
 
-        url = self.api_url
-        for i, form in enumerate(self.forms, start=1):
-            data = {
-                "section": "Comercial",
-                "numeroProforma": form["num_proforma"].text(),
-                "ejecutivoComercial": form["ejecutivo_comercial"].text(),
-                "cliente": form["cliente"].text(),
-                "clasificacion": form["clasificacion_cliente"].text(),
-                "descripcion": form["descripcion"].text(),
-                "cantidadPedido": form["cantidad_pedido"].text(),
-                "fechaEntrega": form["fecha_entrega"].text()
-            }
-            if not all(data.values()):
-                QMessageBox.warning(
-                    self, "Advertencia",
-                    f"Formulario {i} está incompleto."
-                )
-                return
-            try:
-                resp = requests.post(url, json=data)
-                if resp.status_code != 200:
-                    QMessageBox.critical(
-                        self, "Error",
-                        f"Error al enviar: {resp.text}"
-                    )
-                    return
-            except Exception as e:
-                QMessageBox.critical(
-                    self, "Error",
-                    f"Error al conectar con la API: {e}"
-                )
-                return
+        problem = self.grid_model.first_error()
+        if problem:
+            row, col, message = problem
+            self.grid_view.setCurrentIndex(self.grid_model.index(row, col))
+            QMessageBox.warning(
+                self, "Advertencia",
+                f"Fila {row + 1}, {GRID_HEADERS[col]}: {message}."
+            )
+            return
+        entries = self.grid_model.entries()
+        if not entries:
+            QMessageBox.warning(self, "Advertencia", "No hay pedidos para enviar.")
+            return
+
+        # Una reserva atómica de N números + un solo POST (section=ComercialLote).
+        # La grilla queda bloqueada hasta la respuesta: las filas no se mueven.
+        rows = [row for row, _ in entries]
+        self.grid_view.setEnabled(False)
+        self.remove_rows_button.setEnabled(False)
+        self.executor.submit(
+            self.api_client.create_proformas, [proforma.to_payload() for _, proforma in entries],
+            key="create",
+            on_success=lambda results: self.on_create_submitted(rows, results),
+            on_error=self.on_create_error
+        )
 
-        QMessageBox.information(self, "Éxito", "Todos los pedidos creados exitosamente.")
-        self.clear_create_forms()
-
-    def clear_create_forms(self):
-        for f in self.forms:
-            f["ejecutivo_comercial"].clear()
-            f["cliente"].clear()
-            f["clasificacion_cliente"].clear()
-            f["descripcion"].clear()
-            f["cantidad_pedido"].clear()
-            f["fecha_entrega"].clear()
-        QMessageBox.information(
-            self, "Limpieza",
-            "Formularios de 'Crear' reseteados."
+    def on_create_error(self, e):
+        self.unlock_grid()
+        QMessageBox.critical(
+            self, "Error",
+            f"Error al conectar con la API: {e}"
         )
 
+    def unlock_grid(self):
+        self.grid_view.setEnabled(True)
+        self.remove_rows_button.setEnabled(True)
+
+    def on_create_submitted(self, rows, results):
+        """Informa el resultado fila por fila y quita de la grilla solo los pedidos guardados."""
+        self.unlock_grid()
+        saved, failed = [], []
+        for row, result in zip(rows, results):
+            if result.get("ok"):
+                saved.append(row)
+            else:
+                failed.append(f"Fila {row + 1} ({result.get('numeroProforma', '')}): {result.get('error', '')}")
+        if len(results) < len(rows):
+            failed.append("El servidor no devolvió resultado para todas las filas.")
+
+        numbers = [r.get("numeroProforma", "") for r in results if r.get("ok")]
+        if failed:
+            if len(failed) > MAX_LISTED:
+                failed[MAX_LISTED:] = [f"... y {len(failed) - MAX_LISTED} más."]
+            QMessageBox.critical(
+                self, "Error",
+                "Error al enviar:\n" + "\n".join(failed)
+            )
+        else:
+            listed = ", ".join(numbers) if len(numbers) <= MAX_LISTED else \
+                f"{numbers[0]} a {numbers[-1]} ({len(numbers)} pedidos)"
+            QMessageBox.information(
+                self, "Éxito",
+                "Todos los pedidos creados exitosamente.\n"
+                f"Proformas: {listed}"
+            )
+
+        # Los provisionales siguen después del último número reservado
+        if results:
+            try:
+                reserved = int(str(results[-1].get("numeroProforma", "")).split("-")[0])
+                self.base_proforma_number = max(self.base_proforma_number or 0, reserved)
+                self.grid_model.set_numbering(self.base_proforma_number, datetime.now().year % 100)
+            except ValueError:
+                pass
+        if saved:
+            self.grid_model.remove_row_set(saved)
+            if self.grid_model.rowCount() == 0:
+                self.grid_model.add_rows(1)
+
     # ---------------------------------------------------------------------
     #                         PESTAÑA "EDITAR"
     # ---------------------------------------------------------------------
@@ -506,15 +594,15 @@ class ComercialFormWindow(QMainWindow):
             QSpacerItem(20, 20, QSizePolicy.Expanding, QSizePolicy.Minimum)
         )
 
-        save_edit_btn = QPushButton("Guardar Cambios", self.tab_edit)
-        save_edit_btn.setStyleSheet("""
+        self.save_edit_btn = QPushButton("Guardar Cambios", self.tab_edit)
+        self.save_edit_btn.setStyleSheet("""
             background-color:#4682B4;
             color:white;
             font-size:16px;
             padding:5px;
         """)
-        save_edit_btn.clicked.connect(self.submit_edit_mode)
-        edit_button_layout.addWidget(save_edit_btn)
+        self.save_edit_btn.clicked.connect(self.submit_edit_mode)
+        edit_button_layout.addWidget(self.save_edit_btn)
 
         back_button_edit = QPushButton("Volver", self.tab_edit)
         back_button_edit.setStyleSheet("""
@@ -537,59 +625,55 @@ class ComercialFormWindow(QMainWindow):
             self.load_proformas_for_edit()
 
     def load_proformas_for_edit(self):
-        if not self.api_url:
+        if not self.api_client:
             QMessageBox.warning(self, "Error", "No hay URL configurada para Comercial.")
             return
-        url = f"{self.api_url}?action=getAllProformas"
-        try:
-            resp = requests.get(url)
-            data = resp.json()
-            proformas = data.get("proformas", [])
-            self.edit_combo_proforma.clear()
-            self.edit_combo_proforma.addItem("-- Seleccione Proforma --")
-            for p in proformas:
-                self.edit_combo_proforma.addItem(p)
-        except requests.exceptions.RequestException as e:
-            QMessageBox.critical(self, "Error", f"Error al cargar proformas: {e}")
+        self.executor.submit(
+            self.api_client.get_json, "getAllProformas",
+            key="proformas",
+            on_success=self.on_proformas_for_edit_loaded,
+            on_error=lambda e: QMessageBox.critical(self, "Error", f"Error al cargar proformas: {e}")
+        )
+
+    def on_proformas_for_edit_loaded(self, data):
+        proformas = data.get("proformas", [])
+        self.edit_combo_proforma.clear()
+        self.edit_combo_proforma.addItem("-- Seleccione Proforma --")
+        for p in proformas:
+            self.edit_combo_proforma.addItem(p)
 
     def load_proforma_data_for_edit(self):
-        if not self.api_url:
+        if not self.api_client:
             QMessageBox.warning(self, "Error", "No hay URL configurada para Comercial.")
             return
         idx = self.edit_combo_proforma.currentIndex()
         if idx <= 0:
+            self.executor.cancel("proforma")
             return
 
         proforma = self.edit_combo_proforma.currentText()
-        url = f"{self.api_url}?action=getFullProformaData&numeroProforma={proforma}"
-        try:
-            resp = requests.get(url)
-            data = resp.json()
-            comercial = data.get("Comercial", [])
-            if not comercial:
-                QMessageBox.warning(self, "Aviso", "No hay datos comerciales para esta proforma.")
-                return
-            # [0]=Proforma, [1]=Ejecutivo, [2]=Cliente, [3]=Clasificacion,
-            # [4]=Descripcion, [5]=Cantidad, [6]=FechaEntrega
-            self.edit_ejecutivo.setText(str(comercial[1]) if len(comercial)>1 else "")
-            self.edit_cliente.setText(str(comercial[2]) if len(comercial)>2 else "")
-            self.edit_clasificacion.setText(str(comercial[3]) if len(comercial)>3 else "")
-            self.edit_descripcion.setText(str(comercial[4]) if len(comercial)>4 else "")
-            self.edit_cantidad.setText(str(comercial[5]) if len(comercial)>5 else "")
-
-            fecha_ = str(comercial[6]) if len(comercial)>6 else ""
-            fecha_split = fecha_.split("T")[0] if fecha_ else ""
-            parts = fecha_split.split("-") if fecha_split else ["","",""]
-            if len(parts)==3:
-                self.edit_fecha_entrega.setText(f"{parts[2]}/{parts[1]}/{parts[0]}")
-            else:
-                self.edit_fecha_entrega.setText(fecha_)
+        # key="proforma": si el usuario cambia de nuevo el combo, la anterior se descarta
+        self.executor.submit(
+            self.api_client.get_json, "getFullProformaData", numeroProforma=proforma,
+            key="proforma",
+            on_success=self.on_proforma_data_for_edit_loaded,
+            on_error=lambda e: QMessageBox.critical(self, "Error", f"Conexión fallida: {e}")
+        )
 
-        except requests.exceptions.RequestException as e:
-            QMessageBox.critical(self, "Error", f"Conexión fallida: {e}")
+    def on_proforma_data_for_edit_loaded(self, data):
+        proforma = parse_full_proforma(data)[0]
+        if proforma is None:
+            QMessageBox.warning(self, "Aviso", "No hay datos comerciales para esta proforma.")
+            return
+        self.edit_ejecutivo.setText(proforma.ejecutivo)
+        self.edit_cliente.setText(proforma.cliente)
+        self.edit_clasificacion.setText(proforma.clasificacion)
+        self.edit_descripcion.setText(proforma.descripcion)
+        self.edit_cantidad.setText(proforma.cantidad)
+        self.edit_fecha_entrega.setText(format_date(proforma.fecha_entrega))
 
     def submit_edit_mode(self):
-        if not self.api_url:
+        if not self.api_client:
             QMessageBox.warning(self, "Error", "No hay URL configurada para Comercial.")
             return
         idx = self.edit_combo_proforma.currentIndex()
@@ -597,29 +681,31 @@ class ComercialFormWindow(QMainWindow):
             QMessageBox.warning(self, "Aviso", "Seleccione una Proforma para editar.")
             return
 
-        proforma = self.edit_combo_proforma.currentText()
-        url = self.api_url
-        data = {
-            "section": "Comercial",
-            "numeroProforma": proforma,
-            "ejecutivoComercial": self.edit_ejecutivo.text(),
-            "cliente": self.edit_cliente.text(),
-            "clasificacion": self.edit_clasificacion.text(),
-            "descripcion": self.edit_descripcion.text(),
-            "cantidadPedido": self.edit_cantidad.text(),
-            "fechaEntrega": self.edit_fecha_entrega.text()
-        }
-        if not all(data.values()):
+        proforma = Proforma(
+            numero=self.edit_combo_proforma.currentText(),
+            ejecutivo=self.edit_ejecutivo.text(),
+            cliente=self.edit_cliente.text(),
+            clasificacion=self.edit_clasificacion.text(),
+            descripcion=self.edit_descripcion.text(),
+            cantidad=self.edit_cantidad.text(),
+            fecha_entrega=parse_date(self.edit_fecha_entrega.text()),
+        )
+        if not proforma.is_complete():
             QMessageBox.warning(self, "Advertencia", "Complete todos los campos para editar.")
             return
-        try:
-            resp = requests.post(url, json=data)
-            if resp.status_code != 200:
-                QMessageBox.critical(self, "Error", f"Error al enviar en Edit: {resp.text}")
-            else:
-                QMessageBox.information(self, "Éxito", "Proforma editada correctamente.")
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Error de conexión: {e}")
+        data = dict(proforma.to_payload(), section="Comercial")
+        self.executor.submit(
+            self.api_client.post, data,
+            key="edit",
+            on_success=self.on_edit_submitted,
+            on_error=lambda e: QMessageBox.critical(self, "Error", f"Error de conexión: {e}")
+        )
+
+    def on_edit_submitted(self, resp):
+        if resp.status_code != 200:
+            QMessageBox.critical(self, "Error", f"Error al enviar en Edit: {resp.text}")
+        else:
+            QMessageBox.information(self, "Éxito", "Proforma editada correctamente.")
 
     # Calendario para "Editar"
     def show_calendar_edit(self, event):
@@ -669,7 +755,7 @@ class ComercialFormWindow(QMainWindow):
 # ------------------------------------------------------------
 if __name__ == "__main__":
     app = QApplication(sys.argv)
-    # Si deseas probar pasando la URL:  window = ComercialFormWindow(api_url="...")
+    # Si deseas probar pasando la URL:  window = ComercialFormWindow(api_client=get_client("..."))
     window = ComercialFormWindow()
     window.showFullScreen()
     sys.exit(app.exec_())
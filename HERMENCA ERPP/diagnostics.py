@@ -0,0 +1,118 @@
+from PyQt5.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QLabel, QComboBox, QPushButton,
+    QTableWidget, QTableWidgetItem, QHeaderView, QMessageBox
+)
+from PyQt5.QtCore import Qt, QTimer
+
+from api_metrics import get_metrics
+
+
+# --------------------------------------------------------------------
+#  Panel oculto de diagnóstico (Ctrl+Shift+D en el dashboard)
+# --------------------------------------------------------------------
+class DiagnosticsDialog(QDialog):
+    """
+    Latencias de la API por módulo y acción, ordenadas por tiempo total:
+    arriba quedan las acciones de Apps Script que más tiempo de reloj consumen.
+    """
+    REFRESH_MS = 2000
+    WINDOWS = [
+        ("Últimos 5 minutos", 5 * 60),
+        ("Últimos 15 minutos", 15 * 60),
+        ("Última hora", None),  # todo el anillo de api_metrics
+    ]
+    COLUMNS = [
+        ("Módulo", "module"), ("Acción", "action"), ("Método", "method"), ("Origen", "source"),
+        ("Llamadas", "calls"), ("Errores", "errors"), ("p50 ms", "p50_ms"), ("p95 ms", "p95_ms"),
+        ("Máx ms", "max_ms"), ("Total s", "total_ms"), ("KB enviados", "bytes_out"),
+        ("KB recibidos", "bytes_in"),
+    ]
+
+    def __init__(self, parent=None, metrics=None):
+        super().__init__(parent)
+        self.metrics = metrics or get_metrics()
+        self.setWindowTitle("Diagnóstico de la API")
+        self.resize(1100, 500)
+
+        layout = QVBoxLayout(self)
+
+        top = QHBoxLayout()
+        top.addWidget(QLabel("Período:"))
+        self.window_combo = QComboBox(self)
+        for text, _ in self.WINDOWS:
+            self.window_combo.addItem(text)
+        self.window_combo.currentIndexChanged.connect(self.refresh)
+        top.addWidget(self.window_combo)
+        top.addStretch()
+        self.totals_label = QLabel(self)
+        top.addWidget(self.totals_label)
+        layout.addLayout(top)
+
+        self.table = QTableWidget(0, len(self.COLUMNS), self)
+        self.table.setHorizontalHeaderLabels([title for title, _ in self.COLUMNS])
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+        layout.addWidget(self.table)
+
+        self.log_label = QLabel(self)
+        self.log_label.setTextInteractionFlags(Qt.TextSelectableByMouse)
+        layout.addWidget(self.log_label)
+
+        buttons = QHBoxLayout()
+        for text, callback in (("Actualizar", self.refresh), ("Volcar a JSONL", self.dump),
+                               ("Reiniciar", self.reset), ("Cerrar", self.close)):
+            button = QPushButton(text, self)
+            button.clicked.connect(callback)
+            buttons.addWidget(button)
+        layout.addLayout(buttons)
+
+        # Se refresca solo mientras está visible
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+
+    def last_seconds(self):
+        return self.WINDOWS[self.window_combo.currentIndex()][1]
+
+    def refresh(self):
+        rows = self.metrics.summary(self.last_seconds())
+        self.table.setRowCount(len(rows))
+        for r, row in enumerate(rows):
+            for c, (_, field) in enumerate(self.COLUMNS):
+                value = row[field]
+                if field == "total_ms":
+                    value = f"{value / 1000:.1f}"
+                elif field in ("bytes_out", "bytes_in"):
+                    value = f"{value / 1024:.1f}"
+                item = QTableWidgetItem(str(value))
+                if isinstance(row[field], (int, float)):
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.table.setItem(r, c, item)
+
+        calls = sum(row["calls"] for row in rows)
+        errors = sum(row["errors"] for row in rows)
+        total = sum(row["total_ms"] for row in rows) / 1000
+        self.totals_label.setText(f"{calls} llamadas, {errors} con error, {total:.1f} s en total")
+        self.log_label.setText(f"Registro JSONL: {self.metrics.log_path or 'desactivado'}")
+
+    def dump(self):
+        try:
+            path = self.metrics.dump(self.last_seconds())
+        except OSError as e:
+            QMessageBox.critical(self, "Error", f"No se pudo escribir el registro:\n{e}")
+            return
+        self.refresh()
+        QMessageBox.information(self, "Diagnóstico", f"Resumen agregado a:\n{path}")
+
+    def reset(self):
+        self.metrics.reset()
+        self.refresh()
+
+    def showEvent(self, event):
+        self.refresh()
+        self.timer.start(self.REFRESH_MS)
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.timer.stop()
+        super().hideEvent(event)
@@ -7,20 +7,26 @@ from PyQt5.QtWidgets import (
 )
 from PyQt5.QtCore import Qt
 
+from api_worker import ApiExecutor
+from domain import format_date, parse_full_proforma
+
 class DiagramacionFormWindow(QMainWindow):
-    def __init__(self, main_window=None, api_url=""):
+    def __init__(self, main_window=None, api_client=None):
         """
         main_window: referencia a la ventana principal
-        api_url: la URL real de la API que usas (pasada desde main.py)
+        api_client: ApiClient compartido (creado en main.py)
         """
         super().__init__()
         self.main_window = main_window
-        self.api_url = api_url  # <-- En vez de una constante
+        self.api_client = api_client  # <-- En vez de una constante
 
         self.setWindowTitle("Formulario de Diagramación")
         self.setWindowFlags(Qt.FramelessWindowHint)
         self.setStyleSheet("background-color: #f0f0f0; border-radius: 20px;")
 
+        # Peticiones a la API fuera del hilo de la GUI
+        self.executor = ApiExecutor(self)
+
         # Layout principal
         self.main_layout = QVBoxLayout()
 
@@ -77,15 +83,16 @@ class DiagramacionFormWindow(QMainWindow):
 
         # Botones (Guardar y Volver)
         button_layout = QHBoxLayout()
-        guardar_button = QPushButton("Guardar")
-        guardar_button.clicked.connect(self.enviar_datos)
-        guardar_button.setStyleSheet(self.style_button_blue())
+        self.guardar_button = QPushButton("Guardar")
+        self.guardar_button.clicked.connect(self.enviar_datos)
+        self.guardar_button.setStyleSheet(self.style_button_blue())
+        self.executor.busy_changed.connect(lambda busy: self.guardar_button.setEnabled(not busy))
 
         volver_button = QPushButton("Volver")
         volver_button.setStyleSheet(self.style_button_blue())
         volver_button.clicked.connect(self.go_back)
 
-        button_layout.addWidget(guardar_button)
+        button_layout.addWidget(self.guardar_button)
         button_layout.addWidget(volver_button)
         self.main_layout.addLayout(button_layout)
 
@@ -202,71 +209,76 @@ class DiagramacionFormWindow(QMainWindow):
         """
         Llama a action=getAllProformas en la API y rellena el comboBox.
         """
-        if not self.api_url:
+        if not self.api_client:
             QMessageBox.warning(self, "Error", "No hay URL configurada para Diagramación.")
             return
 
-        url = f"{self.api_url}?action=getAllProformas"
-        try:
-            response = requests.get(url)
-            data = response.json()
-            proformas = data.get("proformas", [])
-            self.numero_proforma.clear()
-            self.numero_proforma.addItems(proformas)
-        except requests.exceptions.RequestException as e:
-            QMessageBox.critical(self, "Error", f"Error al conectar con la API: {e}")
+        self.executor.submit(
+            self.api_client.get_json, "getAllProformas",
+            key="proformas",
+            on_success=self.on_proformas_loaded,
+            on_error=lambda e: QMessageBox.critical(self, "Error", f"Error al conectar con la API: {e}")
+        )
+
+    def on_proformas_loaded(self, data):
+        proformas = data.get("proformas", [])
+        self.numero_proforma.clear()
+        self.numero_proforma.addItems(proformas)
 
     def cargar_datos_proforma(self):
         """
         Llama a action=getFullProformaData&numeroProforma=...
         y rellena los campos de Diagramación + Cliente & Descripción.
         """
-        if not self.api_url:
+        if not self.api_client:
             QMessageBox.warning(self, "Error", "No hay URL configurada para Diagramación.")
             return
 
         proforma = self.numero_proforma.currentText()
-        url = f"{self.api_url}?action=getFullProformaData&numeroProforma={proforma}"
-        try:
-            response = requests.get(url)
-            data = response.json()
+        if not proforma:
+            self.executor.cancel("proforma")
+            return
+        # key="proforma": una selección nueva descarta la petición anterior
+        self.executor.submit(
+            self.api_client.get_json, "getFullProformaData", numeroProforma=proforma,
+            key="proforma",
+            on_success=self.on_datos_proforma_loaded,
+            on_error=self.on_load_error
+        )
 
-            comercial = data.get("Comercial", [])
-            diagramacion = data.get("Diagramacion", [])
+    def on_load_error(self, e):
+        if isinstance(e, requests.exceptions.RequestException):
+            QMessageBox.critical(self, "Error", f"Error al conectar con la API: {e}")
+        else:
+            QMessageBox.critical(self, "Error inesperado", f"{e}")
 
-            if not comercial or not diagramacion:
+    def on_datos_proforma_loaded(self, data):
+        try:
+            proforma, hitos, _ = parse_full_proforma(data)
+            if proforma is None or hitos is None:
                 QMessageBox.warning(
                     self, "Advertencia",
                     "No hay datos de Diagramación (o Comercial) para esta proforma."
                 )
                 return
 
-            # Ajusta según tu hoja: [2]=cliente, [4]=descripcion, etc.
-            self.cliente.setText(str(comercial[2]) if len(comercial) > 2 else "")
-            self.descripcion.setText(str(comercial[4]) if len(comercial) > 4 else "")
-
-            def format_date(api_date):
-                parts = api_date.split("T")[0].split("-") if api_date else ["","",""]
-                if len(parts) == 3:
-                    return f"{parts[2]}/{parts[1]}/{parts[0]}"
-                return ""
-
-            self.fecha_recepcion_artes.setText(format_date(diagramacion[0]) if len(diagramacion)>0 else "")
-            self.disenador.setText(str(diagramacion[1]) if len(diagramacion)>1 else "")
-            self.fecha_realizacion_preprensa.setText(format_date(diagramacion[2]) if len(diagramacion)>2 else "")
-            self.fecha_envio_artes_aprobacion.setText(format_date(diagramacion[3]) if len(diagramacion)>3 else "")
-            self.fecha_aprobacion_artes.setText(format_date(diagramacion[4]) if len(diagramacion)>4 else "")
-            self.fecha_envio_ctp.setText(format_date(diagramacion[5]) if len(diagramacion)>5 else "")
-            self.fecha_quemado_placas.setText(format_date(diagramacion[6]) if len(diagramacion)>6 else "")
-
-        except requests.exceptions.RequestException as e:
-            QMessageBox.critical(self, "Error", f"Error al conectar con la API: {e}")
+            self.cliente.setText(proforma.cliente)
+            self.descripcion.setText(proforma.descripcion)
+
+            self.fecha_recepcion_artes.setText(format_date(hitos.recepcion_artes))
+            self.disenador.setText(hitos.disenador)
+            self.fecha_realizacion_preprensa.setText(format_date(hitos.realizacion_preprensa))
+            self.fecha_envio_artes_aprobacion.setText(format_date(hitos.envio_artes_aprobacion))
+            self.fecha_aprobacion_artes.setText(format_date(hitos.aprobacion_artes))
+            self.fecha_envio_ctp.setText(format_date(hitos.envio_ctp))
+            self.fecha_quemado_placas.setText(format_date(hitos.quemado_placas))
+
         except Exception as e:
             QMessageBox.critical(self, "Error inesperado", f"{e}")
 
     # ------------------ LÓGICA DE ENVÍO ------------------ #
     def enviar_datos(self):
-        if not self.api_url:
+        if not self.api_client:
             QMessageBox.warning(self, "Error", "No hay URL configurada para Diagramación.")
             return
 
@@ -287,15 +299,19 @@ class DiagramacionFormWindow(QMainWindow):
             "fechaEnvioCTP": revert_date(self.fecha_envio_ctp.text()),
             "fechaQuemadoPlacas": revert_date(self.fecha_quemado_placas.text())
         }
-        try:
-            resp = requests.post(self.api_url, json=data)
-            resp_text = resp.text
-            if "Error" in resp_text:
-                QMessageBox.critical(self, "Error", f"Ocurrió un problema al guardar: {resp_text}")
-            else:
-                QMessageBox.information(self, "Éxito", "Datos de Diagramación guardados correctamente.")
-        except requests.exceptions.RequestException as e:
-            QMessageBox.critical(self, "Error", f"No se pudo conectar con la API: {e}")
+        self.executor.submit(
+            self.api_client.post, data,
+            key="guardar",
+            on_success=self.on_datos_enviados,
+            on_error=lambda e: QMessageBox.critical(self, "Error", f"No se pudo conectar con la API: {e}")
+        )
+
+    def on_datos_enviados(self, resp):
+        resp_text = resp.text
+        if "Error" in resp_text:
+            QMessageBox.critical(self, "Error", f"Ocurrió un problema al guardar: {resp_text}")
+        else:
+            QMessageBox.information(self, "Éxito", "Datos de Diagramación guardados correctamente.")
 
     def go_back(self):
         self.close()
@@ -306,7 +322,7 @@ class DiagramacionFormWindow(QMainWindow):
 if __name__ == "__main__":
     app = QApplication(sys.argv)
     # Ejemplo de prueba con una URL
-    # window = DiagramacionFormWindow(api_url="https://script.google.com/macros/s/TU-URL/exec")
+    # window = DiagramacionFormWindow(api_client=get_client("https://script.google.com/macros/s/TU-URL/exec"))
     window = DiagramacionFormWindow()
     window.showFullScreen()
     sys.exit(app.exec_())
@@ -0,0 +1,192 @@
+"""
+Registros del ERP con tipo: proformas (hoja Comercial), hitos de
+Diagramación, órdenes de trabajo (hoja Produccion) y asignaciones de OTs a
+procesos (loadOTs).
+
+Las filas llegan de la API como listas posicionales; cada clase las lee una
+sola vez con from_row() y las fechas quedan como datetime.date. Son
+dataclasses con __slots__ (vía _slotted, el proyecto sigue en Python 3.9):
+sin __dict__ por instancia, que con miles de OTs en memoria se nota.
+"""
+from dataclasses import dataclass, fields
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Optional, Tuple
+
+UNASSIGNED = "No asignada"
+MARK = "X"
+
+# Columnas de getFullProformaData (ver Get.gs)
+#   Comercial:    [0]=Proforma, [1]=Ejecutivo, [2]=Cliente, [3]=Clasificacion,
+#                 [4]=Descripcion, [5]=Cantidad, [6]=FechaEntrega
+#   Diagramacion: [0]=Recepción artes, [1]=Diseñador, [2]=Preprensa,
+#                 [3]=Envío aprobación, [4]=Aprobación, [5]=Envío CTP, [6]=Quemado placas
+#   Produccion:   [0]=OT, [1]=Apertura, [2]=Entrega, [3]=Cartulina/papel, [4]=Hojas,
+#                 [5]=Tiraje, [6..24]=procesos marcados con "X", [25]=Tinta,
+#                 [26]=Placas, [27]=Tipo impresión, [28]=Pasadas
+PROCESS_COLUMNS = slice(6, 25)
+
+
+# --------------------------------------------------------------------
+#  Fechas
+# --------------------------------------------------------------------
+@lru_cache(maxsize=4096)
+def _parse_date_text(text):
+    text = text.strip()
+    if not text or text == UNASSIGNED:
+        return None
+    try:
+        if "/" in text:  # dd/MM/yyyy de los formularios
+            return datetime.strptime(text[:10], "%d/%m/%Y").date()
+        # ISO de la planilla ('2024-05-06T03:00:00.000Z'): solo la parte de la fecha
+        return date.fromisoformat(text[:10])
+    except ValueError:
+        return None
+
+
+def parse_date(value):
+    """date desde ISO, 'dd/MM/yyyy', date o datetime; None si no hay fecha válida."""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if not value:
+        return None
+    return _parse_date_text(str(value))
+
+
+def format_date(value):
+    """'dd/MM/yyyy' para mostrar ('' sin fecha)."""
+    return value.strftime("%d/%m/%Y") if value else ""
+
+
+def _text(row, index):
+    if index >= len(row) or row[index] is None:
+        return ""
+    return str(row[index])
+
+
+def _date(row, index):
+    return parse_date(row[index]) if index < len(row) else None
+
+
+def _slotted(cls):
+    """
+    Rehace la dataclass con __slots__ (lo que hace dataclass(slots=True) a
+    partir de 3.10). Los valores por defecto ya están en el __init__
+    generado, así que se quitan de la clase para no chocar con los slots.
+    """
+    names = tuple(f.name for f in fields(cls))
+    namespace = {k: v for k, v in cls.__dict__.items()
+                 if k not in names and k not in ("__dict__", "__weakref__")}
+    namespace["__slots__"] = names
+    return type(cls)(cls.__name__, cls.__bases__, namespace)
+
+
+# --------------------------------------------------------------------
+#  Registros
+# --------------------------------------------------------------------
+@_slotted
+@dataclass
+class Proforma:
+    numero: str
+    ejecutivo: str = ""
+    cliente: str = ""
+    clasificacion: str = ""
+    descripcion: str = ""
+    cantidad: str = ""
+    fecha_entrega: Optional[date] = None
+
+    @classmethod
+    def from_row(cls, row):
+        return cls(_text(row, 0), _text(row, 1), _text(row, 2), _text(row, 3),
+                   _text(row, 4), _text(row, 5), _date(row, 6))
+
+    def is_complete(self):
+        return all((self.ejecutivo, self.cliente, self.clasificacion,
+                    self.descripcion, self.cantidad, self.fecha_entrega))
+
+    def to_payload(self):
+        """Campos de section=Comercial / ComercialLote (fecha como en los formularios)."""
+        payload = {
+            "ejecutivoComercial": self.ejecutivo,
+            "cliente": self.cliente,
+            "clasificacion": self.clasificacion,
+            "descripcion": self.descripcion,
+            "cantidadPedido": self.cantidad,
+            "fechaEntrega": format_date(self.fecha_entrega),
+        }
+        if self.numero:
+            payload["numeroProforma"] = self.numero
+        return payload
+
+
+@_slotted
+@dataclass
+class DiagramacionMilestones:
+    recepcion_artes: Optional[date] = None
+    disenador: str = ""
+    realizacion_preprensa: Optional[date] = None
+    envio_artes_aprobacion: Optional[date] = None
+    aprobacion_artes: Optional[date] = None
+    envio_ctp: Optional[date] = None
+    quemado_placas: Optional[date] = None
+
+    @classmethod
+    def from_row(cls, row):
+        return cls(_date(row, 0), _text(row, 1), _date(row, 2), _date(row, 3),
+                   _date(row, 4), _date(row, 5), _date(row, 6))
+
+
+@_slotted
+@dataclass
+class ProductionOrder:
+    numero_ot: str
+    fecha_apertura: Optional[date] = None
+    fecha_entrega: Optional[date] = None
+    cartulina_papel: str = ""
+    cantidad_hojas: str = ""
+    tiraje_impresion: str = ""
+    procesos: Tuple[bool, ...] = ()   # columnas 6..24 en orden; () si la fila no las trae
+    tinta: str = ""
+    placas: str = ""
+    tipo_impresion: str = ""
+    numero_pasadas: str = ""
+
+    @classmethod
+    def from_row(cls, row):
+        procesos = tuple(v == MARK for v in row[PROCESS_COLUMNS]) if len(row) > 24 else ()
+        return cls(_text(row, 0), _date(row, 1), _date(row, 2), _text(row, 3),
+                   _text(row, 4), _text(row, 5), procesos, _text(row, 25),
+                   _text(row, 26), _text(row, 27), _text(row, 28))
+
+
+@_slotted
+@dataclass
+class ProcessAssignment:
+    """Una OT en una hoja de proceso de loadOTs y su fecha programada."""
+    process: str
+    ot: object
+    fecha: Optional[date] = None
+
+    @classmethod
+    def from_row(cls, process, row):
+        """row: [ot, fecha o 'No asignada'] (o solo la OT)."""
+        if isinstance(row, (list, tuple)):
+            return cls(process, row[0], _date(row, 1))
+        return cls(process, row, None)
+
+
+def parse_full_proforma(data):
+    """
+    Respuesta de getFullProformaData -> (Proforma, DiagramacionMilestones,
+    ProductionOrder); None en cada sección sin datos.
+    """
+    comercial = data.get("Comercial") or []
+    diagramacion = data.get("Diagramacion") or []
+    produccion = data.get("Produccion") or []
+    return (
+        Proforma.from_row(comercial) if comercial else None,
+        DiagramacionMilestones.from_row(diagramacion) if diagramacion else None,
+        ProductionOrder.from_row(produccion) if produccion else None,
+    )
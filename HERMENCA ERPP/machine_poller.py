@@ -0,0 +1,384 @@
+"""
+Lectura periódica de contadores y estados de las máquinas por Modbus TCP.
+
+Cada máquina (las hojas de proceso de handleLoadOTs: XL75, XL-UV, líneas
+de terminación...) se consulta en su propia tarea asyncio, todas en
+paralelo, con su propio intervalo. Los registros contiguos de una misma
+tabla se leen en una sola petición, y una máquina que no responde se
+vuelve a intentar con espera exponencial (hasta MAX_BACKOFF segundos).
+Las lecturas van a un TimeSeriesBuffer, que además acumula las hojas
+producidas por la OT activa de cada máquina: la primera OT programada hoy
+en su hoja de proceso (MachinePoller(schedule=...), releída cada
+SCHEDULE_SECONDS).
+
+    python machine_poller.py --template > maquinas.json   # completar host/registros
+    python machine_poller.py --config maquinas.json -v
+
+Formato de maquinas.json:
+    {"devices": [{"name": "XL75", "host": "192.168.1.50", "port": 502, "unit": 1,
+                  "interval": 1.0, "ideal_rate": 15000,
+                  "registers": {"hojas": {"address": 0, "type": "uint32"},
+                                "estado": {"address": 2}}}]}
+type: uint16 (defecto), int16 o uint32 (palabra alta primero);
+table: holding (defecto) o input. Una máquina sin host no se consulta.
+ideal_rate: hojas/hora a velocidad nominal (para el OEE de telemetry_store).
+"""
+import argparse
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import deque
+
+from pymodbus.client import AsyncModbusTcpClient
+
+from replica import PROCESS_SHEETS
+from telemetry_store import COUNTER_SIGNAL, STATE_SIGNAL
+
+MAX_BACKOFF = 60.0       # segundos
+SCHEDULE_SECONDS = 60    # cada cuánto se relee la OT activa de cada máquina
+MAX_READ_COUNT = 125     # límite de registros por petición (FC03/FC04)
+MAX_READ_GAP = 8         # huecos menores se leen de corrido antes que partir la petición
+STATE_NAMES = {0: "Parada", 1: "En marcha", 2: "Falla", 3: "Preparación"}
+DEFAULT_REGISTERS = {
+    COUNTER_SIGNAL: {"address": 0, "type": "uint32"},
+    STATE_SIGNAL: {"address": 2},
+    "velocidad": {"address": 3},
+}
+WORDS = {"uint16": 1, "int16": 1, "uint32": 2}
+
+
+def default_config_path():
+    return os.path.join(os.path.expanduser("~"), ".hermenca_erp", "maquinas.json")
+
+
+# --------------------------------------------------------------------
+#  Configuración y plan de lectura
+# --------------------------------------------------------------------
+class RegisterSpec:
+    __slots__ = ("name", "address", "type", "table")
+
+    def __init__(self, name, address, type="uint16", table="holding"):
+        if type not in WORDS:
+            raise ValueError(f"Tipo de registro desconocido: {type}")
+        if table not in ("holding", "input"):
+            raise ValueError(f"Tabla Modbus desconocida: {table}")
+        self.name = name
+        self.address = int(address)
+        self.type = type
+        self.table = table
+
+    @property
+    def words(self):
+        return WORDS[self.type]
+
+    def decode(self, words):
+        if self.type == "uint32":
+            return (words[0] << 16) | words[1]
+        if self.type == "int16":
+            return words[0] - 0x10000 if words[0] & 0x8000 else words[0]
+        return words[0]
+
+
+class DeviceConfig:
+    def __init__(self, name, host="", port=502, unit=1, interval=1.0, timeout=2.0,
+                 registers=None, ideal_rate=None):
+        self.name = name
+        self.host = host
+        self.port = int(port)
+        self.unit = int(unit)
+        self.interval = float(interval)
+        self.timeout = float(timeout)
+        self.ideal_rate = ideal_rate
+        self.registers = [
+            RegisterSpec(signal, **spec)
+            for signal, spec in (registers or DEFAULT_REGISTERS).items()
+        ]
+        self.reads = plan_reads(self.registers)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+
+def plan_reads(specs, max_gap=MAX_READ_GAP, max_count=MAX_READ_COUNT):
+    """
+    Agrupa los registros en lecturas contiguas por tabla.
+    -> [(tabla, dirección, cantidad, [RegisterSpec, ...]), ...]
+    """
+    reads = []
+    for table in ("holding", "input"):
+        pending = sorted((s for s in specs if s.table == table), key=lambda s: s.address)
+        current = None
+        for spec in pending:
+            end = spec.address + spec.words
+            if current is not None:
+                start, count, members = current
+                if spec.address <= start + count + max_gap and end - start <= max_count:
+                    current = (start, max(count, end - start), members + [spec])
+                    continue
+                reads.append((table, start, count, members))
+            current = (spec.address, spec.words, [spec])
+        if current is not None:
+            reads.append((table, *current))
+    return reads
+
+
+def load_config(path):
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return [DeviceConfig.from_dict(device) for device in data.get("devices", [])]
+
+
+def config_template():
+    """Una entrada por hoja de proceso, sin host (desactivadas hasta completarlas)."""
+    return {"devices": [
+        {"name": name, "host": "", "port": 502, "unit": 1, "interval": 1.0,
+         "ideal_rate": None, "registers": DEFAULT_REGISTERS}
+        for name in PROCESS_SHEETS
+    ]}
+
+
+def active_ots(schedule):
+    """
+    {máquina: OT} desde las OTs programadas hoy ({proceso: [[ot, fecha], ...]},
+    como LocalReplica.load_ots_range): la primera del día en cada máquina.
+    """
+    return {process: entries[0][0] for process, entries in schedule.items() if entries}
+
+
+# --------------------------------------------------------------------
+#  Serie temporal
+# --------------------------------------------------------------------
+class TimeSeriesBuffer:
+    """
+    Últimas 'maxlen' lecturas por máquina, seguro entre hilos.
+    Con set_active_ot() las hojas que avanza el contador de una máquina se
+    suman a esa OT: ot_progress(ot) da la producción real por máquina.
+    El historial largo va a 'store' (telemetry_store.TelemetryStore).
+    """
+    def __init__(self, maxlen=600, store=None):
+        self.maxlen = maxlen
+        self.store = store
+        self._samples = {}    # máquina -> deque[(ts, {señal: valor})]
+        self._status = {}     # máquina -> (ts, None | texto del error)
+        self._active_ot = {}  # máquina -> OT
+        self._ot_sheets = {}  # (ot, máquina) -> hojas
+        self._lock = threading.Lock()
+
+    def append(self, device, ts, values):
+        with self._lock:
+            samples = self._samples.get(device)
+            if samples is None:
+                samples = self._samples[device] = deque(maxlen=self.maxlen)
+            counter = values.get(COUNTER_SIGNAL)
+            if counter is not None and samples:
+                previous = samples[-1][1].get(COUNTER_SIGNAL)
+                ot = self._active_ot.get(device)
+                if previous is not None and ot is not None:
+                    # Un contador que baja se reinició en la máquina: cuenta desde 0
+                    delta = counter - previous if counter >= previous else counter
+                    self._ot_sheets[(ot, device)] = self._ot_sheets.get((ot, device), 0) + delta
+            samples.append((ts, values))
+            self._status[device] = (ts, None)
+        if self.store is not None:
+            self.store.append(device, ts, values)
+
+    def mark_failed(self, device, error):
+        with self._lock:
+            self._status[device] = (time.time(), str(error) or type(error).__name__)
+
+    def set_active_ot(self, device, ot):
+        """OT que está corriendo en la máquina (None al terminarla)."""
+        with self._lock:
+            self._active_ot[device] = ot
+
+    def latest(self, device):
+        """(ts, {señal: valor}) de la última lectura, o None."""
+        with self._lock:
+            samples = self._samples.get(device)
+            return samples[-1] if samples else None
+
+    def series(self, device, signal, since=None):
+        """[(ts, valor), ...] de una señal desde 'since' (epoch)."""
+        with self._lock:
+            samples = list(self._samples.get(device, ()))
+        return [(ts, values[signal]) for ts, values in samples
+                if signal in values and (since is None or ts >= since)]
+
+    def status(self):
+        """{máquina: (ts, error o None)}: None = última lectura correcta."""
+        with self._lock:
+            return dict(self._status)
+
+    def ot_progress(self, ot):
+        """{máquina: hojas} contadas mientras la OT estuvo activa."""
+        with self._lock:
+            return {device: sheets for (o, device), sheets in self._ot_sheets.items() if o == ot}
+
+
+# --------------------------------------------------------------------
+#  Poller
+# --------------------------------------------------------------------
+class DevicePoller:
+    """Bucle de una máquina: conectar, leer el plan, esperar el intervalo."""
+    def __init__(self, config, buffer, verbose=False):
+        self.config = config
+        self.buffer = buffer
+        self.verbose = verbose
+        self.failures = 0
+        self.client = None
+
+    async def poll_once(self):
+        if self.client is None or not self.client.connected:
+            await self._close()
+            self.client = AsyncModbusTcpClient(
+                self.config.host, port=self.config.port, timeout=self.config.timeout
+            )
+            await self.client.connect()
+            if not self.client.connected:
+                raise ConnectionError(f"sin conexión con {self.config.host}:{self.config.port}")
+
+        values = {}
+        for table, start, count, specs in self.config.reads:
+            read = (self.client.read_holding_registers if table == "holding"
+                    else self.client.read_input_registers)
+            response = await read(start, count, slave=self.config.unit)
+            if response.isError():
+                raise IOError(f"{table} {start}+{count}: {response}")
+            for spec in specs:
+                offset = spec.address - start
+                values[spec.name] = spec.decode(response.registers[offset:offset + spec.words])
+        self.buffer.append(self.config.name, time.time(), values)
+        if self.verbose:
+            print(f"{self.config.name}: {values}")
+
+    async def run(self, stop):
+        next_at = time.monotonic()
+        while not stop.is_set():
+            try:
+                await self.poll_once()
+                self.failures = 0
+                # Intervalo fijo sin deriva; si la lectura tardó más, se sigue de inmediato
+                next_at = max(next_at + self.config.interval, time.monotonic())
+            except Exception as e:
+                self.failures += 1
+                self.buffer.mark_failed(self.config.name, e)
+                await self._close()
+                backoff = min(self.config.interval * 2 ** self.failures, MAX_BACKOFF)
+                next_at = time.monotonic() + backoff
+                if self.verbose or self.failures == 1:
+                    print(f"Máquina {self.config.name} sin respuesta ({e}); reintento en {backoff:.1f} s")
+            try:
+                await asyncio.wait_for(stop.wait(), max(0.0, next_at - time.monotonic()))
+            except asyncio.TimeoutError:
+                pass
+        await self._close()
+
+    async def _close(self):
+        if self.client is not None:
+            result = self.client.close()
+            if asyncio.iscoroutine(result):
+                await result
+            self.client = None
+
+
+class MachinePoller:
+    """
+    Consulta todas las máquinas configuradas en paralelo.
+    start_in_thread() lo corre en un hilo propio (con su loop asyncio) para
+    usarlo desde la GUI; stop() lo detiene.
+    schedule: función sin argumentos que devuelve las OTs programadas hoy
+    ({proceso: [[ot, fecha], ...]}); con ella el buffer sabe qué OT corre
+    en cada máquina (set_active_ot) y ot_progress() cuenta sus hojas.
+    """
+    def __init__(self, configs, buffer=None, verbose=False, schedule=None):
+        self.buffer = buffer or TimeSeriesBuffer()
+        self.pollers = [DevicePoller(c, self.buffer, verbose) for c in configs if c.host]
+        self.schedule = schedule
+        self._loop = None
+        self._stop = None
+        self._thread = None
+
+    async def run(self):
+        self._loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        tasks = [poller.run(self._stop) for poller in self.pollers]
+        if self.schedule is not None:
+            tasks.append(self._follow_schedule())
+        await asyncio.gather(*tasks)
+
+    def refresh_active_ots(self):
+        """Marca en el buffer la OT activa de cada máquina según schedule()."""
+        active = active_ots(self.schedule())
+        for poller in self.pollers:
+            self.buffer.set_active_ot(poller.config.name, active.get(poller.config.name))
+
+    async def _follow_schedule(self, interval=SCHEDULE_SECONDS):
+        loop = asyncio.get_running_loop()
+        while not self._stop.is_set():
+            try:
+                # schedule() suele leer SQLite: fuera del loop para no demorar las lecturas
+                await loop.run_in_executor(None, self.refresh_active_ots)
+            except Exception as e:
+                print(f"OT activa de las máquinas sin actualizar: {e}")
+            try:
+                await asyncio.wait_for(self._stop.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def start_in_thread(self):
+        self._thread = threading.Thread(target=asyncio.run, args=(self.run(),),
+                                        name="MachinePoller", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self):
+        if self._loop is not None and self._stop is not None:
+            self._loop.call_soon_threadsafe(self._stop.set)
+
+
+def start_from_config(path=None, store=None, schedule=None):
+    """
+    Arranca el poller si existe el archivo de máquinas; si no, devuelve None.
+    Con 'store' (TelemetryStore) las lecturas quedan además en el historial;
+    'schedule' se pasa a MachinePoller (OT activa de cada máquina).
+    """
+    path = path or default_config_path()
+    if not os.path.exists(path):
+        return None
+    configs = load_config(path)
+    if store is not None:
+        store.ideal_rates.update({c.name: c.ideal_rate for c in configs if c.ideal_rate})
+    poller = MachinePoller(configs, TimeSeriesBuffer(store=store), schedule=schedule)
+    if not poller.pollers:
+        return None
+    poller.start_in_thread()
+    return poller
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lectura Modbus de contadores de máquinas.")
+    parser.add_argument("--config", default=default_config_path())
+    parser.add_argument("--template", action="store_true", help="imprimir una configuración de ejemplo")
+    parser.add_argument("-v", "--verbose", action="store_true", help="mostrar cada lectura")
+    args = parser.parse_args()
+
+    if args.template:
+        print(json.dumps(config_template(), indent=2, ensure_ascii=False))
+        return
+
+    poller = MachinePoller(load_config(args.config), verbose=args.verbose)
+    if not poller.pollers:
+        print(f"Ninguna máquina con host en {args.config}")
+        return
+    print(f"Consultando {len(poller.pollers)} máquinas (Ctrl+C para salir)")
+    try:
+        asyncio.run(poller.run())
+    except KeyboardInterrupt:
+        print("Proceso interrumpido por el usuario.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,44 @@
 import sys
 import os
-import asyncio
-import requests
+from datetime import date
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QLabel, QVBoxLayout, QGridLayout, QWidget,
     QPushButton, QHBoxLayout, QMessageBox, QDialog, QFormLayout, QLineEdit,
-    QDialogButtonBox
+    QDialogButtonBox, QShortcut
 )
 from PyQt5.QtCore import Qt, QTimer, QThread, QSettings
-from PyQt5.QtGui import QPixmap
+from PyQt5.QtGui import QPixmap, QKeySequence
+
+from api_client import get_client  # Cliente HTTP compartido (pool keep-alive)
+from api_metrics import get_metrics, ApiMetrics  # Latencias por acción/módulo
+from api_worker import ApiExecutor  # Tareas de arranque en segundo plano
+from stall_watchdog import install_from_env  # Congelamientos de la GUI y perfilado opcional
+from replica import LocalReplica, ReplicaSync  # Réplica SQLite para lecturas sin red
+
+# Las ventanas (y lo que arrastran: reportlab, numpy, pymodbus) se importan
+# recién al abrirlas, en cada show_*: el arranque no paga por módulos que
+# quizá no se usen. Ver benchmark_startup.py.
+
+# Tope del splash si las tareas de arranque no terminan (sin red, servidor lento)
+SPLASH_MAX_MS = 5000
+
+
+def start_machine_telemetry(replica):
+    """
+    Historial de telemetría (NumPy + memmap) y poller Modbus de las máquinas
+    (solo si existe maquinas.json). Corre en el pool durante el splash.
+    La OT activa de cada máquina sale de lo programado hoy en la réplica.
+    """
+    from telemetry_store import TelemetryStore
+    from machine_poller import start_from_config
+
+    def today_schedule():
+        today = date.today().isoformat()
+        return replica.load_ots_range(today, today) if replica.ready else {}
+
+    telemetry = TelemetryStore()
+    return telemetry, start_from_config(store=telemetry, schedule=today_schedule)
 
-from comercial import ComercialFormWindow  # Importa la clase del formulario de Comercial
-from diagramacion import DiagramacionFormWindow  # Importa la clase del formulario de Diagramación
-from server import run_async_modbus_server  # Servidor Modbus
-from produccion import ProduccionFormWindow  # Importa la clase del formulario de Producción
-from taskprogram import TaskWindow          # Importa la clase del formulario de Programación de Tareas
-from produccionplan import ProductionPlanerWindow  # Importa la clase del formulario de Plan de Producción
 
 # --------------------------------------------------------------------
 #  Diálogo simple para configurar la URL de la API
@@ -47,8 +70,15 @@ class ConfigDialog(QDialog):
 #  Hilo para ejecutar el servidor Modbus en segundo plano
 # --------------------------------------------------------------------
 class ModbusServerThread(QThread):
+    def __init__(self, replica=None, parent=None):
+        super().__init__(parent)
+        self.replica = replica  # fuente de los KPIs publicados en los registros
+
     def run(self):
-        asyncio.run(run_async_modbus_server())
+        # asyncio y pymodbus se importan en este hilo, no en el de la GUI
+        import asyncio
+        from server import run_async_modbus_server
+        asyncio.run(run_async_modbus_server(self.replica))
 
 # --------------------------------------------------------------------
 #  Ventana Principal
@@ -68,6 +98,27 @@ class SoftwareWindow(QMainWindow):
         self.api_url = self.settings.value("api_url", defaultValue=self.BASE_URL)
         # Si no existía nada en QSettings, usamos self.BASE_URL como fallback
 
+        # Un único cliente HTTP para todas las ventanas (conexiones reutilizadas)
+        self.api_client = get_client(self.api_url)
+
+        # Réplica local (SQLite WAL): las lecturas salen de disco y se
+        # sincroniza en segundo plano; sin internet se sigue trabajando.
+        self.replica = LocalReplica(LocalReplica.default_path())
+        self.replica.bind_url(self.api_url)
+        self.replica_sync = ReplicaSync(self.api_client, self.replica)
+        self.api_client.attach_replica(self.replica, self.replica_sync)
+        self.replica_sync.start()
+
+        # Latencias de la API: cada llamada va a un JSONL rotativo; el panel
+        # de diagnóstico (Ctrl+Shift+D en el dashboard) muestra el resumen.
+        try:
+            get_metrics().enable_log(ApiMetrics.default_log_path())
+        except OSError as e:
+            print(f"Registro de latencias desactivado: {e}")
+        self.diagnostics_dialog = None
+        self.diagnostics_shortcut = QShortcut(QKeySequence("Ctrl+Shift+D"), self)
+        self.diagnostics_shortcut.activated.connect(self.show_diagnostics)
+
         self.setWindowFlags(Qt.FramelessWindowHint)
         self.setFixedSize(800, 600)
         self.setStyleSheet("background-color: white; border-radius: 15px;")
@@ -91,14 +142,19 @@ class SoftwareWindow(QMainWindow):
         self.central_widget.setLayout(self.layout)
         self.setCentralWidget(self.central_widget)
 
-        # Temporizador para mostrar el dashboard tras 1 segundo
-        self.timer = QTimer(self)
-        self.timer.timeout.connect(self.show_dashboard)
-        self.timer.start(1000)
-
         # Iniciar servidor Modbus en un hilo
         self.start_modbus_server()
 
+        # Contadores/estados de las máquinas: machine_poller.buffer guarda lo
+        # último y el avance por OT, y self.telemetry el historial en disco
+        # para el OEE. Se cargan durante el splash (start_warm_up).
+        self.telemetry = None
+        self.machine_poller = None
+
+        # El splash dura lo que tarden las tareas de arranque, no un tiempo fijo
+        self.dashboard_shown = False
+        self.start_warm_up()
+
     def get_resource_path(self, relative_path):
         """Obtiene la ruta del recurso, compatible con PyInstaller."""
         if hasattr(sys, '_MEIPASS'):
@@ -106,14 +162,47 @@ class SoftwareWindow(QMainWindow):
         return os.path.join(os.path.abspath("."), relative_path)
 
     def start_modbus_server(self):
-        self.modbus_thread = ModbusServerThread()
+        self.modbus_thread = ModbusServerThread(self.replica)
         self.modbus_thread.start()
 
+    # ----------------------------------------------------------------
+    #  Arranque: tareas en paralelo mientras se ve el splash
+    # ----------------------------------------------------------------
+    def start_warm_up(self):
+        """
+        En paralelo en el pool: conexiones con el Apps Script + lista de
+        proformas en la caché (api_client.warm_up) y la telemetría de
+        máquinas. El dashboard aparece cuando terminan todas, o a los
+        SPLASH_MAX_MS como máximo.
+        """
+        self.startup = ApiExecutor(self, wait_cursor=False, module="Arranque")
+        self.startup.busy_changed.connect(self.on_warm_up_busy)
+        if self.api_client:
+            self.startup.submit(
+                self.api_client.warm_up,
+                on_error=lambda e: print(f"Sin conexión con la API al iniciar: {e}")
+            )
+        self.startup.submit(
+            start_machine_telemetry, self.replica,
+            on_success=self.on_telemetry_ready,
+            on_error=lambda e: print(f"Telemetría de máquinas desactivada: {e}")
+        )
+        QTimer.singleShot(SPLASH_MAX_MS, self.show_dashboard)
+
+    def on_warm_up_busy(self, busy):
+        if not busy:
+            self.show_dashboard()
+
+    def on_telemetry_ready(self, result):
+        self.telemetry, self.machine_poller = result
+
     # ----------------------------------------------------------------
     #  Pantalla Dashboard tras la imagen inicial
     # ----------------------------------------------------------------
     def show_dashboard(self):
-        self.timer.stop()
+        if self.dashboard_shown:
+            return
+        self.dashboard_shown = True
         self.showFullScreen()
 
         # Limpiar layout anterior
@@ -209,28 +298,34 @@ class SoftwareWindow(QMainWindow):
     #   Botones: abrir subventanas (sin verificación de Comercial/Diagramación)
     # ----------------------------------------------------------------
     def show_commercial_form(self):
-        self.commercial_form = ComercialFormWindow(main_window=self,api_url=self.api_url)
+        from comercial import ComercialFormWindow
+        self.commercial_form = ComercialFormWindow(main_window=self, api_client=self.api_client)
         self.commercial_form.showFullScreen()
         self.hide()
 
     def show_diagramacion_form(self):
-        # Eliminadas llamadas de verificación
-        self.diagramacion_form = DiagramacionFormWindow(main_window=self,api_url=self.api_url)
+        from diagramacion import DiagramacionFormWindow
+        self.diagramacion_form = DiagramacionFormWindow(main_window=self, api_client=self.api_client)
         self.diagramacion_form.showFullScreen()
         self.hide()
 
     def show_production_form(self):
-        self.production_form = ProduccionFormWindow(main_window=self, api_url=self.api_url)
+        from produccion import ProduccionFormWindow
+        self.production_form = ProduccionFormWindow(main_window=self, api_client=self.api_client)
         self.production_form.showFullScreen()
         self.hide()
 
     def show_task_program_form(self):
-        self.task_program_form = TaskWindow(parent=self, api_url=self.api_url)
+        from taskprogram import TaskWindow
+        self.task_program_form = TaskWindow(parent=self, api_client=self.api_client)
         self.task_program_form.showFullScreen()
         self.hide()
 
     def show_production_plan_form(self):
-        self.production_plan_form = ProductionPlanerWindow(parent=self, api_url=self.api_url)
+        from produccionplan import ProductionPlanerWindow
+        self.production_plan_form = ProductionPlanerWindow(
+            parent=self, api_client=self.api_client, telemetry=self.telemetry
+        )
         self.production_plan_form.showFullScreen()
         self.hide()
 
@@ -241,6 +336,14 @@ class SoftwareWindow(QMainWindow):
         if hasattr(self, 'production_plan_form') and self.production_plan_form is not None:
             self.production_plan_form.close()
 
+    def show_diagnostics(self):
+        if self.diagnostics_dialog is None:
+            from diagnostics import DiagnosticsDialog
+            self.diagnostics_dialog = DiagnosticsDialog(parent=self)
+        self.diagnostics_dialog.show()
+        self.diagnostics_dialog.raise_()
+        self.diagnostics_dialog.activateWindow()
+
     # ----------------------------------------------------------------
     #   Configuración de API (persistencia en QSettings)
     # ----------------------------------------------------------------
@@ -250,6 +353,9 @@ class SoftwareWindow(QMainWindow):
             new_url = dlg.get_api_url()
             if new_url:
                 self.api_url = new_url
+                self.api_client.set_url(self.api_url)
+                self.replica.bind_url(self.api_url)
+                self.replica_sync.request_sync()
                 self.settings.setValue("api_url", self.api_url)
                 QMessageBox.information(self, "URL guardada", f"La nueva URL es:\n{self.api_url}")
             else:
@@ -257,6 +363,7 @@ class SoftwareWindow(QMainWindow):
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
+    watchdog = install_from_env(app)
     window = SoftwareWindow()
     window.show()
     sys.exit(app.exec_())
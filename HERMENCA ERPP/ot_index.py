@@ -0,0 +1,126 @@
+"""
+Índice fecha x proceso de las OTs, compartido por Programación de Tareas
+(taskprogram.TaskWindow) y el Plan de Producción (produccionplan).
+
+Se arma una vez por carga de datos desde la respuesta de loadOTs /
+load_ots_range ({proceso: [[ot, fecha], ...]}) y luego se mantiene con
+assign()/unassign() sin volver a recorrer todas las OTs:
+
+    fecha (datetime.date) -> proceso -> OTs
+    proceso -> OTs sin asignar
+
+Las fechas se pueden pasar como date o como texto ('yyyy-MM-dd', ISO de la
+planilla): se convierten una vez con domain.parse_date. Las OTs de cada
+lista se guardan en dicts (conjuntos ordenados): quitar una es O(1) y el
+orden de llegada se conserva.
+"""
+from domain import ProcessAssignment, parse_date
+
+
+def ot_key(ot):
+    """Clave de una OT: '123' y 123.0 (número de la planilla) son la misma."""
+    text = str(ot).strip()
+    return text[:-2] if text.endswith(".0") else text
+
+
+class OTIndex:
+    def __init__(self, process_ot_data=None):
+        self._by_date = {}      # fecha -> {proceso: {clave: ot}}
+        self._unassigned = {}   # proceso -> {clave: ot}
+        self._entries = {}      # (proceso, clave) -> ProcessAssignment
+        self._processes = []
+        if process_ot_data:
+            self.build(process_ot_data)
+
+    def build(self, process_ot_data):
+        """Rehace el índice desde {proceso: [[ot, fecha], ...]}."""
+        self._by_date.clear()
+        self._unassigned.clear()
+        self._entries.clear()
+        self._processes = list(process_ot_data)
+        for process, ots in process_ot_data.items():
+            self._unassigned[process] = {}
+            for ot_data in ots:
+                if isinstance(ot_data, (list, tuple)) and not ot_data:
+                    continue
+                self._add(ProcessAssignment.from_row(process, ot_data))
+
+    # ----------------------------------------------------------------
+    #  Cambios incrementales
+    # ----------------------------------------------------------------
+    def assign(self, process, ot, date):
+        """
+        Mueve la OT a 'date' (None = sin asignar). Devuelve la fecha anterior
+        (date o None); si la OT no estaba en el índice la agrega.
+        """
+        entry = self._remove(process, ot_key(ot))
+        previous = entry.fecha if entry is not None else None
+        self._add(ProcessAssignment(process, ot, parse_date(date)))
+        return previous
+
+    def unassign(self, process, ot):
+        return self.assign(process, ot, None)
+
+    def _add(self, entry):
+        process, ot, date = entry.process, entry.ot, entry.fecha
+        key = ot_key(ot)
+        if (process, key) in self._entries:
+            # OT repetida en la hoja: manda la primera fila, como handleAssign
+            # y merge_ot_changes (assign() ya quitó la entrada anterior)
+            return
+        if process not in self._unassigned:
+            self._unassigned[process] = {}
+            self._processes.append(process)
+        if date is None:
+            self._unassigned[process][key] = ot
+        else:
+            self._by_date.setdefault(date, {}).setdefault(process, {})[key] = ot
+        self._entries[(process, key)] = entry
+
+    def _remove(self, process, key):
+        entry = self._entries.pop((process, key), None)
+        if entry is None:
+            return None
+        if entry.fecha is None:
+            self._unassigned[process].pop(key, None)
+        else:
+            day = self._by_date[entry.fecha]
+            day[process].pop(key, None)
+            if not day[process]:
+                del day[process]
+            if not day:
+                del self._by_date[entry.fecha]
+        return entry
+
+    # ----------------------------------------------------------------
+    #  Consultas
+    # ----------------------------------------------------------------
+    def processes(self):
+        return list(self._processes)
+
+    def assignment(self, process, ot):
+        """ProcessAssignment de la OT en el proceso; KeyError si no existe."""
+        return self._entries[(process, ot_key(ot))]
+
+    def __contains__(self, item):
+        process, ot = item
+        return (process, ot_key(ot)) in self._entries
+
+    def day(self, date):
+        """{proceso: [ot, ...]} de un día."""
+        ots_by_process = self._by_date.get(parse_date(date), {})
+        return {process: list(ots.values()) for process, ots in ots_by_process.items()}
+
+    def ots_on(self, date, process):
+        return list(self._by_date.get(parse_date(date), {}).get(process, {}).values())
+
+    def week(self, dates):
+        """{proceso: [[ot, ...] por cada fecha de 'dates']} para todos los procesos."""
+        days = [self._by_date.get(parse_date(date), {}) for date in dates]
+        return {
+            process: [list(day.get(process, {}).values()) for day in days]
+            for process in self._processes
+        }
+
+    def unassigned(self, process):
+        return list(self._unassigned.get(process, {}).values())
@@ -8,6 +8,9 @@ from PyQt5.QtWidgets import (
 )
 from PyQt5.QtCore import Qt
 
+from api_worker import ApiExecutor
+from domain import format_date, parse_full_proforma
+
 class ProduccionFormWindow(QMainWindow):
     # Mapeo entre la etiqueta del checkbox en la UI y la clave que doPost espera
     CHECKBOX_KEYS = {
@@ -32,19 +35,22 @@ class ProduccionFormWindow(QMainWindow):
         "Pegado con Tesa": "pegadoConTesa"
     }
 
-    def __init__(self, main_window=None, api_url=""):
+    def __init__(self, main_window=None, api_client=None):
         """
         main_window: Referencia a la ventana principal.
-        api_url: La URL de tu API que recibes desde main.py.
+        api_client: ApiClient compartido que recibes desde main.py.
         """
         super().__init__()
         self.main_window = main_window
-        self.api_url = api_url  # <-- Se usará en vez de la constante
+        self.api_client = api_client  # <-- Se usará en vez de la constante
 
         self.setWindowTitle("Formulario de Producción")
         self.setWindowFlags(Qt.FramelessWindowHint)
         self.setStyleSheet("background-color: #f0f0f0; border-radius: 20px;")
 
+        # Peticiones a la API fuera del hilo de la GUI
+        self.executor = ApiExecutor(self)
+
         # Layout principal
         self.main_layout = QVBoxLayout()
 
@@ -117,15 +123,16 @@ class ProduccionFormWindow(QMainWindow):
 
         # Botones (Guardar y Volver)
         button_layout = QHBoxLayout()
-        guardar_button = QPushButton("Guardar")
-        guardar_button.setStyleSheet(self.style_button_blue())
-        guardar_button.clicked.connect(self.enviar_datos)
+        self.guardar_button = QPushButton("Guardar")
+        self.guardar_button.setStyleSheet(self.style_button_blue())
+        self.guardar_button.clicked.connect(self.enviar_datos)
+        self.executor.busy_changed.connect(lambda busy: self.guardar_button.setEnabled(not busy))
 
         back_button = QPushButton("Volver")
         back_button.setStyleSheet(self.style_button_blue())
         back_button.clicked.connect(self.go_back)
 
-        button_layout.addWidget(guardar_button)
+        button_layout.addWidget(self.guardar_button)
         button_layout.addWidget(back_button)
 
         # Integración final
@@ -239,90 +246,80 @@ class ProduccionFormWindow(QMainWindow):
     # ------------------- LÓGICA DE CARGA ------------------- #
     def cargar_proformas(self):
         """
-        Llamamos a action=getAllProformas usando self.api_url en vez de la constante.
+        Llamamos a action=getAllProformas usando self.api_client en vez de la constante.
         """
-        if not self.api_url:
+        if not self.api_client:
             QMessageBox.warning(self, "Error", "No hay URL configurada para Producción.")
             return
 
-        url = f"{self.api_url}?action=getAllProformas"
-        try:
-            response = requests.get(url)
-            data = response.json()
-            proformas = data.get("proformas", [])
-            self.numero_proforma.clear()
-            self.numero_proforma.addItems(proformas)
-        except requests.exceptions.RequestException as e:
-            QMessageBox.critical(self, "Error", f"Error al conectar con la API: {e}")
+        self.executor.submit(
+            self.api_client.get_json, "getAllProformas",
+            key="proformas",
+            on_success=self.on_proformas_loaded,
+            on_error=lambda e: QMessageBox.critical(self, "Error", f"Error al conectar con la API: {e}")
+        )
+
+    def on_proformas_loaded(self, data):
+        proformas = data.get("proformas", [])
+        self.numero_proforma.clear()
+        self.numero_proforma.addItems(proformas)
 
     def cargar_datos_proforma(self):
         """
         Llamamos a action=getFullProformaData&numeroProforma=...
-        usando self.api_url para obtener los datos y mostrarlos.
+        usando self.api_client para obtener los datos y mostrarlos.
         """
-        if not self.api_url:
+        if not self.api_client:
             QMessageBox.warning(self, "Error", "No hay URL configurada para Producción.")
             return
 
         proforma = self.numero_proforma.currentText()
-        url = f"{self.api_url}?action=getFullProformaData&numeroProforma={proforma}"
+        if not proforma:
+            self.executor.cancel("proforma")
+            return
+        # key="proforma": una selección nueva descarta la petición anterior
+        self.executor.submit(
+            self.api_client.get_json, "getFullProformaData", numeroProforma=proforma,
+            key="proforma",
+            on_success=self.on_datos_proforma_loaded,
+            on_error=self.on_load_error
+        )
+
+    def on_load_error(self, e):
+        if isinstance(e, requests.exceptions.RequestException):
+            QMessageBox.critical(self, "Error", f"Error al conectar con la API: {e}")
+        else:
+            QMessageBox.critical(self, "Error inesperado", str(e))
+
+    def on_datos_proforma_loaded(self, data):
         try:
-            response = requests.get(url)
-            data = response.json()
             print("\n📢 Datos de la API recibidos:", data)
 
-            comercial = data.get("Comercial", [])
-            produccion = data.get("Produccion", [])
-
-            if not comercial or not produccion:
+            proforma, _, orden = parse_full_proforma(data)
+            if proforma is None or orden is None:
                 QMessageBox.warning(self, "Advertencia", "No hay datos de producción para esta proforma.")
                 return
 
             # Comercial
-            self.cliente.setText(str(comercial[2]) if len(comercial) > 2 else "")
-            self.descripcion.setText(str(comercial[4]) if len(comercial) > 4 else "")
+            self.cliente.setText(proforma.cliente)
+            self.descripcion.setText(proforma.descripcion)
 
             # Producción
-            self.numero_ot.setText(str(produccion[0]) if len(produccion) > 0 else "")
-
-            fecha_apertura = str(produccion[1]).split("T")[0] if len(produccion) > 1 else ""
-            fecha_entrega = str(produccion[2]).split("T")[0] if len(produccion) > 2 else ""
-            fa_split = fecha_apertura.split("-") if fecha_apertura else ["", "", ""]
-            fe_split = fecha_entrega.split("-") if fecha_entrega else ["", "", ""]
-
-            self.fecha_apertura_ot.setText(f"{fa_split[2]}/{fa_split[1]}/{fa_split[0]}")
-            self.fecha_entrega.setText(f"{fe_split[2]}/{fe_split[1]}/{fe_split[0]}")
-
-            self.cartulina_papel.setText(str(produccion[3]) if len(produccion) > 3 else "")
-            self.cantidad_hojas.setText(str(produccion[4]) if len(produccion) > 4 else "")
-            self.tiraje_impresion.setText(str(produccion[5]) if len(produccion) > 5 else "")
-
-            # Tinta, placas, tipoImp, pasadas (índices 25..28)
-            tinta = str(produccion[25]) if len(produccion) > 25 else ""
-            placas = str(produccion[26]) if len(produccion) > 26 else ""
-            tipo_imp = str(produccion[27]) if len(produccion) > 27 else ""
-            pasadas = str(produccion[28]) if len(produccion) > 28 else ""
-            self.tinta.setText(tinta)
-            self.placas.setText(placas)
-            self.tipo_impresion.setText(tipo_imp)
-            self.numero_pasadas.setText(pasadas)
-
-            # Procesos de impresión (índices 6..24)
-            procesos_de_impresion = produccion[6:25] if len(produccion) > 24 else []
+            self.numero_ot.setText(orden.numero_ot)
+            self.fecha_apertura_ot.setText(format_date(orden.fecha_apertura))
+            self.fecha_entrega.setText(format_date(orden.fecha_entrega))
+            self.cartulina_papel.setText(orden.cartulina_papel)
+            self.cantidad_hojas.setText(orden.cantidad_hojas)
+            self.tiraje_impresion.setText(orden.tiraje_impresion)
+            self.tinta.setText(orden.tinta)
+            self.placas.setText(orden.placas)
+            self.tipo_impresion.setText(orden.tipo_impresion)
+            self.numero_pasadas.setText(orden.numero_pasadas)
+
+            # Procesos de impresión (columnas 6..24, incluido "Pegado con Tesa")
             for i, checkbox in enumerate(self.checkboxes.values()):
-                if i < len(procesos_de_impresion):
-                    checkbox.setChecked(procesos_de_impresion[i] == "X")
-                else:
-                    checkbox.setChecked(False)
-
-            # Manejar "Pegado con Tesa" en índice 24
-            if len(produccion) > 24 and produccion[24] == "X":
-                label_tesa = "Pegado con Tesa"
-                if label_tesa in self.checkboxes:
-                    self.checkboxes[label_tesa].setChecked(True)
-
-        except requests.exceptions.RequestException as e:
-            QMessageBox.critical(self, "Error", f"Error al conectar con la API: {e}")
+                checkbox.setChecked(i < len(orden.procesos) and orden.procesos[i])
+
         except Exception as e:
             QMessageBox.critical(self, "Error inesperado", str(e))
 
@@ -331,7 +328,7 @@ class ProduccionFormWindow(QMainWindow):
         """
         Envía la info de Producción con section=Produccion y checkboxes marcados.
         """
-        if not self.api_url:
+        if not self.api_client:
             QMessageBox.warning(self, "Error", "No hay URL configurada para Producción.")
             return
 
@@ -391,15 +388,19 @@ class ProduccionFormWindow(QMainWindow):
             elif label == "Pegado con Tesa":
                 datos["pegadoConTesa"] = "X" if checkbox.isChecked() else ""
 
-        try:
-            response = requests.post(self.api_url, json=datos)
-            resp_text = response.text
-            if "Error" in resp_text:
-                QMessageBox.critical(self, "Error", f"Hubo un problema al guardar: {resp_text}")
-            else:
-                QMessageBox.information(self, "Éxito", "Los datos fueron guardados correctamente.")
-        except requests.exceptions.RequestException as e:
-            QMessageBox.critical(self, "Error", f"No se pudo conectar con la API: {e}")
+        self.executor.submit(
+            self.api_client.post, datos,
+            key="guardar",
+            on_success=self.on_datos_enviados,
+            on_error=lambda e: QMessageBox.critical(self, "Error", f"No se pudo conectar con la API: {e}")
+        )
+
+    def on_datos_enviados(self, response):
+        resp_text = response.text
+        if "Error" in resp_text:
+            QMessageBox.critical(self, "Error", f"Hubo un problema al guardar: {resp_text}")
+        else:
+            QMessageBox.information(self, "Éxito", "Los datos fueron guardados correctamente.")
 
     def go_back(self):
         """
@@ -416,7 +417,7 @@ class ProduccionFormWindow(QMainWindow):
 if __name__ == "__main__":
     app = QApplication(sys.argv)
     # Por ejemplo, pasar la URL si deseas:
-    # window = ProduccionFormWindow(api_url="https://script.google.com/macros/s/TU_URL/exec")
+    # window = ProduccionFormWindow(api_client=get_client("https://script.google.com/macros/s/TU_URL/exec"))
     window = ProduccionFormWindow()
     window.showFullScreen()
     sys.exit(app.exec_())
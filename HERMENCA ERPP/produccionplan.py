@@ -1,24 +1,117 @@
 import sys
 import os
-import requests
+from collections import OrderedDict
 from PyQt5 import QtWidgets
 from PyQt5.QtWidgets import (
-    QApplication, QMainWindow, QVBoxLayout, QTableWidget,
+    QApplication, QMainWindow, QVBoxLayout, QTableWidget, QTableView,
     QLabel, QTabWidget, QWidget, QPushButton, QHBoxLayout, QMessageBox,
-    QTableWidgetItem
+    QTableWidgetItem, QStyledItemDelegate, QStyle
 )
-from PyQt5.QtCore import Qt, QDate
-from PyQt5.QtGui import QFont
-from reportlab.lib.pagesizes import A4
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph
+from PyQt5.QtCore import Qt, QDate, QAbstractTableModel, QModelIndex, QRectF, QSize
+from PyQt5.QtGui import QFont, QColor, QPainter
 from pathlib import Path
 
+from api_worker import ApiExecutor
+from ot_index import OTIndex
+from replica import PROCESS_SHEETS
+
+# Colores del OEE semanal (umbral mínimo -> color de fondo)
+OEE_COLORS = [(0.85, "#C8E6C9"), (0.60, "#FFF3B0"), (0.0, "#F8C4C4")]
+
+PLAN_HEADERS = ["Proceso", "Lunes", "Martes", "Miércoles", "Jueves", "Viernes"]
+WEEK_CACHE_MAX = 8  # semanas guardadas (la visible, las vecinas y algo de historial)
+
+
+# --------------------------------------------------------------------
+#  Modelo y delegado del plan semanal
+# --------------------------------------------------------------------
+class WeeklyPlanModel(QAbstractTableModel):
+    """
+    Una fila por proceso; columnas Proceso + Lunes..Viernes.
+    Cambiar de semana solo reemplaza los textos (set_week): la vista pinta
+    las celdas visibles sin crear widgets.
+    """
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows = []  # [(proceso, [texto lunes, ..., texto viernes])]
+
+    def set_week(self, dates, index):
+        """dates: date de lunes a viernes; index: OTIndex de la semana."""
+        rows = [
+            (process, ["\n".join(f"OT: {ot}" for ot in (ots or ["Sin asignación"])) for ots in days])
+            for process, days in index.week(dates).items()
+        ]
+        self.beginResetModel()
+        self._rows = rows
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(PLAN_HEADERS)
+
+    def cell_text(self, row, col):
+        process, days = self._rows[row]
+        return process if col == 0 else days[col - 1]
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.DisplayRole:
+            return self.cell_text(index.row(), index.column())
+        if role == Qt.TextAlignmentRole:
+            return Qt.AlignCenter if index.column() == 0 else Qt.AlignTop | Qt.AlignLeft
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return PLAN_HEADERS[section]
+        return None
+
+
+class PlanCellDelegate(QStyledItemDelegate):
+    """Pinta el proceso como etiqueta azul y los días como texto multilínea."""
+    PADDING = 6
+    PROCESS_BG = QColor("#005BAC")
+    PROCESS_BORDER = QColor("#004080")
+
+    def paint(self, painter, option, index):
+        text = index.data(Qt.DisplayRole) or ""
+        rect = option.rect.adjusted(2, 2, -2, -2)
+        painter.save()
+        painter.setRenderHint(QPainter.Antialiasing)
+        if index.column() == 0:
+            painter.setPen(self.PROCESS_BORDER)
+            painter.setBrush(self.PROCESS_BG)
+            painter.drawRoundedRect(QRectF(rect), 8, 8)
+            font = QFont(option.font)
+            font.setBold(True)
+            painter.setFont(font)
+            painter.setPen(Qt.white)
+            painter.drawText(rect, Qt.AlignCenter | Qt.TextWordWrap, text)
+        else:
+            if option.state & QStyle.State_Selected:
+                painter.fillRect(option.rect, option.palette.highlight())
+                painter.setPen(option.palette.highlightedText().color())
+            painter.drawText(rect.adjusted(self.PADDING, self.PADDING, -self.PADDING, 0),
+                             Qt.AlignTop | Qt.AlignLeft | Qt.TextWordWrap, text)
+        painter.restore()
+
+    def sizeHint(self, option, index):
+        # Una OT por línea: la altura sale de contar líneas, sin medir el texto
+        text = index.data(Qt.DisplayRole) or ""
+        lines = text.count("\n") + 1
+        return QSize(80, lines * option.fontMetrics.lineSpacing() + 2 * self.PADDING + 4)
+
 class ProductionPlanerWindow(QMainWindow):
-    def __init__(self, parent=None, api_url=""):
+    def __init__(self, parent=None, api_client=None, telemetry=None):
         super().__init__(parent)
-        self.api_url = api_url  # URL recibida
+        self.api_client = api_client  # Cliente HTTP compartido
+        self.telemetry = telemetry    # telemetry_store.TelemetryStore (OEE de máquinas)
+        self.executor = ApiExecutor(self)
+        # Precarga de semanas vecinas sin cursor de espera
+        self.prefetcher = ApiExecutor(self, wait_cursor=False, module="ProductionPlanerWindow.prefetch")
 
         self.setWindowTitle("Plan de Producción Semanal")
         self.showFullScreen()
@@ -36,6 +129,12 @@ class ProductionPlanerWindow(QMainWindow):
         self.setup_weekly_schedule_tab()
         self.tabs.addTab(self.tab_weekly_schedule, "Plan de Producción")
 
+        # Pestaña "OEE semanal" (misma semana que el plan)
+        self.tab_oee = QWidget()
+        self.setup_oee_tab()
+        self.tabs.addTab(self.tab_oee, "OEE semanal")
+        self.tabs.currentChanged.connect(self.on_tab_changed)
+
         # Botón "Volver"
         self.back_button = QPushButton("Volver")
         self.back_button.setStyleSheet("""
@@ -62,8 +161,11 @@ class ProductionPlanerWindow(QMainWindow):
         central_widget.setLayout(main_layout)
         self.setCentralWidget(central_widget)
 
-        # Diccionario para datos de procesos/tareas
-        self.process_task_data = {}
+        # Índice fecha x proceso de la semana visible (ot_index.OTIndex)
+        self.week_index = OTIndex()
+        # 'yyyy-MM-dd' del lunes -> (api_client.data_version, OTIndex de esa
+        # semana), en orden de uso; una entrada de otra versión ya no sirve
+        self.week_cache = OrderedDict()
 
         # Cargar datos desde la API
         self.load_process_data()
@@ -120,15 +222,17 @@ class ProductionPlanerWindow(QMainWindow):
         label.setFont(QFont("Arial", 12, QFont.Bold))
         layout.addWidget(label)
 
-        # 6 columnas: Proceso, Lunes..Viernes
-        self.weekly_schedule_table = QTableWidget(0, 6)
-        self.weekly_schedule_table.setHorizontalHeaderLabels([
-            "Proceso", "Lunes", "Martes", "Miércoles", "Jueves", "Viernes"
-        ])
+        # 6 columnas: Proceso, Lunes..Viernes (modelo + delegado, sin widgets por celda)
+        self.plan_model = WeeklyPlanModel(self)
+        self.weekly_schedule_table = QTableView()
+        self.weekly_schedule_table.setModel(self.plan_model)
+        self.weekly_schedule_table.setItemDelegate(PlanCellDelegate(self.weekly_schedule_table))
         self.weekly_schedule_table.horizontalHeader().setStretchLastSection(True)
         self.weekly_schedule_table.horizontalHeader().setSectionResizeMode(
             QtWidgets.QHeaderView.Stretch
         )
+        self.weekly_schedule_table.verticalHeader().setVisible(False)
+        self.weekly_schedule_table.setEditTriggers(QTableView.NoEditTriggers)
 
         # Word wrap
         self.weekly_schedule_table.setWordWrap(True)
@@ -144,7 +248,7 @@ class ProductionPlanerWindow(QMainWindow):
                 border-radius: 5px;
                 margin: 2px;
             }
-            QTableWidget {
+            QTableView {
                 background-color: #FFFFFF;
                 gridline-color: #A9D1F7;
             }
@@ -171,7 +275,86 @@ class ProductionPlanerWindow(QMainWindow):
 
         self.tab_weekly_schedule.setLayout(layout)
 
+    def setup_oee_tab(self):
+        layout = QVBoxLayout()
+
+        self.oee_label = QLabel()
+        self.oee_label.setFont(QFont("Arial", 12, QFont.Bold))
+        layout.addWidget(self.oee_label)
+
+        # Proceso, Lunes..Viernes (como el plan)
+        self.oee_table = QTableWidget(0, 6)
+        self.oee_table.setHorizontalHeaderLabels(PLAN_HEADERS)
+        self.oee_table.horizontalHeader().setSectionResizeMode(QtWidgets.QHeaderView.Stretch)
+        self.oee_table.verticalHeader().setVisible(False)
+        self.oee_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.oee_table.setStyleSheet(self.weekly_schedule_table.styleSheet())
+        layout.addWidget(self.oee_table)
+
+        legend = QLabel("OEE = Disponibilidad x Rendimiento x Calidad "
+                        "(D: tiempo en marcha, R: hojas vs. velocidad ideal)")
+        layout.addWidget(legend)
+        self.tab_oee.setLayout(layout)
+
+    def on_tab_changed(self, index):
+        if self.tabs.widget(index) is self.tab_oee:
+            self.load_oee()
+
+    def load_oee(self):
+        """Calcula el OEE de la semana visible fuera del hilo de la GUI."""
+        if self.telemetry is None or not self.telemetry.machines():
+            self.oee_label.setText("Sin datos de máquinas (configurar ~/.hermenca_erp/maquinas.json).")
+            self.oee_table.setRowCount(0)
+            return
+        monday = self.current_monday.toPyDate()
+        self.oee_label.setText(f"OEE por máquina y día - {self.week_label.text()}")
+        self.executor.submit(
+            self.telemetry.weekly_oee, monday,
+            key="oee",
+            on_success=lambda data, monday=monday: self.show_oee(monday, data),
+            on_error=lambda e: QMessageBox.warning(self, "Error", f"No se pudo calcular el OEE: {e}")
+        )
+
+    def show_oee(self, monday, data):
+        if monday != self.current_monday.toPyDate():
+            return  # ya se cambió de semana
+        order = {name: i for i, name in enumerate(PROCESS_SHEETS)}
+        machines = sorted(data, key=lambda name: (order.get(name, len(order)), name))
+        self.oee_table.setRowCount(len(machines))
+        for row, machine in enumerate(machines):
+            self.oee_table.setItem(row, 0, QTableWidgetItem(machine))
+            for col, day in enumerate(data[machine], start=1):
+                self.oee_table.setItem(row, col, self.oee_item(day))
+        self.oee_table.resizeRowsToContents()
+
+    @staticmethod
+    def oee_item(day):
+        if day is None:
+            item = QTableWidgetItem("Sin datos")
+            item.setTextAlignment(Qt.AlignCenter)
+            return item
+
+        def pct(value):
+            return "-" if value is None else f"{value * 100:.0f}%"
+
+        oee = day["oee"]
+        item = QTableWidgetItem(
+            f"OEE {pct(oee)}\nD {pct(day['availability'])} · R {pct(day['performance'])}"
+        )
+        item.setTextAlignment(Qt.AlignCenter)
+        item.setToolTip(f"{day['sheets']} hojas, {day['downtime_h']:.1f} h parada")
+        if oee is not None:
+            color = next(c for threshold, c in OEE_COLORS if oee >= threshold)
+            item.setBackground(QColor(color))
+        return item
+
     def export_to_pdf(self):
+        # reportlab solo se importa al exportar (abrir la ventana no lo necesita)
+        from reportlab.lib.pagesizes import A4
+        from reportlab.lib import colors
+        from reportlab.lib.styles import getSampleStyleSheet
+        from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph
+
         try:
             pdf_file_name = f"Plan_Produccion_Semanal_{self.current_monday.toString('dd_MM_yyyy')}.pdf"
             desktop_path = Path.home() / "Desktop"
@@ -189,26 +372,14 @@ class ProductionPlanerWindow(QMainWindow):
             elements.append(title)
 
             data = []
-            headers = ["Proceso", "Lunes", "Martes", "Miércoles", "Jueves", "Viernes"]
-            data.append([Paragraph(h, header_style) for h in headers])
-
-            row_count = self.weekly_schedule_table.rowCount()
-            for row in range(row_count):
-                row_data = []
-
-                cell_widget = self.weekly_schedule_table.cellWidget(row, 0)
-                process_name = cell_widget.text() if cell_widget else ""
-                row_data.append(Paragraph(process_name, cell_style))
-
-                for col in range(1, 6):
-                    cw = self.weekly_schedule_table.cellWidget(row, col)
-                    cell_text = cw.text() if cw else ""
-                    row_data.append(Paragraph(cell_text, cell_style))
-
-                data.append(row_data)
+            data.append([Paragraph(h, header_style) for h in PLAN_HEADERS])
 
-            from reportlab.platypus import Table, TableStyle
-            from reportlab.lib import colors
+            # Los textos salen del modelo (lo mismo que pinta la tabla)
+            for row in range(self.plan_model.rowCount()):
+                data.append([
+                    Paragraph(self.plan_model.cell_text(row, col), cell_style)
+                    for col in range(len(PLAN_HEADERS))
+                ])
 
             table = Table(data, repeatRows=1)
             table.setStyle(TableStyle([
@@ -233,83 +404,117 @@ class ProductionPlanerWindow(QMainWindow):
             QMessageBox.critical(self, "Error", f"Error al generar el PDF: {str(e)}")
 
     def load_process_data(self):
-        if not self.api_url:
+        if not self.api_client:
             QMessageBox.warning(self, "Error", "No hay URL configurada para el Plan de Producción.")
             return
 
-        try:
-            response = requests.get(f'{self.api_url}?action=loadOTs')
-            if response.status_code == 200:
-                self.process_task_data = response.json()
-                self.organize_data_by_week()
-            else:
-                QMessageBox.warning(self, "Error",
-                    f"Error al cargar los procesos: {response.status_code}"
-                )
-        except Exception as e:
+        self.week_cache.clear()
+        self.load_week(self.current_monday)
+
+    @staticmethod
+    def week_bounds(monday):
+        """('yyyy-MM-dd' lunes, 'yyyy-MM-dd' viernes) de la semana."""
+        return monday.toString("yyyy-MM-dd"), monday.addDays(4).toString("yyyy-MM-dd")
+
+    def cached_week(self, start):
+        """OTIndex de la semana si está en caché y los datos no cambiaron desde entonces."""
+        entry = self.week_cache.get(start)
+        if entry is None:
+            return None
+        if entry[0] != self.api_client.data_version:
+            del self.week_cache[start]
+            return None
+        self.week_cache.move_to_end(start)
+        return entry[1]
+
+    def cache_week(self, start, version, index):
+        self.week_cache[start] = (version, index)
+        self.week_cache.move_to_end(start)
+        while len(self.week_cache) > WEEK_CACHE_MAX:
+            self.week_cache.popitem(last=False)
+
+    def load_week(self, monday):
+        """Muestra la semana desde la caché o pide solo ese rango a la API."""
+        start, end = self.week_bounds(monday)
+        if not self.api_client:
+            return
+        index = self.cached_week(start)
+        if index is not None:
+            self.on_process_data_loaded(start, self.api_client.data_version, index)
+            return
+
+        # key="week": al cambiar de semana rápido se descarta la petición anterior.
+        # El índice se arma en el hilo de trabajo, una sola vez por semana cargada.
+        # La versión se toma antes de pedir: un cambio durante la carga la deja vieja.
+        version = self.api_client.data_version
+        self.executor.submit(
+            self.load_week_index, start, end,
+            key="week",
+            on_success=lambda data, start=start: self.on_process_data_loaded(start, version, data),
+            on_error=self.on_process_data_error
+        )
+
+    def prefetch_adjacent_weeks(self):
+        for offset in (-7, 7):
+            start, end = self.week_bounds(self.current_monday.addDays(offset))
+            if self.cached_week(start) is not None:
+                continue
+            version = self.api_client.data_version
+            self.prefetcher.submit(
+                self.load_week_index, start, end,
+                key=f"prefetch:{start}",
+                on_success=lambda data, start=start, version=version: self.cache_week(start, version, data),
+                on_error=lambda e: None  # se vuelve a pedir al navegar
+            )
+
+    def load_week_index(self, start, end):
+        """Corre en el pool: loadOTsRange de la semana -> OTIndex."""
+        return OTIndex(self.api_client.load_ots_range(start, end))
+
+    def on_process_data_loaded(self, start, version, index):
+        self.cache_week(start, version, index)
+        if start != self.week_bounds(self.current_monday)[0]:
+            return  # llegó tarde: el usuario ya cambió de semana
+        self.week_index = index
+        self.organize_data_by_week()
+        self.prefetch_adjacent_weeks()
+
+    def on_process_data_error(self, e):
+        status = getattr(getattr(e, "response", None), "status_code", None)
+        if status is not None:
+            QMessageBox.warning(self, "Error",
+                f"Error al cargar los procesos: {status}"
+            )
+        else:
             QMessageBox.critical(self, "Error",
                 f"Error al conectar con la API: {str(e)}"
             )
 
     def organize_data_by_week(self):
-        if not self.process_task_data:
+        if not self.week_index.processes():
             QMessageBox.warning(self, "Advertencia",
                 "No se recibieron datos de OTs o el formato es incorrecto.")
             return
 
-        row_count = len(self.process_task_data)
-        self.weekly_schedule_table.setRowCount(row_count)
-        # Ocultar encabezado vertical
-        self.weekly_schedule_table.verticalHeader().setVisible(False)
-
         dates = [
-            self.current_monday.addDays(i).toString("yyyy-MM-dd")
+            self.current_monday.addDays(i).toPyDate()
             for i in range(5)
         ]
+        # Solo se reemplazan los datos del modelo; la vista repinta lo visible
+        self.plan_model.set_week(dates, self.week_index)
 
-        for row, (process, ots) in enumerate(self.process_task_data.items()):
-            # col 0 => "Proceso"
-            label_process = QLabel(process)
-            label_process.setAlignment(Qt.AlignCenter)
-            label_process.setStyleSheet("""
-                background-color: #005BAC;
-                color: white;
-                border: 1px solid #004080;
-                border-radius: 8px;
-                font-weight: bold;
-                padding: 6px;
-            """)
-            self.weekly_schedule_table.setCellWidget(row, 0, label_process)
-
-            task_by_date = {}
-            for ot_data in ots:
-                ot_number = str(ot_data[0])
-                assigned_date = ot_data[1][:10]
-                if assigned_date != "No asignada":
-                    if assigned_date not in task_by_date:
-                        task_by_date[assigned_date] = []
-                    task_by_date[assigned_date].append(ot_number)
-
-            for col, date in enumerate(dates, start=1):
-                ots_for_date = task_by_date.get(date, ["Sin asignación"])
-                cell_text = "\n".join([f"OT: {ot}" for ot in ots_for_date])
-                cell_label = QLabel(cell_text)
-                cell_label.setAlignment(Qt.AlignTop)
-                cell_label.setWordWrap(True)
-                self.weekly_schedule_table.setCellWidget(row, col, cell_label)
-
-        # Ajustar alturas
+        # Ajustar alturas (el delegado las calcula contando líneas)
         self.weekly_schedule_table.resizeRowsToContents()
 
     def show_previous_week(self):
         self.current_monday = self.current_monday.addDays(-7)
         self.update_week_label()
-        self.organize_data_by_week()
+        self.load_week(self.current_monday)
 
     def show_next_week(self):
         self.current_monday = self.current_monday.addDays(7)
         self.update_week_label()
-        self.organize_data_by_week()
+        self.load_week(self.current_monday)
 
     def update_week_label(self):
         end_of_week = self.current_monday.addDays(4)
@@ -326,7 +531,7 @@ class ProductionPlanerWindow(QMainWindow):
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
-    # Ejemplo: window = ProductionPlanerWindow(api_url="https://script.google.com/macros/s/TU-ENLACE/exec")
+    # Ejemplo: window = ProductionPlanerWindow(api_client=get_client("https://script.google.com/macros/s/TU-ENLACE/exec"))
     window = ProductionPlanerWindow()
     window.showFullScreen()
     sys.exit(app.exec_())
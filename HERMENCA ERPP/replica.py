@@ -0,0 +1,530 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import date, timedelta
+
+from api_metrics import module_scope
+
+# Rangos de Hoja1 tal como los corta getFullProformaData (Get.gs)
+COMERCIAL_RANGE = (0, 7)       # A..G
+DIAGRAMACION_RANGE = (7, 14)   # H..N
+PRODUCCION_RANGE = (14, 43)    # O..AQ
+
+# Orden de columnas que escribe doPost (Postman) en cada sección
+COMERCIAL_FIELDS = [
+    "numeroProforma", "ejecutivoComercial", "cliente", "clasificacion",
+    "descripcion", "cantidadPedido", "fechaEntrega"
+]
+DIAGRAMACION_FIELDS = [
+    "fechaRecepcionArtes", "diseñador", "fechaRealizacionPrePrensa",
+    "fechaEnvioArtesAprobacion", "fechaAprobacionArtes", "fechaEnvioCTP",
+    "fechaQuemadoPlacas"
+]
+PRODUCCION_FIELDS = [
+    "numeroOT", "fechaAperturaOT", "fechaEntrega", "cartulinaPapel",
+    "cantidadHojas", "tirajeImpresion",
+    "xlUV", "xl75", "barnizado", "hotstamping", "plastificado", "localizado",
+    "selloSeco", "easyMatrix", "cilindrica", "tipografica", "peg1Punto",
+    "peg3Puntos", "perforado", "doblado", "compaginado", "engrapado",
+    "emblocado", "engarrado", "pegadoConTesa",
+    "tinta", "placas", "tipoImpresion", "numeroPasadas"
+]
+# Clave del flag de Producción -> hoja de proceso (handleProduccion)
+PROCESS_KEYS = {
+    "xlUV": "XL-UV", "xl75": "XL75", "barnizado": "Barnizado",
+    "hotstamping": "HOT STAMPING", "plastificado": "Plastificado",
+    "localizado": "Localizado", "selloSeco": "Sello Seco",
+    "easyMatrix": "EASY MATRIX", "cilindrica": "CILINDRICA",
+    "tipografica": "TIPOGRAFICA", "peg1Punto": "Peg. 1 Punto",
+    "peg3Puntos": "Peg. 3 Puntos", "perforado": "Perforado",
+    "doblado": "Doblado", "compaginado": "Compaginado",
+    "engrapado": "Engrapado", "emblocado": "Emblocado",
+    "engarrado": "Engarrado", "pegadoConTesa": "Pegado con Tesa"
+}
+# Orden de las hojas de proceso en handleLoadOTs
+PROCESS_SHEETS = [
+    "XL75", "XL-UV", "Barnizado", "HOT STAMPING", "Plastificado", "Localizado",
+    "Sello Seco", "CILINDRICA", "EASY MATRIX", "TIPOGRAFICA", "Peg. 1 Punto",
+    "Peg. 3 Puntos", "Perforado", "Doblado", "Compaginado", "Engrapado",
+    "Emblocado", "Engarrado", "Pegado con Tesa"
+]
+
+# Tras un guardado (ya reflejado localmente) se espera esta pausa sin nuevos
+# guardados antes de pedir el snapshot: una ráfaga de escrituras pide uno solo
+WRITE_SYNC_DELAY = 15  # segundos
+
+_DDMMYYYY = re.compile(r"^(\d{2})/(\d{2})/(\d{4})$")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    clave TEXT PRIMARY KEY,
+    valor TEXT
+);
+CREATE TABLE IF NOT EXISTS hoja1 (
+    fila INTEGER PRIMARY KEY,
+    proforma TEXT,
+    comercial TEXT NOT NULL,
+    diagramacion TEXT NOT NULL,
+    produccion TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS hoja1_proforma ON hoja1(proforma);
+CREATE TABLE IF NOT EXISTS process_ots (
+    proceso TEXT NOT NULL,
+    orden INTEGER NOT NULL,
+    ot,
+    fecha TEXT,
+    PRIMARY KEY (proceso, orden)
+);
+CREATE INDEX IF NOT EXISTS process_ots_fecha ON process_ots(fecha);
+"""
+
+
+def _iso_date(value):
+    """'dd/MM/yyyy' (formularios) -> 'yyyy-MM-dd' (como lo devuelve la hoja)."""
+    if isinstance(value, str):
+        m = _DDMMYYYY.match(value)
+        if m:
+            return f"{m.group(3)}-{m.group(2)}-{m.group(1)}"
+    return value
+
+
+def _ot_key(ot):
+    """Misma OT escrita como 1234, 1234.0 o '1234 '."""
+    text = str(ot if ot is not None else "").strip()
+    return text[:-2] if text.endswith(".0") else text
+
+
+class LocalReplica:
+    """
+    Copia local en SQLite (modo WAL) de Hoja1 (A..AQ) y de las 19 hojas de proceso.
+    Responde las lecturas de la API (getAllProformas, getFullProformaData, loadOTs)
+    desde disco, con el mismo formato JSON que Get.gs, y refleja localmente
+    las escrituras hechas por la aplicación hasta la siguiente sincronización.
+    """
+    SERVED_ACTIONS = ("getAllProformas", "getFullProformaData", "loadOTs", "loadOTsRange")
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        # Aumenta con cada cambio de contenido (para quien deriva datos, p.ej. los KPIs Modbus)
+        self.version = 0
+        # Escrituras reflejadas con apply_post/apply_assign: un snapshot pedido
+        # antes de una de ellas no se aplica (ver sync)
+        self.local_writes = 0
+        with self._conn() as conn:
+            conn.executescript(SCHEMA)
+
+    @staticmethod
+    def default_path():
+        return os.path.join(os.path.expanduser("~"), ".hermenca_erp", "replica.sqlite3")
+
+    def _conn(self):
+        """Una conexión por hilo (sqlite3 no comparte conexiones entre hilos)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # ----------------------------------------------------------------
+    #  Estado
+    # ----------------------------------------------------------------
+    def _meta(self, clave, default=None):
+        row = self._conn().execute("SELECT valor FROM meta WHERE clave=?", (clave,)).fetchone()
+        return row[0] if row else default
+
+    @property
+    def synced_at(self):
+        """Epoch de la última sincronización completa (None si nunca)."""
+        value = self._meta("synced_at")
+        return float(value) if value else None
+
+    @property
+    def ready(self):
+        return self.synced_at is not None
+
+    def bind_url(self, api_url):
+        """La réplica pertenece a una URL: si cambia, se descarta su contenido."""
+        if self._meta("api_url", api_url) == api_url:
+            with self._write_lock, self._conn() as conn:
+                conn.execute("INSERT OR REPLACE INTO meta VALUES ('api_url', ?)", (api_url,))
+            return
+        with self._write_lock, self._conn() as conn:
+            conn.execute("DELETE FROM hoja1")
+            conn.execute("DELETE FROM process_ots")
+            conn.execute("DELETE FROM meta")
+            conn.execute("INSERT INTO meta VALUES ('api_url', ?)", (api_url,))
+            self.version += 1
+
+    # ----------------------------------------------------------------
+    #  Sincronización
+    # ----------------------------------------------------------------
+    def apply_snapshot(self, snapshot, local_writes=None):
+        """
+        Deja el contenido igual a la respuesta de action=getSnapshot. Solo se
+        reescriben las filas que cambiaron. Con 'local_writes' (el valor que
+        tenía self.local_writes al pedir el snapshot) no se aplica nada si
+        después se reflejó una escritura local, y devuelve False.
+        """
+        first_row = int(snapshot.get("firstRow", 2))
+        hoja1_rows = []
+        for offset, values in enumerate(snapshot.get("hoja1", [])):
+            values = list(values) + [""] * (PRODUCCION_RANGE[1] - len(values))
+            proforma = values[0]
+            hoja1_rows.append((
+                first_row + offset,
+                str(proforma) if str(proforma).strip() != "" else None,
+                json.dumps(values[slice(*COMERCIAL_RANGE)]),
+                json.dumps(values[slice(*DIAGRAMACION_RANGE)]),
+                json.dumps(values[slice(*PRODUCCION_RANGE)]),
+            ))
+
+        with self._write_lock, self._conn() as conn:
+            if local_writes is not None and local_writes != self.local_writes:
+                return False
+            stored = {row[0]: row[1:] for row in conn.execute("SELECT * FROM hoja1")}
+            changed = [row for row in hoja1_rows if stored.pop(row[0], None) != row[1:]]
+            conn.executemany("INSERT OR REPLACE INTO hoja1 VALUES (?, ?, ?, ?, ?)", changed)
+            conn.executemany("DELETE FROM hoja1 WHERE fila=?", ((fila,) for fila in stored))
+            ots_changed = self._replace_ots(conn, snapshot.get("ots", {}))
+
+            # Versión de las OTs del snapshot: desde ella se piden los deltas (load_ots)
+            conn.execute("INSERT OR REPLACE INTO meta VALUES ('ots_version', ?)",
+                         (str(snapshot.get("otsVersion", 0)),))
+            conn.execute("INSERT OR REPLACE INTO meta VALUES ('synced_at', ?)", (str(time.time()),))
+            if changed or stored or ots_changed:
+                self.version += 1
+        return True
+
+    @staticmethod
+    def _replace_ots(conn, ots):
+        """Deja process_ots igual a {proceso: [[ot, fecha], ...]}. Devuelve si cambió algo."""
+        rows = []
+        for proceso, entries in ots.items():
+            for orden, (ot, fecha) in enumerate(entries):
+                rows.append((proceso, orden, ot, None if fecha == "No asignada" else fecha))
+        stored = {row[:2]: row[2:] for row in conn.execute("SELECT * FROM process_ots")}
+        changed = [row for row in rows if stored.pop(row[:2], None) != row[2:]]
+        conn.executemany("INSERT OR REPLACE INTO process_ots VALUES (?, ?, ?, ?)", changed)
+        conn.executemany("DELETE FROM process_ots WHERE proceso=? AND orden=?", stored)
+        return bool(changed or stored)
+
+    @property
+    def ots_version(self):
+        """Versión del servidor (OTS_VERSION) hasta la que process_ots está al día."""
+        return int(self._meta("ots_version", "0"))
+
+    def apply_ot_changes(self, data, since):
+        """
+        Aplica la respuesta de loadOTs&since=<since> sobre process_ots. Se
+        descarta si mientras tanto la versión local cambió (otro delta o un
+        snapshot ya la avanzaron).
+        """
+        with self._write_lock, self._conn() as conn:
+            if self.ots_version != since:
+                return
+            if "version" not in data:
+                # Servidor sin versionado: respuesta clásica completa
+                changed = self._replace_ots(conn, data)
+            elif data.get("full"):
+                changed = self._replace_ots(conn, data.get("ots", {}))
+            else:
+                changed = False
+                for op, proceso, ot, fecha in data.get("changes", []):
+                    changed = self._apply_ot_change(conn, op, proceso, ot, fecha) or changed
+            conn.execute("INSERT OR REPLACE INTO meta VALUES ('ots_version', ?)",
+                         (str(data.get("version", 0)),))
+            if changed:
+                self.version += 1
+
+    @staticmethod
+    def _apply_ot_change(conn, op, proceso, ot, fecha):
+        """Un cambio [op, proceso, ot, fecha] del registro _CambiosOTs (ver Get.gs)."""
+        fecha = None if fecha == "No asignada" else fecha
+        first = conn.execute(
+            "SELECT rowid, fecha FROM process_ots WHERE proceso=? AND CAST(ot AS TEXT)=? "
+            "ORDER BY orden LIMIT 1",
+            (proceso, str(ot))
+        ).fetchone()
+        if first is not None:
+            # 'add' de una OT ya presente: el snapshot se leyó después del cambio
+            if op == "add" or first[1] == fecha:
+                return False
+            conn.execute("UPDATE process_ots SET fecha=? WHERE rowid=?", (fecha, first[0]))
+            return True
+        orden = conn.execute(
+            "SELECT COALESCE(MAX(orden), -1) + 1 FROM process_ots WHERE proceso=?", (proceso,)
+        ).fetchone()[0]
+        conn.execute("INSERT INTO process_ots VALUES (?, ?, ?, ?)", (proceso, orden, ot, fecha))
+        return True
+
+    def sync(self, api_client):
+        """
+        Descarga un snapshot completo (una sola petición) y lo aplica.
+        Devuelve False si durante la descarga se reflejó una escritura local:
+        el snapshot pudo leerse antes de que el servidor la guardara.
+        """
+        local_writes = self.local_writes
+        snapshot = api_client.get_json("getSnapshot")
+        if isinstance(snapshot, dict) and "error" in snapshot:
+            raise RuntimeError(snapshot["error"])
+        return self.apply_snapshot(snapshot, local_writes)
+
+    # ----------------------------------------------------------------
+    #  Lecturas (mismo formato que Get.gs)
+    # ----------------------------------------------------------------
+    def answer(self, action, params):
+        if action == "getAllProformas":
+            return {"proformas": self.all_proformas()}
+        if action == "getFullProformaData":
+            data = self.full_proforma(params.get("numeroProforma"))
+            return data if data is not None else {"error": "Error: Proforma not found"}
+        if action == "loadOTs":
+            return self.load_ots()
+        if action == "loadOTsRange":
+            processes = params.get("process")
+            return {
+                "from": params["from"],
+                "to": params["to"],
+                "ots": self.load_ots_range(
+                    params["from"], params["to"],
+                    processes.split(",") if processes else None
+                )
+            }
+        raise KeyError(action)
+
+    def all_proformas(self):
+        # getAllProformas lee desde la fila 3 y descarta celdas vacías
+        rows = self._conn().execute(
+            "SELECT comercial FROM hoja1 WHERE fila >= 3 AND proforma IS NOT NULL ORDER BY fila"
+        ).fetchall()
+        return [json.loads(r[0])[0] for r in rows]
+
+    def full_proforma(self, numero_proforma):
+        row = self._conn().execute(
+            "SELECT comercial, diagramacion, produccion FROM hoja1 "
+            "WHERE proforma=? ORDER BY fila LIMIT 1",
+            (str(numero_proforma),)
+        ).fetchone()
+        if row is None:
+            return None
+        return {
+            "Comercial": json.loads(row[0]),
+            "Diagramacion": json.loads(row[1]),
+            "Produccion": json.loads(row[2]),
+        }
+
+    def load_ots(self):
+        response = {}
+        rows = self._conn().execute(
+            "SELECT proceso, ot, fecha FROM process_ots ORDER BY proceso, orden"
+        ).fetchall()
+        for proceso, ot, fecha in rows:
+            response.setdefault(proceso, []).append([ot, fecha or "No asignada"])
+        # Mismo orden de hojas que handleLoadOTs
+        order = {name: i for i, name in enumerate(PROCESS_SHEETS)}
+        return dict(sorted(response.items(), key=lambda kv: order.get(kv[0], len(order))))
+
+    def load_ots_range(self, start, end, processes=None):
+        """
+        OTs con fecha entre start y end ('yyyy-MM-dd', inclusive), como loadOTsRange.
+        Usa el índice process_ots_fecha: las fechas guardadas empiezan por yyyy-MM-dd.
+        """
+        until = (date.fromisoformat(end) + timedelta(days=1)).isoformat()
+        conn = self._conn()
+        names = processes or PROCESS_SHEETS
+        marks = ",".join("?" * len(names))
+        # Procesos con alguna OT (aunque no tengan ninguna en el rango)
+        present = {row[0] for row in conn.execute(
+            f"SELECT DISTINCT proceso FROM process_ots WHERE proceso IN ({marks})", names
+        )}
+        response = {name: [] for name in names if name in present}
+        rows = conn.execute(
+            f"SELECT proceso, ot, fecha FROM process_ots "
+            f"WHERE fecha >= ? AND fecha < ? AND proceso IN ({marks}) "
+            f"ORDER BY fecha, proceso, orden",
+            (start, until, *names)
+        ).fetchall()
+        for proceso, ot, fecha in rows:
+            response[proceso].append([ot, fecha[:10]])
+        return response
+
+    def kpi_counts(self, today):
+        """
+        Por hoja de proceso: OTs sin asignar, OTs asignadas a 'today' (date) y
+        OTs con entrega vencida que aún tienen trabajo (sin asignar o con fecha
+        >= hoy). También devuelve cuántas OTs distintas están vencidas.
+        -> ({proceso: (pendientes, hoy, vencidas)}, total_vencidas)
+        """
+        day = today.isoformat()
+        tomorrow = (today + timedelta(days=1)).isoformat()
+        conn = self._conn()
+
+        # Fecha de entrega de cada OT (Producción, columna Q); json_extract evita
+        # decodificar la fila entera
+        entrega_path = f"$[{PRODUCCION_FIELDS.index('fechaEntrega')}]"
+        overdue_ots = set()
+        rows = conn.execute(
+            "SELECT json_extract(produccion, '$[0]'), json_extract(produccion, ?) "
+            "FROM hoja1 WHERE json_extract(produccion, '$[0]') != ''",
+            (entrega_path,)
+        )
+        for ot, entrega in rows:
+            entrega = _iso_date(entrega)
+            if _ot_key(ot) and isinstance(entrega, str) and "" < entrega[:10] < day:
+                overdue_ots.add(_ot_key(ot))
+
+        counts = {name: [0, 0, 0] for name in PROCESS_SHEETS}
+        overdue_with_work = set()
+        for proceso, ot, fecha in conn.execute("SELECT proceso, ot, fecha FROM process_ots"):
+            entry = counts.setdefault(proceso, [0, 0, 0])
+            if fecha is None:
+                entry[0] += 1
+            elif day <= fecha < tomorrow:
+                entry[1] += 1
+            if overdue_ots and (fecha is None or fecha >= day):
+                ot = _ot_key(ot)
+                if ot in overdue_ots:
+                    entry[2] += 1
+                    overdue_with_work.add(ot)
+        return {name: tuple(v) for name, v in counts.items()}, len(overdue_with_work)
+
+    # ----------------------------------------------------------------
+    #  Escrituras locales (reflejo de doPost / assign / remove)
+    # ----------------------------------------------------------------
+    def apply_post(self, data):
+        section = data.get("section")
+        numero = data.get("numeroProforma")
+        if not numero or section not in ("Comercial", "Diagramacion", "Produccion"):
+            return
+
+        with self._write_lock, self._conn() as conn:
+            self.version += 1
+            self.local_writes += 1
+            row = conn.execute(
+                "SELECT fila FROM hoja1 WHERE proforma=? ORDER BY fila LIMIT 1", (str(numero),)
+            ).fetchone()
+            if row is None:
+                fila = (conn.execute("SELECT MAX(fila) FROM hoja1").fetchone()[0] or 1) + 1
+                empty = [""] * PRODUCCION_RANGE[1]
+                conn.execute(
+                    "INSERT INTO hoja1 VALUES (?, ?, ?, ?, ?)",
+                    (fila, str(numero),
+                     json.dumps(empty[slice(*COMERCIAL_RANGE)]),
+                     json.dumps(empty[slice(*DIAGRAMACION_RANGE)]),
+                     json.dumps(empty[slice(*PRODUCCION_RANGE)]))
+                )
+            else:
+                fila = row[0]
+
+            if section == "Comercial":
+                values = [numero] + [_iso_date(data.get(f) or "") for f in COMERCIAL_FIELDS[1:]]
+                conn.execute("UPDATE hoja1 SET comercial=? WHERE fila=?", (json.dumps(values), fila))
+            elif section == "Diagramacion":
+                values = [_iso_date(data.get(f) or "") for f in DIAGRAMACION_FIELDS]
+                conn.execute("UPDATE hoja1 SET diagramacion=? WHERE fila=?", (json.dumps(values), fila))
+            else:
+                values = [_iso_date(data.get(f) or "") for f in PRODUCCION_FIELDS]
+                conn.execute("UPDATE hoja1 SET produccion=? WHERE fila=?", (json.dumps(values), fila))
+                ot = data.get("numeroOT") or ""
+                for key, proceso in PROCESS_KEYS.items():
+                    if data.get(key) == "X" and ot != "":
+                        # Igual que handleProduccion: una OT ya anotada no se repite
+                        exists = conn.execute(
+                            "SELECT 1 FROM process_ots WHERE proceso=? AND CAST(ot AS TEXT)=? LIMIT 1",
+                            (proceso, str(ot))
+                        ).fetchone()
+                        if exists:
+                            continue
+                        orden = conn.execute(
+                            "SELECT COALESCE(MAX(orden), -1) + 1 FROM process_ots WHERE proceso=?",
+                            (proceso,)
+                        ).fetchone()[0]
+                        conn.execute("INSERT INTO process_ots VALUES (?, ?, ?, NULL)", (proceso, orden, ot))
+
+    def apply_assign(self, proceso, ot, fecha):
+        """fecha=None equivale a action=remove."""
+        with self._write_lock, self._conn() as conn:
+            self.version += 1
+            self.local_writes += 1
+            # handleAssign/handleRemove solo tocan la primera coincidencia
+            conn.execute(
+                "UPDATE process_ots SET fecha=? WHERE rowid = ("
+                " SELECT rowid FROM process_ots WHERE proceso=? AND CAST(ot AS TEXT)=?"
+                " ORDER BY orden LIMIT 1)",
+                (fecha, proceso, str(ot))
+            )
+
+
+class ReplicaSync(threading.Thread):
+    """
+    Hilo en segundo plano que refresca la réplica cada 'interval' segundos
+    (o antes, si alguien llama request_sync()). Sin conexión simplemente
+    reintenta en el siguiente ciclo: las lecturas siguen saliendo del disco.
+    Los guardados avisan con notify_write(): como ya están reflejados en la
+    réplica, el snapshot se pide recién 'write_delay' segundos después del
+    último.
+    """
+    def __init__(self, api_client, replica, interval=60, write_delay=WRITE_SYNC_DELAY):
+        super().__init__(daemon=True)
+        self.api_client = api_client
+        self.replica = replica
+        self.interval = interval
+        self.write_delay = write_delay
+        self.last_error = None
+        self._requested = None  # time.monotonic() del próximo ciclo pedido
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+
+    def request_sync(self, delay=0.0):
+        """Sincroniza dentro de 'delay' segundos (cada pedido reemplaza al anterior)."""
+        with self._lock:
+            self._requested = time.monotonic() + delay
+        self._wake.set()
+
+    def notify_write(self):
+        self.request_sync(self.write_delay)
+
+    def stop(self):
+        self._stopping.set()
+        self._wake.set()
+
+    def run(self):
+        while not self._stopping.is_set():
+            with self._lock:
+                self._requested = None
+            if self.api_client:
+                try:
+                    with module_scope("ReplicaSync"):
+                        applied = self.replica.sync(self.api_client)
+                    # Si no se aplicó, el guardado que lo descartó ya pidió otro ciclo
+                    if applied:
+                        # Lo cacheado antes de la primera sincronización ya no se usa
+                        for action in self.replica.SERVED_ACTIONS:
+                            self.api_client.cache.invalidate(action)
+                    self.last_error = None
+                except Exception as e:
+                    self.last_error = e
+                    print(f"Réplica local sin sincronizar: {e}")
+            self._wait()
+
+    def _wait(self):
+        periodic = time.monotonic() + self.interval
+        while not self._stopping.is_set():
+            with self._lock:
+                due = periodic if self._requested is None else min(periodic, self._requested)
+            remaining = due - time.monotonic()
+            if remaining <= 0:
+                return
+            self._wake.wait(remaining)
+            self._wake.clear()
@@ -1,18 +1,154 @@
 import asyncio
+import contextlib
+import time
+from datetime import date
+
 from pymodbus.server.async_io import StartAsyncTcpServer
 from pymodbus.datastore import ModbusSlaveContext, ModbusServerContext, ModbusSequentialDataBlock
 from pymodbus.device import ModbusDeviceIdentification
 
-async def run_async_modbus_server():
-    # Crear el contexto de los datos Modbus
+from replica import PROCESS_SHEETS
+
+# --------------------------------------------------------------------
+#  Mapa de registros de KPIs (direcciones Modbus base 0)
+# --------------------------------------------------------------------
+# Input registers (FC04), solo lectura:
+#   0      versión del mapa (KPI_MAP_VERSION)
+#   1      secuencia: aumenta cada vez que cambia algún KPI
+#   2..3   epoch (s) del último cambio, palabra alta / baja
+#   4      1 si hay datos (réplica sincronizada), 0 si no
+#   5      total de OTs sin asignar
+#   6      total de OTs programadas hoy
+#   7      OTs distintas con entrega vencida y trabajo pendiente
+#   10+i   OTs sin asignar en PROCESS_SHEETS[i]      (i = 0..18)
+#   30+i   OTs programadas hoy en PROCESS_SHEETS[i]  (por máquina)
+#   50+i   OTs vencidas con trabajo en PROCESS_SHEETS[i]
+#   70..98 libres (el bloque conserva su tamaño original de 100)
+# Holding registers (FC03): 0..99 libres como antes; el mismo bloque de
+# KPIs se copia desde HR_KPI_BASE para HMIs que solo leen holding registers.
+KPI_MAP_VERSION = 1
+IR_VERSION = 0
+IR_SEQUENCE = 1
+IR_UPDATED_AT = 2
+IR_DATA_OK = 4
+IR_TOTAL_PENDING = 5
+IR_TOTAL_TODAY = 6
+IR_TOTAL_OVERDUE = 7
+IR_PENDING_BASE = 10
+IR_TODAY_BASE = 30
+IR_OVERDUE_BASE = 50
+KPI_REGISTERS = 70
+HR_KPI_BASE = 100
+BLOCK_SIZE = 100   # tamaño original de cada bloque
+
+KPI_POLL_SECONDS = 5
+FC_HOLDING = 3
+FC_INPUT = 4
+
+
+def _u16(value):
+    return max(0, min(int(value), 0xFFFF))
+
+
+class KpiPublisher:
+    """
+    Publica en los registros los KPIs de producción calculados desde la
+    réplica local (LocalReplica.kpi_counts). Solo recalcula cuando cambia
+    la réplica o el día, y solo escribe los registros cuyo valor cambió.
+    """
+    def __init__(self, store, replica):
+        self.store = store
+        self.replica = replica
+        self.sequence = 0
+        self._state = None                  # (versión de la réplica, sincronizada, día)
+        self._values = [0] * KPI_REGISTERS  # lo que hay publicado
+
+    def compute(self):
+        """Nueva lista de KPIs, o None si nada cambió desde la última (corre en otro hilo)."""
+        today = date.today()
+        state = (self.replica.version, self.replica.ready, today)
+        if state == self._state:
+            return None
+        self._state = state
+
+        values = [0] * KPI_REGISTERS
+        values[IR_VERSION] = KPI_MAP_VERSION
+        if self.replica.ready:
+            counts, overdue = self.replica.kpi_counts(today)
+            values[IR_DATA_OK] = 1
+            for i, name in enumerate(PROCESS_SHEETS):
+                pending, scheduled, late = counts.get(name, (0, 0, 0))
+                values[IR_PENDING_BASE + i] = _u16(pending)
+                values[IR_TODAY_BASE + i] = _u16(scheduled)
+                values[IR_OVERDUE_BASE + i] = _u16(late)
+            values[IR_TOTAL_PENDING] = _u16(sum(c[0] for c in counts.values()))
+            values[IR_TOTAL_TODAY] = _u16(sum(c[1] for c in counts.values()))
+            values[IR_TOTAL_OVERDUE] = _u16(overdue)
+        return values
+
+    def publish(self, values):
+        """Escribe solo los tramos que cambiaron (corre en el loop del servidor)."""
+        values = list(values)
+        values[IR_SEQUENCE:IR_UPDATED_AT + 2] = self._values[IR_SEQUENCE:IR_UPDATED_AT + 2]
+        if values == self._values:
+            return False
+
+        self.sequence = (self.sequence + 1) & 0xFFFF
+        now = int(time.time())
+        values[IR_SEQUENCE] = self.sequence
+        values[IR_UPDATED_AT] = (now >> 16) & 0xFFFF
+        values[IR_UPDATED_AT + 1] = now & 0xFFFF
+
+        for start, run in self._changed_runs(self._values, values):
+            self.store.setValues(FC_INPUT, start, run)
+            self.store.setValues(FC_HOLDING, HR_KPI_BASE + start, run)
+        self._values = values
+        return True
+
+    @staticmethod
+    def _changed_runs(old, new):
+        """[(dirección, [valores])] de los tramos contiguos distintos."""
+        runs, start = [], None
+        for i, (a, b) in enumerate(zip(old, new)):
+            if a != b and start is None:
+                start = i
+            elif a == b and start is not None:
+                runs.append((start, new[start:i]))
+                start = None
+        if start is not None:
+            runs.append((start, new[start:]))
+        return runs
+
+    async def run(self, interval=KPI_POLL_SECONDS):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                # El cálculo lee SQLite: fuera del loop para no frenar a los clientes Modbus
+                values = await loop.run_in_executor(None, self.compute)
+                if values is not None:
+                    self.publish(values)
+            except Exception as e:
+                self._state = None  # reintentar en el siguiente ciclo
+                print(f"KPIs Modbus sin actualizar: {e}")
+            await asyncio.sleep(interval)
+
+
+async def run_async_modbus_server(replica=None):
+    # Crear el contexto de los datos Modbus (+1: el contexto suma 1 a cada dirección)
     store = ModbusSlaveContext(
-        di=ModbusSequentialDataBlock(0, [0]*100),
-        co=ModbusSequentialDataBlock(0, [0]*100),
-        hr=ModbusSequentialDataBlock(0, [0]*100),
-        ir=ModbusSequentialDataBlock(0, [0]*100)
+        di=ModbusSequentialDataBlock(0, [0]*BLOCK_SIZE),
+        co=ModbusSequentialDataBlock(0, [0]*BLOCK_SIZE),
+        hr=ModbusSequentialDataBlock(0, [0]*(HR_KPI_BASE + KPI_REGISTERS + 1)),
+        ir=ModbusSequentialDataBlock(0, [0]*max(BLOCK_SIZE, KPI_REGISTERS + 1))
     )
     context = ModbusServerContext(slaves=store, single=True)
 
+    # KPIs en vivo desde la réplica local del ERP (el loop solo guarda
+    # referencias débiles a las tareas: esta se conserva hasta el final)
+    kpi_task = None
+    if replica is not None:
+        kpi_task = asyncio.create_task(KpiPublisher(store, replica).run())
+
     # Configurar la identificación del dispositivo
     identity = ModbusDeviceIdentification()
     identity.VendorName = 'Python Server'
@@ -23,11 +159,17 @@ async def run_async_modbus_server():
     identity.MajorMinorRevision = '1.0'
 
     # Iniciar el servidor Modbus TCP de manera asíncrona
-    await StartAsyncTcpServer(
-        context=context,
-        identity=identity,
-        address=("0.0.0.0", 502)
-    )
+    try:
+        await StartAsyncTcpServer(
+            context=context,
+            identity=identity,
+            address=("0.0.0.0", 502)
+        )
+    finally:
+        if kpi_task is not None:
+            kpi_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await kpi_task
 
 if __name__ == "__main__":
     asyncio.run(run_async_modbus_server())
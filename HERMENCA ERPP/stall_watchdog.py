@@ -0,0 +1,192 @@
+"""
+Diagnóstico de congelamientos de la GUI.
+
+- StallWatchdog: un QTimer del hilo de Qt marca un latido; un hilo aparte
+  avisa si el latido se atrasa más de 'threshold_ms' y guarda en
+  stalls.jsonl la pila Python del hilo principal en ese momento (y, al
+  recuperarse, cuánto duró el congelamiento).
+- ActionProfiler (opcional): un cProfile por acción de botón y por callback
+  de ApiExecutor, guardado como .prof (abrir con snakeviz o pstats).
+
+Variables de entorno (las lee install_from_env, llamado desde main.py):
+    HERMENCA_STALL_MS        umbral en ms (500 por defecto, 0 lo desactiva)
+    HERMENCA_PROFILE         1 (carpeta por defecto) o carpeta de los .prof
+    HERMENCA_PROFILE_MIN_MS  no guarda acciones más cortas (50 por defecto)
+"""
+import cProfile
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import traceback
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+
+from PyQt5.QtCore import QObject, QTimer, QEvent
+from PyQt5.QtWidgets import QAbstractButton
+
+DEFAULT_THRESHOLD_MS = 500
+DEFAULT_PROFILE_MIN_MS = 50
+
+
+def default_directory():
+    return os.path.join(os.path.expanduser("~"), ".hermenca_erp", "diagnostico")
+
+
+# --------------------------------------------------------------------
+#  Watchdog del event loop
+# --------------------------------------------------------------------
+class StallWatchdog(QObject):
+    """Detecta bloqueos del event loop de Qt (crear en el hilo de la GUI)."""
+    LOG_MAX_BYTES = 2 * 1024 * 1024
+    LOG_BACKUPS = 3
+
+    def __init__(self, threshold_ms=DEFAULT_THRESHOLD_MS, log_path=None, parent=None):
+        super().__init__(parent)
+        self.threshold = threshold_ms / 1000
+        # El latido va bastante más rápido que el umbral para no dar falsos avisos
+        self.beat_ms = max(20, int(threshold_ms / 5))
+        self.log_path = log_path or os.path.join(default_directory(), "stalls.jsonl")
+        self._main_ident = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stall = None  # (inicio, pila) del congelamiento en curso
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+
+        os.makedirs(os.path.dirname(self.log_path), exist_ok=True)
+        handler = RotatingFileHandler(self.log_path, maxBytes=self.LOG_MAX_BYTES,
+                                      backupCount=self.LOG_BACKUPS, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        self._log = logging.getLogger(f"hermenca.stalls.{id(self)}")
+        self._log.propagate = False
+        self._log.setLevel(logging.INFO)
+        self._log.addHandler(handler)
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self._beat)
+        self._thread = threading.Thread(target=self._watch, name="StallWatchdog", daemon=True)
+
+    def start(self):
+        self._last_beat = time.monotonic()
+        self.timer.start(self.beat_ms)
+        self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+        self.timer.stop()
+
+    def _beat(self):
+        now = time.monotonic()
+        with self._lock:
+            self._last_beat = now
+            stall, self._stall = self._stall, None
+        if stall is not None:
+            started, _ = stall
+            self._write({"event": "end", "ms": round((now - started) * 1000)})
+
+    def _watch(self):
+        while not self._stopping.wait(self.beat_ms / 2000):
+            with self._lock:
+                late = time.monotonic() - self._last_beat
+                if late <= self.threshold or self._stall is not None:
+                    continue
+                frame = sys._current_frames().get(self._main_ident)
+                stack = traceback.format_stack(frame) if frame is not None else []
+                self._stall = (self._last_beat, stack)
+            del frame
+            print(f"GUI congelada hace {late * 1000:.0f} ms en:\n{''.join(stack[-3:])}", file=sys.stderr)
+            self._write({"event": "stall", "ms": round(late * 1000), "stack": stack})
+
+    def _write(self, record):
+        record = dict(ts=datetime.now().isoformat(timespec="milliseconds"), **record)
+        self._log.info(json.dumps(record, ensure_ascii=False))
+
+
+# --------------------------------------------------------------------
+#  Perfilado por acción (opt-in)
+# --------------------------------------------------------------------
+class ActionProfiler(QObject):
+    """
+    Instalado como filtro de eventos de la aplicación, entrega él mismo el
+    clic/tecla que suelta un botón dentro de un cProfile, así el perfil abarca
+    el slot conectado. Las acciones anidadas (p.ej. un QMessageBox abierto
+    desde un slot) quedan dentro del perfil de la acción externa.
+    """
+    TRIGGERS = (QEvent.MouseButtonRelease, QEvent.KeyRelease)
+
+    def __init__(self, directory, min_ms=DEFAULT_PROFILE_MIN_MS, parent=None):
+        super().__init__(parent)
+        self.directory = directory
+        self.min_ms = min_ms
+        self._active = False
+        os.makedirs(directory, exist_ok=True)
+
+    @contextmanager
+    def profile(self, name):
+        if self._active or threading.current_thread() is not threading.main_thread():
+            yield
+            return
+        self._active = True
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            self._active = False
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            if elapsed_ms >= self.min_ms:
+                self._save(profiler, name, elapsed_ms)
+
+    def _save(self, profiler, name, elapsed_ms):
+        slug = re.sub(r"[^\w.-]+", "_", name)[:80]
+        path = os.path.join(self.directory,
+                            f"{datetime.now():%Y%m%d_%H%M%S_%f}_{slug}_{elapsed_ms:.0f}ms.prof")
+        try:
+            profiler.dump_stats(path)
+        except OSError as e:
+            print(f"No se pudo guardar el perfil {path}: {e}", file=sys.stderr)
+
+    def eventFilter(self, obj, event):
+        if (event.type() in self.TRIGGERS and isinstance(obj, QAbstractButton)
+                and obj.isEnabled() and not self._active):
+            window = obj.window()
+            label = obj.text() or obj.objectName() or type(obj).__name__
+            with self.profile(f"{type(window).__name__}.{label}"):
+                obj.event(event)
+            return True
+        return False
+
+
+_profiler = None
+
+
+def profile_action(callback):
+    """Contexto para perfilar un callback (no hace nada si el perfilado está apagado)."""
+    if _profiler is None:
+        return nullcontext()
+    return _profiler.profile(getattr(callback, "__qualname__", type(callback).__name__))
+
+
+def install_from_env(app):
+    """Arranca el watchdog y, si HERMENCA_PROFILE está definido, el perfilado."""
+    global _profiler
+    watchdog = None
+    threshold = int(os.environ.get("HERMENCA_STALL_MS", DEFAULT_THRESHOLD_MS) or 0)
+    if threshold > 0:
+        watchdog = StallWatchdog(threshold, parent=app)
+        watchdog.start()
+
+    target = os.environ.get("HERMENCA_PROFILE", "").strip()
+    if target and target != "0":
+        directory = os.path.join(default_directory(), "perfiles") if target == "1" else target
+        min_ms = int(os.environ.get("HERMENCA_PROFILE_MIN_MS", DEFAULT_PROFILE_MIN_MS))
+        _profiler = ActionProfiler(directory, min_ms, parent=app)
+        app.installEventFilter(_profiler)
+        print(f"Perfilado por acción activo: {directory}")
+    return watchdog
@@ -0,0 +1,218 @@
+"""
+Generador de datos sintéticos con el formato de Hoja1 (A..AQ) y de las
+hojas de proceso (OT en A, fecha asignada en E).
+
+    python synthetic_data.py --size 10000 --csv datos_prueba/
+    python synthetic_data.py --size 100000 --db backend_local.sqlite3 --mix "XL75=6,Barnizado=3"
+
+- Comercial: proformas NNNN-YY, clientes, cantidades y fecha de entrega.
+- Diagramación: los 7 hitos con fechas crecientes desde la recepción.
+- Producción: OT, materiales y los 19 flags de proceso ('X'), con la OT
+  anotada en cada hoja de proceso marcada y, opcionalmente, una fecha
+  asignada (día hábil entre la apertura y la entrega).
+
+El CSV sirve para importar en una planilla de prueba; --db llena el
+backend local (backend_local.py).
+"""
+import argparse
+import csv
+import os
+import random
+from datetime import date, timedelta
+
+from replica import (
+    COMERCIAL_FIELDS, DIAGRAMACION_FIELDS, PROCESS_KEYS, PROCESS_SHEETS, PRODUCCION_FIELDS
+)
+
+# Peso relativo de cada hoja de proceso (cuántas OTs pasan por ella)
+DEFAULT_PROCESS_MIX = {
+    "XL75": 8, "XL-UV": 4, "Barnizado": 5, "HOT STAMPING": 1, "Plastificado": 4,
+    "Localizado": 2, "Sello Seco": 1, "CILINDRICA": 2, "EASY MATRIX": 2,
+    "TIPOGRAFICA": 1, "Peg. 1 Punto": 3, "Peg. 3 Puntos": 2, "Perforado": 1,
+    "Doblado": 4, "Compaginado": 2, "Engrapado": 2, "Emblocado": 1,
+    "Engarrado": 1, "Pegado con Tesa": 1
+}
+# Cuántos procesos lleva una OT -> peso
+PROCESSES_PER_OT = {1: 3, 2: 4, 3: 2, 4: 1}
+
+EJECUTIVOS = ["Ana Rojas", "Carlos Vargas", "Lucía Mendoza", "Jorge Paz", "Marcela Suárez"]
+DISENADORES = ["Diego", "Valeria", "Rodrigo", "Camila"]
+CLIENTES = [
+    "Industrias Andinas", "Farmacorp", "Embol", "Cervecería Boliviana", "PIL Andina",
+    "Sofía Ltda.", "Hipermaxi", "Droguería Inti", "Dillmann", "Fino", "Tigo", "Entel",
+    "Banco Unión", "Universidad Mayor", "Imprenta Cliente Final"
+]
+CLASIFICACIONES = ["A", "B", "C"]
+PRODUCTOS = ["Cajas plegadizas", "Etiquetas", "Afiches", "Catálogos", "Bolsas", "Folletos", "Revistas"]
+CARTULINAS = ["Couché 150 g", "Couché 300 g", "Dúplex 250 g", "Bond 75 g", "Kraft 200 g"]
+TINTAS = ["CMYK", "CMYK + Pantone", "1 Pantone", "2 Pantone"]
+TIPOS_IMPRESION = ["Tiro", "Tiro y retiro"]
+
+HOJA1_HEADER = COMERCIAL_FIELDS + DIAGRAMACION_FIELDS + PRODUCCION_FIELDS
+
+
+def _ddmmyyyy(d):
+    return d.strftime("%d/%m/%Y")
+
+
+def _workday(d):
+    """Corre sábados y domingos al lunes (el plan muestra lunes a viernes)."""
+    return d + timedelta(days=(7 - d.weekday()) % 7) if d.weekday() >= 5 else d
+
+
+def parse_mix(text):
+    """'XL75=6,Barnizado=3' -> {'XL75': 6.0, 'Barnizado': 3.0} (hojas no nombradas = 0)."""
+    mix = {}
+    for part in filter(None, (p.strip() for p in text.split(","))):
+        name, _, weight = part.partition("=")
+        if name not in PROCESS_SHEETS:
+            raise ValueError(f"Hoja de proceso desconocida: {name}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+class SyntheticDataset:
+    """Filas de Hoja1 (desde la fila 2) y OTs por hoja de proceso."""
+    def __init__(self, rows, process_ots):
+        self.rows = rows                # [[A..AQ], ...]
+        self.process_ots = process_ots  # {proceso: [[ot, 'yyyy-MM-dd' | None], ...]}
+
+    def to_backend(self, backend):
+        """Reemplaza el contenido de un backend_local.LocalBackend."""
+        backend.bulk_load(self.rows, self.process_ots)
+
+    def to_csv(self, directory):
+        """Hoja1.csv y un CSV por hoja de proceso (columnas A..E), con encabezado."""
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, "Hoja1.csv"), "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(HOJA1_HEADER)
+            writer.writerows(self.rows)
+        for proceso, ots in self.process_ots.items():
+            path = os.path.join(directory, f"{proceso}.csv")
+            with open(path, "w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                writer.writerow(["OT", "", "", "", "Fecha"])
+                for ot, fecha in ots:
+                    fecha = _ddmmyyyy(date.fromisoformat(fecha)) if fecha else ""
+                    writer.writerow([ot, "", "", "", fecha])
+
+
+def generate(size, start=None, days=365, process_mix=None, diagramacion_ratio=0.8,
+             produccion_ratio=0.6, assigned_ratio=0.6, first_ot=1000, seed=0):
+    """
+    Genera 'size' proformas creadas entre 'start' y start + days.
+    Por defecto el rango termina hoy. diagramacion_ratio, produccion_ratio y
+    assigned_ratio son las fracciones con Diagramación, con OT y con fecha asignada.
+    """
+    rng = random.Random(seed)
+    start = start or date.today() - timedelta(days=days)
+    mix = process_mix or DEFAULT_PROCESS_MIX
+    sheets = [name for name in PROCESS_SHEETS if mix.get(name, 0) > 0]
+    if not sheets:
+        raise ValueError("La mezcla de procesos no tiene ninguna hoja con peso > 0")
+    weights = [mix[name] for name in sheets]
+    flag_by_sheet = {sheet: flag for flag, sheet in PROCESS_KEYS.items()}
+    counts, count_weights = zip(*PROCESSES_PER_OT.items())
+
+    creation_dates = sorted(start + timedelta(days=rng.randrange(max(days, 1))) for _ in range(size))
+    rows, process_ots = [], {name: [] for name in PROCESS_SHEETS}
+    ot_number = first_ot
+
+    for i, created in enumerate(creation_dates, start=1):
+        entrega = created + timedelta(days=rng.randint(10, 40))
+        row = [
+            f"{i:04d}-{created.year % 100:02d}",
+            rng.choice(EJECUTIVOS),
+            rng.choice(CLIENTES),
+            rng.choice(CLASIFICACIONES),
+            f"{rng.choice(PRODUCTOS)} {rng.randint(1, 500)}",
+            str(rng.choice([500, 1000, 2000, 5000, 10000, 25000])),
+            _ddmmyyyy(entrega),
+        ]
+
+        if rng.random() >= diagramacion_ratio:
+            rows.append(row)
+            continue
+
+        # Hitos de Diagramación en orden
+        recepcion = created + timedelta(days=rng.randint(0, 3))
+        preprensa = recepcion + timedelta(days=rng.randint(1, 3))
+        envio = preprensa + timedelta(days=rng.randint(0, 2))
+        aprobacion = envio + timedelta(days=rng.randint(1, 4))
+        ctp = aprobacion + timedelta(days=rng.randint(0, 2))
+        placas = ctp + timedelta(days=rng.randint(0, 1))
+        row += [
+            _ddmmyyyy(recepcion), rng.choice(DISENADORES), _ddmmyyyy(preprensa),
+            _ddmmyyyy(envio), _ddmmyyyy(aprobacion), _ddmmyyyy(ctp), _ddmmyyyy(placas),
+        ]
+
+        if rng.random() >= produccion_ratio:
+            rows.append(row)
+            continue
+
+        ot_number += 1
+        apertura = placas + timedelta(days=rng.randint(0, 2))
+        entrega_ot = max(entrega, apertura + timedelta(days=3))
+        k = min(rng.choices(counts, count_weights)[0], len(sheets))
+        chosen = set()
+        while len(chosen) < k:
+            chosen.add(rng.choices(sheets, weights)[0])
+
+        flags = {flag_by_sheet[name]: "X" for name in chosen}
+        hojas = rng.choice([250, 500, 1000, 2000])
+        values = {
+            "numeroOT": str(ot_number),
+            "fechaAperturaOT": _ddmmyyyy(apertura),
+            "fechaEntrega": _ddmmyyyy(entrega_ot),
+            "cartulinaPapel": rng.choice(CARTULINAS),
+            "cantidadHojas": str(hojas),
+            "tirajeImpresion": str(hojas * rng.choice([1, 2])),
+            "tinta": rng.choice(TINTAS),
+            "placas": str(rng.randint(1, 8)),
+            "tipoImpresion": rng.choice(TIPOS_IMPRESION),
+            "numeroPasadas": str(rng.randint(1, 3)),
+        }
+        row += [flags.get(field, values.get(field, "")) for field in PRODUCCION_FIELDS]
+        rows.append(row)
+
+        span = max((entrega_ot - apertura).days, 0)
+        for name in PROCESS_SHEETS:
+            if name in chosen:
+                fecha = None
+                if rng.random() < assigned_ratio:
+                    fecha = _workday(apertura + timedelta(days=rng.randint(0, span))).isoformat()
+                process_ots[name].append([ot_number, fecha])
+
+    return SyntheticDataset(rows, process_ots)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dataset sintético con el formato de Hoja1 y hojas de proceso.")
+    parser.add_argument("--size", type=int, default=1000, help="cantidad de proformas")
+    parser.add_argument("--start", type=date.fromisoformat, help="primera fecha de creación (yyyy-mm-dd)")
+    parser.add_argument("--days", type=int, default=365, help="días que abarcan las fechas de creación")
+    parser.add_argument("--mix", type=parse_mix, help="pesos por hoja: 'XL75=6,Barnizado=3'")
+    parser.add_argument("--produccion", type=float, default=0.6, help="fracción con OT (de las diagramadas)")
+    parser.add_argument("--asignadas", type=float, default=0.6, help="fracción de OTs con fecha asignada")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--csv", metavar="DIR", help="exportar Hoja1.csv y un CSV por proceso")
+    parser.add_argument("--db", metavar="SQLITE", help="llenar la base de backend_local.py")
+    args = parser.parse_args()
+
+    dataset = generate(args.size, start=args.start, days=args.days, process_mix=args.mix,
+                       produccion_ratio=args.produccion, assigned_ratio=args.asignadas, seed=args.seed)
+    ots = sum(len(v) for v in dataset.process_ots.values())
+    print(f"{len(dataset.rows)} proformas, {ots} OTs en hojas de proceso")
+
+    if args.csv:
+        dataset.to_csv(args.csv)
+        print(f"CSV en {args.csv}")
+    if args.db:
+        from backend_local import LocalBackend
+        dataset.to_backend(LocalBackend(args.db))
+        print(f"Backend local: {args.db}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,48 +1,39 @@
 import sys
-import requests
 from PyQt5 import QtWidgets
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QVBoxLayout, QWidget, QLabel, QListWidget,
     QListWidgetItem, QCalendarWidget, QAbstractItemView, QComboBox, QHBoxLayout,
     QMessageBox, QPushButton, QFrame
 )
-from PyQt5.QtCore import Qt, QThread, pyqtSignal, QMimeData
+from PyQt5.QtCore import Qt, QMimeData, QTimer
 from PyQt5.QtGui import QDrag
 
-class LoadDataThread(QThread):
-    data_loaded = pyqtSignal(dict)
-
-    def __init__(self, api_url=""):
-        super().__init__()
-        self.api_url = api_url
-
-    def run(self):
-        """Hilo para cargar datos desde la API sin bloquear la UI."""
-        if not self.api_url:
-            print("No hay URL configurada para cargar OTs en TaskWindow.")
-            return
-
-        try:
-            response = requests.get(f'{self.api_url}?action=loadOTs')
-            if response.status_code == 200:
-                data = response.json()
-                self.data_loaded.emit(data)
-            else:
-                print(f"Error al cargar la lista de procesos: {response.status_code}")
-        except Exception as e:
-            print(f"Error al conectar con la API: {str(e)}")
+from api_worker import ApiExecutor
+from domain import parse_date
+from ot_index import OTIndex
 
 class TaskWindow(QMainWindow):
-    def __init__(self, parent=None, api_url=""):
+    def __init__(self, parent=None, api_client=None):
         super().__init__(parent)
-        self.api_url = api_url  # En lugar de BASE_URL
+        self.api_client = api_client  # En lugar de BASE_URL
 
         self.setWindowTitle("Programación de Tareas de Producción")
         self.setGeometry(100, 100, 1200, 600)
 
         # Diccionario para almacenar procesos y las OTs asociadas
         self.process_ot_data = {}
-        self.tasks_by_date = {}
+        # Índice fecha -> proceso -> OTs y OTs sin asignar por proceso
+        self.ot_index = OTIndex()
+
+        # Peticiones a la API fuera del hilo de la GUI
+        self.executor = ApiExecutor(self)
+
+        # Cambios optimistas sin confirmar y reconciliación diferida con el servidor
+        self.pending_changes = 0
+        self.reconcile_timer = QTimer(self)
+        self.reconcile_timer.setSingleShot(True)
+        self.reconcile_timer.setInterval(5000)
+        self.reconcile_timer.timeout.connect(self.reconcile)
 
         # Layout principal vertical
         main_layout = QVBoxLayout()
@@ -167,14 +158,18 @@ class TaskWindow(QMainWindow):
         self.load_process_data()
 
     def load_process_data(self):
-        """Iniciar hilo para cargar los datos de la API."""
-        if not self.api_url:
+        """Cargar los datos de la API en segundo plano."""
+        if not self.api_client:
             QMessageBox.warning(self, "Error", "No hay URL configurada para Programación de Tareas.")
             return
 
-        self.thread = LoadDataThread(api_url=self.api_url)
-        self.thread.data_loaded.connect(self.process_data)
-        self.thread.start()
+        # key="loadOTs": una recarga nueva reemplaza a la que siga en curso
+        self.executor.submit(
+            self.api_client.load_ots,
+            key="loadOTs",
+            on_success=self.process_data,
+            on_error=lambda e: QMessageBox.critical(self, "Error", f"Error al cargar la lista de procesos: {e}")
+        )
 
     def process_data(self, data):
         """Procesar los datos cargados en la interfaz."""
@@ -193,39 +188,25 @@ class TaskWindow(QMainWindow):
             index = self.process_combo.findText(current_process)
             self.process_combo.setCurrentIndex(index)
 
-        self.tasks_by_date.clear()
-        for process, ots in self.process_ot_data.items():
-            for ot_data in ots:
-                if len(ot_data) > 1 and ot_data[1] != "No asignada":
-                    ot = ot_data[0]
-                    assigned_date = ot_data[1][:10]
-                    if assigned_date not in self.tasks_by_date:
-                        self.tasks_by_date[assigned_date] = []
-                    self.tasks_by_date[assigned_date].append({"ot": ot, "process": process})
+        self.ot_index.build(self.process_ot_data)
 
-        self.load_ots_for_process()
+        self.refresh_views()
 
     def load_ots_for_process(self):
         selected_process = self.process_combo.currentText()
-        ots = self.process_ot_data.get(selected_process, [])
         self.ot_list.clear()
 
-        for ot_data in ots:
-            if isinstance(ot_data, list) and len(ot_data) > 1 and ot_data[1] != "No asignada":
-                continue
-            ot = ot_data[0] if isinstance(ot_data, list) and len(ot_data) > 0 else ot_data
+        for ot in self.ot_index.unassigned(selected_process):
             item_text = f"OT: {ot}"
             list_item = QtWidgets.QListWidgetItem(item_text)
             self.ot_list.addItem(list_item)
 
     def load_tasks_for_date(self, date):
-        selected_date = date.toString("yyyy-MM-dd")
+        selected_date = date.toPyDate()
         self.task_assign_frame.clear()
-        if selected_date in self.tasks_by_date:
-            for task_info in self.tasks_by_date[selected_date]:
-                self.add_task_widget(task_info['ot'], selected_date, task_info['process'])
-        else:
-            self.task_assign_frame.clear()
+        for process, ots in self.ot_index.day(selected_date).items():
+            for ot in ots:
+                self.add_task_widget(ot, selected_date, process)
 
     def assign_ot_to_selected_date(self, ot_number):
         selected_process = self.process_combo.currentText()
@@ -271,45 +252,99 @@ class TaskWindow(QMainWindow):
         self.task_assign_frame.setItemWidget(list_item, task_widget)
 
     def remove_assigned_task(self, ot, process, date):
-        """Eliminar la fecha asignada a una OT y recargar la interfaz."""
-        if not self.api_url:
+        """Quitar la fecha de una OT: se aplica al instante y se confirma con la API."""
+        if not self.api_client:
             QMessageBox.warning(self, "Error", "No hay URL configurada para Programación de Tareas.")
             return
 
-        url = f'{self.api_url}?action=remove&process={process}&ot={ot}'
-        try:
-            response = requests.get(url)
-            if response.status_code == 200:
-                self.load_process_data()
-                self.load_tasks_for_date(self.calendar.selectedDate())
-            else:
-                print(f"Error al eliminar la fecha: {response.status_code}")
-        except Exception as e:
-            print(f"Error al conectar con la API: {str(e)}")
+        self.apply_optimistic_change(
+            ot, process, None,
+            request=lambda: self.api_client.get("remove", process=process, ot=ot),
+            error_text="Error al eliminar la fecha"
+        )
 
     def send_task_to_api(self, ot, process, date):
-        """Enviar una tarea a la API y actualizar la interfaz."""
-        if not self.api_url:
+        """Asignar una OT a una fecha: se aplica al instante y se confirma con la API."""
+        if not self.api_client:
             QMessageBox.warning(self, "Error", "No hay URL configurada para Programación de Tareas.")
             return
 
-        url = f'{self.api_url}?action=assign&process={process}&ot={ot}&date={date}'
-        try:
-            response = requests.get(url)
-            if response.status_code == 200:
-                self.add_task_to_schedule(ot, date, process)
-                self.load_process_data()
-                self.load_tasks_for_date(self.calendar.selectedDate())
+        self.apply_optimistic_change(
+            ot, process, date,
+            request=lambda: self.api_client.get("assign", process=process, ot=ot, date=date),
+            error_text="Error al asignar la OT"
+        )
+
+    # ----------------------------------------------------------------
+    #  Cambios optimistas: estado local primero, API después
+    # ----------------------------------------------------------------
+    def apply_optimistic_change(self, ot, process, date, request, error_text):
+        """
+        Actualiza ot_index y la UI sin esperar a la API.
+        Si el servidor rechaza el cambio, se restaura la fecha anterior, salvo
+        que la OT ya tenga otra (un cambio posterior): eso lo corrige la
+        recarga de schedule_reconcile().
+        """
+        found, previous = self.set_ot_date(process, ot, date)
+        if not found:
+            QMessageBox.warning(self, "Error", f"La OT {ot} no está en {process}.")
+            return
+        self.refresh_views()
+
+        # Una recarga en curso traería datos anteriores a este cambio
+        self.executor.cancel("loadOTs")
+        self.pending_changes += 1
+
+        def on_response(response):
+            self.pending_changes -= 1
+            # handleAssign/handleRemove responden 200 también con 'Error: ...'
+            if response.status_code == 200 and "Error" not in response.text:
+                self.schedule_reconcile()
             else:
-                print(f"Error al asignar la OT: {response.status_code}")
-        except Exception as e:
-            print(f"Error al conectar con la API para asignar la tarea: {str(e)}")
-
-    def add_task_to_schedule(self, ot, date, process):
-        if date not in self.tasks_by_date:
-            self.tasks_by_date[date] = []
-        self.tasks_by_date[date].append({"ot": ot, "process": process})
-        self.add_task_widget(ot, date, process)
+                rollback(f"{response.status_code} {response.text}")
+
+        def on_error(e):
+            self.pending_changes -= 1
+            rollback(str(e))
+
+        def rollback(detail):
+            if self.current_ot_date(process, ot) == parse_date(date):
+                self.set_ot_date(process, ot, previous)
+                self.refresh_views()
+            self.schedule_reconcile()
+            QMessageBox.warning(self, "Error", f"{error_text}: {detail}")
+
+        self.executor.submit(request, on_success=on_response, on_error=on_error)
+
+    def set_ot_date(self, process, ot, date):
+        """
+        Cambia la fecha de la OT en el índice local (date=None => sin asignar).
+        Devuelve (encontrada, fecha_anterior o None).
+        """
+        if (process, ot) not in self.ot_index:
+            return False, None
+        return True, self.ot_index.assign(process, ot, date)
+
+    def current_ot_date(self, process, ot):
+        """Fecha (date) de la OT en el índice local; None si está sin asignar o no existe."""
+        if (process, ot) not in self.ot_index:
+            return None
+        return self.ot_index.assignment(process, ot).fecha
+
+    def refresh_views(self):
+        self.load_ots_for_process()
+        self.load_tasks_for_date(self.calendar.selectedDate())
+
+    def schedule_reconcile(self):
+        """Recarga loadOTs en segundo plano unos segundos después del último cambio."""
+        self.reconcile_timer.start()
+
+    def reconcile(self):
+        if self.pending_changes > 0:
+            # Aún hay cambios sin confirmar: esperar a que terminen
+            self.reconcile_timer.start()
+            return
+        self.load_process_data()
 
     def start_drag_ot_list(self, supportedActions):
         item = self.ot_list.currentItem()
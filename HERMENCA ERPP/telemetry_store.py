@@ -0,0 +1,249 @@
+"""
+Historial de telemetría de las máquinas en anillos NumPy sobre archivos
+mapeados en memoria (np.memmap): un reinicio no pierde lo ya registrado.
+
+Cada máquina tiene un arreglo preasignado de (ts, contador, estado) de
+'capacity' muestras (una semana a 1 Hz por defecto, ~14 bytes por muestra)
+y un índice de 3 enteros (cabeza, cantidad, capacidad). Los resúmenes
+(hojas por hora, tiempo parado, OEE por día) se calculan vectorizados con
+np.diff / np.bincount sobre la ventana pedida.
+
+OEE = Disponibilidad x Rendimiento x Calidad
+    Disponibilidad = tiempo en marcha / tiempo con datos
+    Rendimiento    = hojas / (horas en marcha x velocidad ideal)   (máx. 1)
+    Calidad        = 1 (las máquinas no informan hojas rechazadas)
+Los intervalos entre muestras mayores a max_gap cuentan como "sin datos".
+"""
+import os
+import threading
+import time
+from urllib.parse import quote, unquote
+
+import numpy as np
+
+SAMPLE_DTYPE = np.dtype([("ts", "<f8"), ("counter", "<u4"), ("state", "<i2")])
+DEFAULT_CAPACITY = 7 * 24 * 3600   # una semana a 1 muestra por segundo
+STATE_RUNNING = 1                  # ver machine_poller.STATE_NAMES
+MAX_GAP = 10.0                     # segundos
+FLUSH_SECONDS = 30
+RING_SUFFIX = ".ring"
+# Señales de las máquinas que se guardan (machine_poller las importa de aquí)
+COUNTER_SIGNAL = "hojas"
+STATE_SIGNAL = "estado"
+
+
+def default_directory():
+    return os.path.join(os.path.expanduser("~"), ".hermenca_erp", "telemetria")
+
+
+def day_start(day):
+    """Epoch de las 00:00 locales de 'day' (date)."""
+    return time.mktime(day.timetuple())
+
+
+# --------------------------------------------------------------------
+#  Anillo de una máquina
+# --------------------------------------------------------------------
+class MachineRing:
+    """
+    Anillo preasignado en disco. Si el archivo ya existe se reabre con su
+    capacidad original. Los ts se fuerzan no decrecientes (un ajuste del
+    reloj no rompe las búsquedas binarias de window()).
+    """
+    def __init__(self, path, capacity=DEFAULT_CAPACITY):
+        self.path = path
+        index_path = path + ".idx"
+        if os.path.exists(path) and os.path.exists(index_path):
+            self.meta = np.memmap(index_path, dtype="<i8", mode="r+", shape=(3,))
+            self.capacity = int(self.meta[2])
+            self.data = np.memmap(path, dtype=SAMPLE_DTYPE, mode="r+", shape=(self.capacity,))
+        else:
+            self.capacity = capacity
+            self.data = np.memmap(path, dtype=SAMPLE_DTYPE, mode="w+", shape=(capacity,))
+            self.meta = np.memmap(index_path, dtype="<i8", mode="w+", shape=(3,))
+            self.meta[:] = (0, 0, capacity)
+        self._lock = threading.Lock()
+        self._last_ts, self._last_counter = 0.0, 0
+        last = self.last()
+        if last is not None:
+            self._last_ts, self._last_counter = float(last["ts"]), int(last["counter"])
+
+    def __len__(self):
+        return int(self.meta[1])
+
+    def append(self, ts, counter=None, state=-1):
+        """Agrega una muestra; sin contador se repite el último (no suma hojas)."""
+        with self._lock:
+            ts = max(float(ts), self._last_ts)
+            counter = self._last_counter if counter is None else int(counter) & 0xFFFFFFFF
+            head = int(self.meta[0])
+            self.data[head] = (ts, counter, state)
+            self.meta[0] = (head + 1) % self.capacity
+            self.meta[1] = min(int(self.meta[1]) + 1, self.capacity)
+            self._last_ts, self._last_counter = ts, counter
+
+    def last(self):
+        with self._lock:
+            if not int(self.meta[1]):
+                return None
+            return self.data[(int(self.meta[0]) - 1) % self.capacity].copy()
+
+    def window(self, start, end):
+        """Copia ordenada de las muestras con start <= ts < end."""
+        with self._lock:
+            head, count = int(self.meta[0]), int(self.meta[1])
+            if count < self.capacity:
+                parts = (self.data[:count],)
+            else:
+                parts = (self.data[head:], self.data[:head])
+            found = []
+            for part in parts:
+                lo, hi = np.searchsorted(part["ts"], (start, end))
+                if hi > lo:
+                    found.append(np.array(part[lo:hi]))
+        return np.concatenate(found) if found else np.empty(0, SAMPLE_DTYPE)
+
+    def flush(self):
+        with self._lock:
+            self.data.flush()
+            self.meta.flush()
+
+
+# --------------------------------------------------------------------
+#  Resúmenes vectorizados
+# --------------------------------------------------------------------
+def bucket_totals(samples, t0, bucket_seconds, buckets, max_gap=MAX_GAP):
+    """
+    Por cubo de 'bucket_seconds' desde t0: (segundos con datos, segundos en
+    marcha, hojas). Cada intervalo entre dos muestras se asigna al cubo de
+    su muestra inicial; las hojas cuentan aunque el intervalo sea un hueco.
+    """
+    zeros = np.zeros(buckets)
+    if len(samples) < 2:
+        return zeros, zeros.copy(), zeros.copy()
+
+    ts = samples["ts"]
+    dt = np.diff(ts)
+    dt[dt > max_gap] = 0.0
+    counter = samples["counter"].astype(np.int64)
+    sheets = np.diff(counter)
+    # Un contador que baja se reinició: lo producido desde entonces es su valor
+    sheets = np.where(sheets < 0, counter[1:], sheets)
+    running = samples["state"][:-1] == STATE_RUNNING
+
+    index = ((ts[:-1] - t0) // bucket_seconds).astype(np.int64)
+    inside = (index >= 0) & (index < buckets)
+    index = index[inside]
+    observed = np.bincount(index, weights=dt[inside], minlength=buckets)
+    run = np.bincount(index, weights=(dt * running)[inside], minlength=buckets)
+    produced = np.bincount(index, weights=sheets[inside], minlength=buckets)
+    return observed, run, produced
+
+
+def oee_from_totals(observed, run, produced, ideal_rate):
+    """Arreglos de disponibilidad, rendimiento, calidad y OEE (NaN sin datos)."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        availability = np.where(observed > 0, run / observed, np.nan)
+        if ideal_rate:
+            performance = np.where(run > 0, produced / (run / 3600 * ideal_rate), np.nan)
+            performance = np.minimum(performance, 1.0)
+        else:
+            performance = np.full(observed.shape, np.nan)
+    quality = np.where(observed > 0, 1.0, np.nan)
+    return availability, performance, quality, availability * performance * quality
+
+
+# --------------------------------------------------------------------
+#  Almacén de todas las máquinas
+# --------------------------------------------------------------------
+class TelemetryStore:
+    """
+    Un MachineRing por máquina en 'directory'. Recibe las lecturas de
+    machine_poller (TimeSeriesBuffer(store=...)) y responde los resúmenes
+    que muestra la pestaña de OEE del Plan de Producción.
+    ideal_rates: {máquina: hojas/hora a velocidad nominal}.
+    """
+    def __init__(self, directory=None, capacity=DEFAULT_CAPACITY, ideal_rates=None, max_gap=MAX_GAP):
+        self.directory = directory or default_directory()
+        self.capacity = capacity
+        self.ideal_rates = dict(ideal_rates or {})
+        self.max_gap = max_gap
+        self.rings = {}
+        self._lock = threading.Lock()
+        self._flushed_at = time.monotonic()
+        os.makedirs(self.directory, exist_ok=True)
+        for name in sorted(os.listdir(self.directory)):
+            if name.endswith(RING_SUFFIX):
+                self.ring(unquote(name[:-len(RING_SUFFIX)]))
+
+    def ring(self, device):
+        with self._lock:
+            ring = self.rings.get(device)
+            if ring is None:
+                path = os.path.join(self.directory, quote(device, safe="") + RING_SUFFIX)
+                ring = self.rings[device] = MachineRing(path, self.capacity)
+            return ring
+
+    def machines(self):
+        with self._lock:
+            return list(self.rings)
+
+    def append(self, device, ts, values):
+        counter, state = values.get(COUNTER_SIGNAL), values.get(STATE_SIGNAL)
+        if counter is None and state is None:
+            return
+        self.ring(device).append(ts, counter, -1 if state is None else state)
+        if time.monotonic() - self._flushed_at > FLUSH_SECONDS:
+            self.flush()
+
+    def flush(self):
+        self._flushed_at = time.monotonic()
+        for ring in list(self.rings.values()):
+            ring.flush()
+
+    # ----------------------------------------------------------------
+    #  Consultas
+    # ----------------------------------------------------------------
+    def throughput_per_hour(self, device, day):
+        """Hojas por hora (24 valores) de 'day'."""
+        t0 = day_start(day)
+        samples = self.ring(device).window(t0, t0 + 86400 + self.max_gap)
+        return bucket_totals(samples, t0, 3600, 24, self.max_gap)[2]
+
+    def daily_oee(self, device, first_day, days=7):
+        """
+        Una entrada por día desde first_day: None sin datos, si no
+        {'availability', 'performance', 'quality', 'oee', 'downtime_h', 'sheets'}
+        (performance y oee son None si la máquina no tiene velocidad ideal).
+        """
+        t0 = day_start(first_day)
+        samples = self.ring(device).window(t0, t0 + days * 86400 + self.max_gap)
+        observed, run, produced = bucket_totals(samples, t0, 86400, days, self.max_gap)
+        availability, performance, quality, oee = oee_from_totals(
+            observed, run, produced, self.ideal_rates.get(device)
+        )
+
+        def value(x):
+            return None if np.isnan(x) else round(float(x), 4)
+
+        result = []
+        for i in range(days):
+            if observed[i] <= 0:
+                result.append(None)
+                continue
+            result.append({
+                "availability": value(availability[i]),
+                "performance": value(performance[i]),
+                "quality": value(quality[i]),
+                "oee": value(oee[i]),
+                "downtime_h": round(float(observed[i] - run[i]) / 3600, 2),
+                "sheets": int(produced[i]),
+            })
+        return result
+
+    def weekly_oee(self, monday, days=5):
+        """{máquina: daily_oee(...)} de la semana que empieza en 'monday' (date)."""
+        return {device: self.daily_oee(device, monday, days) for device in self.machines()}
+
+    def close(self):
+        self.flush()